@@ -1,21 +1,51 @@
 import chainlit as cl
 import httpx
+import asyncio
 import os
-from typing import Dict, Any, Optional
-import google.generativeai as genai
+import importlib.util
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, AsyncIterator
 from dotenv import load_dotenv
 from datetime import datetime
 import time
 
+from http_clients import UpstreamClientPool
+from cache import StaleWhileRevalidateCache, CacheStatus, TTLCache
+from singleflight import SingleFlight
+from rate_limiter import TokenBucketLimiter, Priority, parse_retry_after
+from model_health import ModelHealthTracker, is_quota_error
+from hedging import HedgePolicy, CostLedger
+from fast_path import can_use_fast_path, timed_render, render_price, render_price_table, FastPathStats
+from intent_engine import build_default_engine, INTENT_KEYWORDS, COIN_KEYWORDS, SYMBOL_STOPWORDS, COMMON_WORDS
+from coin_registry import CoinRecord, CoinRegistry, UNRANKED
+from fuzzy_match import build_coin_index, extract_terms
+from prefetcher import PopularityTracker, AdaptiveInterval
+from indicators import IndicatorEngine, parse_market_chart
+from downsample import downsample_series, series_to_points
+from prompt_builder import build_data_prompt
+from tick_store import TickStore, parse_window_seconds
+from watchlist_snapshot import build_watchlist_snapshot, render_watchlist_snapshot
+from query_router import DataSource, gather_sources, merge_results, describe_results
+from pipeline import StatusMessage, StageTimer
+from response_cache import ResponseCache, ResponseKey, normalize_query, market_fingerprint
+from trace_exporter import TraceExporter
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE, FAST_BUCKETS, parse_networks, is_allowed
+
 # 條件導入 Langfuse (v3.x 新版導入方式)
-try:
-    from langfuse import observe, get_client
-    LANGFUSE_AVAILABLE = True
-except ImportError:
-    LANGFUSE_AVAILABLE = False
-    observe = None
+# 啟動時只檢查套件是否存在，實際 import 延遲到第一次使用 (約可省下 0.5 秒啟動時間)
+LANGFUSE_AVAILABLE = importlib.util.find_spec("langfuse") is not None
+if not LANGFUSE_AVAILABLE:
     print("ℹ️ Langfuse 未安裝，監控功能將被停用")
 
+# Plotly 為選用套件 (Chainlit 圖表元素使用)，未安裝時不顯示走勢圖
+PLOTLY_AVAILABLE = importlib.util.find_spec("plotly") is not None
+
+def get_client():
+    """延遲載入 Langfuse client"""
+    from langfuse import get_client as langfuse_get_client
+    return langfuse_get_client()
+
 # 載入環境變數
 load_dotenv()
 
@@ -23,22 +53,165 @@ load_dotenv()
 NESTJS_API = os.getenv("NESTJS_API_URL", "http://localhost:5001")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# 延遲初始化：模型在第一次使用 (或背景預熱) 時才建立，加快容器啟動
+LAZY_INIT = os.getenv("LAZY_INIT", "true").lower() == "true"
+# 單純查價直接以模板回答，不呼叫 LLM
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+GEMINI_STREAMING = os.getenv("GEMINI_STREAMING", "true").lower() == "true"
+
+# 模型 circuit breaker 配置
+GEMINI_FAILURE_THRESHOLD = int(os.getenv("GEMINI_FAILURE_THRESHOLD", "3"))
+GEMINI_BASE_COOLDOWN = float(os.getenv("GEMINI_BASE_COOLDOWN", "30"))
+GEMINI_MAX_COOLDOWN = float(os.getenv("GEMINI_MAX_COOLDOWN", "600"))
+GEMINI_SLOW_LATENCY = float(os.getenv("GEMINI_SLOW_LATENCY", "15"))
+
+# Hedged request 配置 (預設關閉)
+GEMINI_HEDGING_ENABLED = os.getenv("GEMINI_HEDGING_ENABLED", "false").lower() == "true"
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "90"))
+GEMINI_HEDGE_DEFAULT_DELAY = float(os.getenv("GEMINI_HEDGE_DEFAULT_DELAY", "3"))
+GEMINI_MAX_HEDGE_RATE = float(os.getenv("GEMINI_MAX_HEDGE_RATE", "0.1"))
 COINGECKO_API_KEY = os.getenv("COINGECKO_API_KEY", "CG-nrJXAB28gG2xbfsdLieGcxWB")
 COINGECKO_API_BASE = "https://api.coingecko.com/api/v3"
 
+# HTTP 連線池配置 (CoinGecko 與 NestJS 共用同一組設定)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# CoinGecko 快取配置 (秒)
+COINGECKO_CACHE_ENABLED = os.getenv("COINGECKO_CACHE_ENABLED", "true").lower() == "true"
+COINGECKO_PRICE_TTL = float(os.getenv("COINGECKO_PRICE_TTL", "30"))
+COINGECKO_TRENDING_TTL = float(os.getenv("COINGECKO_TRENDING_TTL", "300"))
+COINGECKO_MAX_STALE_ON_ERROR = float(os.getenv("COINGECKO_MAX_STALE_ON_ERROR", "3600"))
+
+# 背景預取市值前 N 名與熱門趨勢 (間隔依查詢頻率與剩餘配額在 MIN ~ MAX 之間調整)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "100"))
+PREFETCH_HOT_COINS = int(os.getenv("PREFETCH_HOT_COINS", "20"))
+PREFETCH_MIN_INTERVAL = float(os.getenv("PREFETCH_MIN_INTERVAL", "30"))
+PREFETCH_MAX_INTERVAL = float(os.getenv("PREFETCH_MAX_INTERVAL", "300"))
+
+# 價格 tick 歷史 (每個幣固定容量的環狀緩衝區，用來回答短時間窗的波動問題)
+TICK_BUFFER_CAPACITY = int(os.getenv("TICK_BUFFER_CAPACITY", "1440"))
+TICK_STORE_MAX_COINS = int(os.getenv("TICK_STORE_MAX_COINS", "500"))
+# 本地歷史至少涵蓋查詢時間窗的這個比例才使用
+LOCAL_HISTORY_MIN_COVERAGE = float(os.getenv("LOCAL_HISTORY_MIN_COVERAGE", "0.8"))
+
+# 技術指標 (以 market_chart 計算 RSI / MACD / 布林通道等)
+INDICATORS_ENABLED = os.getenv("INDICATORS_ENABLED", "true").lower() == "true"
+INDICATOR_CHART_DAYS = int(os.getenv("INDICATOR_CHART_DAYS", "30"))
+
+# 走勢降採樣點數 (LTTB)：送進 prompt 的點數與 UI 圖表的點數
+CHART_LLM_POINTS = int(os.getenv("CHART_LLM_POINTS", "24"))
+CHART_UI_POINTS = int(os.getenv("CHART_UI_POINTS", "200"))
+CHARTS_ENABLED = os.getenv("CHARTS_ENABLED", "true").lower() == "true"
+
+# 用戶收藏清單快取秒數 (以 token 為 key；收藏清單在 NestJS 端修改，這裡只靠 TTL 過期)
+WATCHLIST_CACHE_TTL = float(os.getenv("WATCHLIST_CACHE_TTL", "30"))
+
+# 多意圖路由：每個資料來源的逾時 (秒)，技術指標與 NFT 需要連續兩次請求，使用較長的逾時
+ROUTER_SOURCE_TIMEOUT = float(os.getenv("ROUTER_SOURCE_TIMEOUT", "8"))
+ROUTER_SLOW_SOURCE_TIMEOUT = float(os.getenv("ROUTER_SLOW_SOURCE_TIMEOUT", "15"))
+
+# LLM 回答快取 (key 為正規化問題 + 意圖 + 幣種 + 市場資料分桶，TTL 依資料新鮮度決定)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "16"))
+RESPONSE_CACHE_GENERAL_TTL = float(os.getenv("RESPONSE_CACHE_GENERAL_TTL", "3600"))
+# 以 embedding 相似度比對相近的問法 (每次未命中多一次 embedding 呼叫，預設關閉)
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004")
+
+# CoinGecko 速率限制 (Demo 方案為每分鐘 30 次)
+COINGECKO_RATE_LIMIT_PER_MIN = float(os.getenv("COINGECKO_RATE_LIMIT_PER_MIN", "30"))
+COINGECKO_RATE_BURST = int(os.getenv("COINGECKO_RATE_BURST", "10"))
+COINGECKO_RATE_MAX_WAIT = float(os.getenv("COINGECKO_RATE_MAX_WAIT", "5"))
+COINGECKO_BACKGROUND_MAX_WAIT = float(os.getenv("COINGECKO_BACKGROUND_MAX_WAIT", "30"))
+
+# 本地幣種索引 (由 /coins/list 建立，定期更新並存成快照)
+COIN_REGISTRY_ENABLED = os.getenv("COIN_REGISTRY_ENABLED", "true").lower() == "true"
+COIN_REGISTRY_PATH = os.getenv(
+    "COIN_REGISTRY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "coin_registry.json.gz")
+)
+COIN_REGISTRY_REFRESH_HOURS = float(os.getenv("COIN_REGISTRY_REFRESH_HOURS", "24"))
+COIN_REGISTRY_MARKET_PAGES = int(os.getenv("COIN_REGISTRY_MARKET_PAGES", "4"))
+COIN_REGISTRY_DETECT_TOP_N = int(os.getenv("COIN_REGISTRY_DETECT_TOP_N", "300"))
+
+# 模糊幣名比對 (容許拼錯，例如 "etherum"、"solanna")
+COIN_FUZZY_ENABLED = os.getenv("COIN_FUZZY_ENABLED", "true").lower() == "true"
+COIN_FUZZY_MIN_SCORE = float(os.getenv("COIN_FUZZY_MIN_SCORE", "0.75"))
+COIN_FUZZY_DETECT_MAX_RANK = int(os.getenv("COIN_FUZZY_DETECT_MAX_RANK", "1000"))
+
 # Langfuse 配置
 LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
 LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
 LANGFUSE_HOST = os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
-
-# 初始化 Gemini
-genai.configure(api_key=GEMINI_API_KEY)
+# 追蹤事件在背景批次匯出：取樣比例、佇列上限 (滿了丟棄最舊的事件)、每批數量與匯出間隔 (秒)
+LANGFUSE_SAMPLE_RATE = float(os.getenv("LANGFUSE_SAMPLE_RATE", "1.0"))
+LANGFUSE_EXPORT_QUEUE_SIZE = int(os.getenv("LANGFUSE_EXPORT_QUEUE_SIZE", "1000"))
+LANGFUSE_EXPORT_BATCH_SIZE = int(os.getenv("LANGFUSE_EXPORT_BATCH_SIZE", "100"))
+LANGFUSE_EXPORT_INTERVAL = float(os.getenv("LANGFUSE_EXPORT_INTERVAL", "5"))
+
+# Prometheus 指標端點 (與 Chainlit 共用同一個 port)；ALLOWED_CIDRS 限制可抓取的來源 IP (逗號分隔)，
+# 預設只允許本機與私有網段 (同一個 Docker 網路內的 Prometheus)，port 對外公開時外部無法讀取
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+METRICS_ALLOWED_CIDRS = parse_networks(os.getenv(
+    "METRICS_ALLOWED_CIDRS",
+    "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7",
+))
+
+# ============ 指標 ============
+metrics = MetricsRegistry("crypto_assistant")
+MESSAGES_INFLIGHT = metrics.gauge("messages_inflight", "處理中的訊息數")
+MESSAGES_TOTAL = metrics.counter("messages_total", "已處理的訊息數 (依回答方式)", ["path"])
+MESSAGE_STAGE_SECONDS = metrics.histogram("message_stage_seconds", "訊息開始到各階段的時間", ["stage"])
+INTENT_DETECTION_SECONDS = metrics.histogram("intent_detection_seconds", "意圖與幣種偵測耗時", buckets=FAST_BUCKETS)
+DATA_SOURCE_SECONDS = metrics.histogram("data_source_seconds", "多意圖路由各資料來源耗時", ["source", "status"])
+UPSTREAM_SECONDS = metrics.histogram("upstream_request_seconds", "上游 HTTP 請求耗時", ["upstream", "endpoint"])
+UPSTREAM_ERRORS = metrics.counter("upstream_errors_total", "上游請求失敗次數", ["upstream", "endpoint", "reason"])
+UPSTREAM_INFLIGHT = metrics.gauge("upstream_inflight", "進行中的上游請求數", ["upstream"])
+CACHE_LOOKUPS = metrics.counter("cache_lookups_total", "快取查詢結果", ["cache", "result"])
+LLM_INFLIGHT = metrics.gauge("llm_inflight", "進行中的 LLM 生成數")
+LLM_TTFT_SECONDS = metrics.histogram("llm_time_to_first_token_seconds", "LLM 首個 token 的時間")
+LLM_GENERATION_SECONDS = metrics.histogram("llm_generation_seconds", "LLM 完整回答耗時")
+LLM_ATTEMPT_SECONDS = metrics.histogram("llm_attempt_seconds", "單一模型成功回應的延遲", ["model"])
+LLM_FAILURES = metrics.counter("llm_failures_total", "模型請求失敗次數", ["model", "reason"])
+LLM_FALLBACKS = metrics.counter("llm_fallbacks_total", "改由非首選模型回答的次數", ["model"])
+
+def endpoint_label(path: str) -> str:
+    """把 endpoint 中的 id 換成 {id}，避免 label 數量無限成長 (/coins/bitcoin/market_chart -> /coins/{id}/market_chart)"""
+    segments = path.split("?", 1)[0].strip("/").split("/")
+    for index in range(1, len(segments)):
+        if segments[index - 1] in ("coins", "nfts") and segments[index] not in ("markets", "list"):
+            segments[index] = "{id}"
+    return "/" + "/".join(segments)
+
+# 初始化 Gemini (google.generativeai 載入約需 1 秒，延遲到第一次使用)
+_genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """取得已設定 API key 的 google.generativeai 模組"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
 
 # ============ 多模型 Fallback 支援 ============
 class GeminiModelManager:
     """
     Gemini 模型管理器 - 支援多模型 Fallback
     當一個模型配額用盡時，自動切換到下一個備用模型
+    每個模型有獨立的 circuit breaker，冷卻中的模型會直接跳過，
+    候選順序依目前的健康狀態調整；
+    啟用 hedging 時，主要模型太慢會同時送給下一個健康的模型，採用先回應者
     """
 
     # 支援的模型列表（依優先順序）
@@ -52,68 +225,255 @@ class GeminiModelManager:
         "gemini-1.5-pro",             # Pro 版本
     ]
 
-    def __init__(self, primary_model: str = None):
+    def __init__(self, primary_model: str = None, lazy: bool = False):
         self.primary_model = primary_model or GEMINI_MODEL
         self.current_model_name = self.primary_model
-        self.models = {}
-        self._init_models()
+        # 確保主模型在列表最前面
+        self.model_order = [self.primary_model] + [m for m in self.FALLBACK_MODELS if m != self.primary_model]
+        self._models = None
+        self._loading: Optional[asyncio.Future] = None  # 進行中的背景載入 (event loop 上共用)
+        self._models_lock = threading.Lock()
+        self.health = ModelHealthTracker(
+            self.model_order,
+            failure_threshold=GEMINI_FAILURE_THRESHOLD,
+            base_cooldown=GEMINI_BASE_COOLDOWN,
+            max_cooldown=GEMINI_MAX_COOLDOWN,
+            slow_latency=GEMINI_SLOW_LATENCY,
+        )
+        self.hedging_enabled = GEMINI_HEDGING_ENABLED
+        self.hedge = HedgePolicy(
+            percentile=GEMINI_HEDGE_PERCENTILE,
+            default_delay=GEMINI_HEDGE_DEFAULT_DELAY,
+            max_rate=GEMINI_MAX_HEDGE_RATE,
+        )
+        self.costs = CostLedger()
+
+        if not lazy:
+            self.ensure_models()
 
-    def _init_models(self):
+    @property
+    def models(self) -> Dict[str, Any]:
+        """
+        已建立的模型 (延遲模式下第一次存取時才建立)
+        在 event loop 上請先 await load_models()，避免在 loop 上等待載入中的 lock
+        """
+        return self.ensure_models()
+
+    @property
+    def is_warm(self) -> bool:
+        return self._models is not None
+
+    @property
+    def warming(self) -> bool:
+        return self._loading is not None and not self._loading.done()
+
+    def ensure_models(self) -> Dict[str, Any]:
+        """建立模型 (只會執行一次，可在 thread 中呼叫)"""
+        if self._models is None:
+            with self._models_lock:
+                if self._models is None:
+                    self._models = self._init_models()
+        return self._models
+
+    def _init_models(self) -> Dict[str, Any]:
         """初始化所有可用的模型"""
-        # 確保主模型在列表最前面
-        model_order = [self.primary_model] + [m for m in self.FALLBACK_MODELS if m != self.primary_model]
+        genai = get_genai()
+        models = {}
 
-        for model_name in model_order:
+        for model_name in self.model_order:
             try:
-                self.models[model_name] = genai.GenerativeModel(model_name)
+                models[model_name] = genai.GenerativeModel(model_name)
                 print(f"  ✓ {model_name} 已載入")
             except Exception as e:
                 print(f"  ✗ {model_name} 載入失敗: {e}")
 
-        print(f"📦 已載入 {len(self.models)} 個模型")
+        print(f"📦 已載入 {len(models)} 個模型")
+        return models
+
+    async def load_models(self) -> Dict[str, Any]:
+        """
+        在 thread 中建立模型，不阻塞 event loop
+        預熱進行中時直接等待同一次載入，而不是在 loop 上搶 ensure_models 的 lock
+        """
+        if self._models is not None:
+            return self._models
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(asyncio.to_thread(self.ensure_models))
+        # shield: 單一請求被取消時不影響共用的載入
+        return await asyncio.shield(self._loading)
+
+    async def warm_up(self):
+        """背景預熱：在 thread 中載入 SDK 並建立模型，不阻塞 event loop"""
+        start = time.perf_counter()
+        await self.load_models()
+        print(f"🔥 Gemini 模型預熱完成 ({time.perf_counter() - start:.2f}s)")
+
+    def _candidates(self) -> list:
+        """依健康狀態排序的候選模型"""
+        return self.health.ordered(self.models.keys())
+
+    def _on_success(self, model_name: str, latency: float):
+        """記錄成功並更新當前使用的模型名稱"""
+        self.health.record_success(model_name, latency)
+        LLM_ATTEMPT_SECONDS.observe(latency, model=model_name)
+        if self.current_model_name != model_name:
+            print(f"🔄 已切換到模型: {model_name}")
+            self.current_model_name = model_name
+
+    def _on_failure(self, model_name: str, error: Exception, errors: list):
+        """記錄失敗，直接換下一個模型 (冷卻由 circuit breaker 負責，不在同一模型上等待重試)"""
+        errors.append(f"{model_name}: {error}")
+        self.health.record_failure(model_name, error)
+        LLM_FAILURES.inc(model=model_name, reason="quota" if is_quota_error(error) else "error")
+        if is_quota_error(error):
+            print(f"⚠️ {model_name} 配額已滿，嘗試下一個模型...")
+        else:
+            print(f"⚠️ {model_name} 錯誤，嘗試下一個模型: {error}")
+
+    async def _timed_attempt(self, model_name: str, prompt: str, attempt, hedge: bool = False):
+        """對單一模型送出請求，回傳 (結果, 延遲秒數)"""
+        self.health.begin(model_name)
+        self.costs.record_call(model_name, prompt, hedge=hedge)
+        start = time.monotonic()
+        result = await attempt(self.models[model_name])
+        return result, time.monotonic() - start
+
+    async def _first_success(self, prompt: str, attempt) -> tuple:
+        """
+        依健康順序嘗試候選模型，回傳第一個成功的 (模型名稱, 結果)
+
+        一般模式: 失敗就換下一個模型
+        hedging 模式: 主要模型超過延遲門檻仍未完成時，同時送給下一個模型，
+        採用先成功者並取消另一個 (每個請求最多 hedge 一次，且受 hedge 比例上限限制)
+        """
+        errors = []
+        queue = self._candidates()
+        preferred = queue[0] if queue else None
+        pending = {}
+        hedged = False
+        hedge_decided = False
+
+        def launch(is_hedge: bool = False):
+            model_name = queue.pop(0)
+            task = asyncio.create_task(self._timed_attempt(model_name, prompt, attempt, hedge=is_hedge))
+            pending[task] = model_name
 
-    def generate_content(self, prompt: str, max_retries: int = 3) -> Any:
+        try:
+            while queue or pending:
+                if not pending:
+                    launch()
+
+                timeout = None
+                if self.hedging_enabled and not hedge_decided and queue and len(pending) == 1:
+                    primary = next(iter(pending.values()))
+                    timeout = self.hedge.delay_for(self.health.get(primary))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 主要模型超過門檻；hedge 比例已達上限時就繼續等待主要模型
+                    hedge_decided = True
+                    if self.hedge.allow():
+                        print(f"🏁 {primary} 超過 {timeout:.1f} 秒未回應，同時送給 {queue[0]}")
+                        launch(is_hedge=True)
+                        hedged = True
+                    continue
+
+                for task in done:
+                    model_name = pending.pop(task)
+                    try:
+                        result, latency = task.result()
+                    except Exception as e:
+                        self._on_failure(model_name, e, errors)
+                        continue
+
+                    self._on_success(model_name, latency)
+                    if model_name != preferred:
+                        LLM_FALLBACKS.inc(model=model_name)
+                    return model_name, result
+
+            # 所有模型都失敗了
+            raise Exception(f"所有模型都無法使用:\n" + "\n".join(errors))
+
+        finally:
+            if self.hedging_enabled:
+                self.hedge.record(hedged)
+            # 取消落敗或尚未完成的請求
+            for task, model_name in pending.items():
+                task.cancel()
+                self.health.abandon(model_name)
+                self.costs.record_cancelled(model_name)
+
+    async def generate_content_async(self, prompt: str) -> Any:
         """
-        生成內容，支援自動 Fallback
+        非同步生成內容，支援自動 Fallback
+        使用 SDK 的 async API，等待期間不會阻塞 event loop，
+        其他聊天 session 可以同時被處理；每個候選模型最多一次往返
 
         Args:
             prompt: 提示詞
-            max_retries: 每個模型的最大重試次數
 
         Returns:
             Gemini API 回應
         """
-        errors = []
-
-        for model_name, model in self.models.items():
-            for attempt in range(max_retries):
-                try:
-                    response = model.generate_content(prompt)
-
-                    # 成功！更新當前使用的模型名稱
-                    if self.current_model_name != model_name:
-                        print(f"🔄 已切換到模型: {model_name}")
-                        self.current_model_name = model_name
-
-                    return response
+        await self.load_models()
+        model_name, response = await self._first_success(
+            prompt, lambda model: model.generate_content_async(prompt)
+        )
+        self.costs.record_output(model_name, self._chunk_text(response))
+        return response
+
+    async def stream_content_async(self, prompt: str) -> AsyncIterator[str]:
+        """
+        串流生成內容，逐段 yield 文字
+        在收到第一個 token 之前失敗會照常 Fallback (或 hedge) 到下一個模型；
+        一旦開始輸出就無法切換模型，錯誤會直接拋出
 
-                except Exception as e:
-                    error_str = str(e)
-                    errors.append(f"{model_name} (attempt {attempt + 1}): {error_str}")
+        Args:
+            prompt: 提示詞
 
-                    # 檢查是否為配額錯誤
-                    if "429" in error_str or "quota" in error_str.lower() or "rate" in error_str.lower():
-                        print(f"⚠️ {model_name} 配額已滿，嘗試下一個模型...")
-                        break  # 跳到下一個模型
+        Yields:
+            回答文字片段
+        """
 
-                    # 其他錯誤，等待後重試
-                    if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 2  # 指數退避
-                        print(f"⏳ {model_name} 錯誤，{wait_time}秒後重試...")
-                        time.sleep(wait_time)
+        async def open_stream(model):
+            # 以收到第一段文字為「成功」，之後的片段由呼叫端繼續讀取
+            response = await model.generate_content_async(prompt, stream=True)
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    raise Exception("模型未回傳任何內容")
+                text = self._chunk_text(chunk)
+                if text:
+                    return text, chunks
+
+        await self.load_models()
+        model_name, (first_text, chunks) = await self._first_success(prompt, open_stream)
+        output = [first_text]
+        yield first_text
 
-        # 所有模型都失敗了
-        raise Exception(f"所有模型都無法使用:\n" + "\n".join(errors))
+        try:
+            async for chunk in chunks:
+                text = self._chunk_text(chunk)
+                if text:
+                    output.append(text)
+                    yield text
+        except Exception as e:
+            # 已經輸出部分內容，無法再切換模型
+            self.health.record_failure(model_name, e)
+            raise
+        finally:
+            self.costs.record_output(model_name, "".join(output))
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> str:
+        """取出串流片段的文字 (只含 finish_reason 的片段會讓 .text 拋出 ValueError)"""
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
 
     @property
     def current_model(self) -> str:
@@ -121,8 +481,8 @@ class GeminiModelManager:
         return self.current_model_name
 
 # 建立模型管理器（取代原本的單一模型）
-print(f"🤖 初始化 Gemini 模型管理器...")
-gemini_manager = GeminiModelManager(GEMINI_MODEL)
+print(f"🤖 初始化 Gemini 模型管理器{' (延遲載入)' if LAZY_INIT else ''}...")
+gemini_manager = GeminiModelManager(GEMINI_MODEL, lazy=LAZY_INIT)
 # 保持向後相容
 gemini_model = gemini_manager
 
@@ -141,8 +501,131 @@ else:
     else:
         print(f"ℹ️ Langfuse 監控未啟用 (未設定金鑰)")
 
+# Langfuse 事件匯出器 (請求路徑只寫入佇列，網路 I/O 在背景任務中進行)
+trace_exporter = TraceExporter(
+    get_client,
+    max_queue=LANGFUSE_EXPORT_QUEUE_SIZE,
+    batch_size=LANGFUSE_EXPORT_BATCH_SIZE,
+    flush_interval=LANGFUSE_EXPORT_INTERVAL,
+    sample_rate=LANGFUSE_SAMPLE_RATE,
+)
+
 print(f"🤖 使用模型: {GEMINI_MODEL}")
 
+# ============ 共用 HTTP 連線池 ============
+# 每個上游服務一個 process 共用的 client，避免每則訊息都重新握手
+coingecko_http = UpstreamClientPool(
+    "CoinGecko",
+    headers={
+        "accept": "application/json",
+        "x-cg-demo-api-key": COINGECKO_API_KEY
+    },
+    timeout=15.0,
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    http2=HTTP2_ENABLED,
+)
+nestjs_http = UpstreamClientPool(
+    "NestJS",
+    timeout=10.0,
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    http2=HTTP2_ENABLED,
+)
+
+# ============ CoinGecko 快取 ============
+# 依 endpoint 分組，各自有獨立的 TTL 與容量，避免搜尋的長尾查詢把熱門幣價擠出快取
+coingecko_caches = {
+    "price": StaleWhileRevalidateCache(
+        "CoinGecko price", maxsize=500,
+        ttl=COINGECKO_PRICE_TTL, stale_ttl=COINGECKO_PRICE_TTL * 4,
+        max_stale_on_error=COINGECKO_MAX_STALE_ON_ERROR,
+    ),
+    "trending": StaleWhileRevalidateCache(
+        "CoinGecko trending", maxsize=8,
+        ttl=COINGECKO_TRENDING_TTL, stale_ttl=COINGECKO_TRENDING_TTL * 3,
+        max_stale_on_error=COINGECKO_MAX_STALE_ON_ERROR,
+    ),
+    "nft": StaleWhileRevalidateCache(
+        "CoinGecko nft", maxsize=200,
+        ttl=300, stale_ttl=1800,
+        max_stale_on_error=COINGECKO_MAX_STALE_ON_ERROR,
+    ),
+    "search": StaleWhileRevalidateCache(
+        "CoinGecko search", maxsize=500,
+        ttl=600, stale_ttl=3600,
+        max_stale_on_error=COINGECKO_MAX_STALE_ON_ERROR,
+    ),
+    # market_chart 多天資料為每小時一點，不需要跟即時價格一樣頻繁更新
+    "chart": StaleWhileRevalidateCache(
+        "CoinGecko chart", maxsize=200,
+        ttl=300, stale_ttl=1800,
+        max_stale_on_error=COINGECKO_MAX_STALE_ON_ERROR,
+    ),
+}
+
+# 幣種查詢熱門度與背景預取間隔
+market_popularity = PopularityTracker()
+prefetch_interval = AdaptiveInterval(PREFETCH_MIN_INTERVAL, PREFETCH_MAX_INTERVAL)
+
+# 技術指標引擎 (保留每個幣的遞迴狀態，新資料只做增量計算)
+indicator_engine = IndicatorEngine()
+
+# 價格 tick 歷史 (由查價與背景預取寫入)
+tick_store = TickStore(capacity=TICK_BUFFER_CAPACITY, max_coins=TICK_STORE_MAX_COINS)
+
+# 用戶收藏清單快取 (key 為 token 的雜湊，不在記憶體中保留原始 token)
+watchlist_cache = TTLCache(maxsize=1000, ttl=WATCHLIST_CACHE_TTL)
+
+# LLM 回答快取 (語意比對的 embedding 在 get_genai 之後定義，見 embed_query)
+response_cache = ResponseCache(
+    max_bytes=int(RESPONSE_CACHE_MAX_MB * 1024 * 1024),
+    similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+)
+
+# ============ Single-flight 請求合併 ============
+# 同一時間相同的上游請求只送出一次，其他 session 共用結果
+coingecko_flight = SingleFlight("CoinGecko")
+nestjs_flight = SingleFlight("NestJS")
+
+# ============ CoinGecko 速率限制 ============
+# 互動查詢優先於背景更新；配額不足時短暫排隊而不是直接吃 429
+coingecko_limiter = TokenBucketLimiter(
+    "CoinGecko",
+    rate_per_minute=COINGECKO_RATE_LIMIT_PER_MIN,
+    burst=COINGECKO_RATE_BURST,
+)
+
+def get_coingecko_quota() -> Dict[str, Any]:
+    """取得 CoinGecko 剩餘配額狀態"""
+    return coingecko_limiter.remaining()
+
+def _coingecko_cache_group(endpoint: str) -> Optional[str]:
+    """依 endpoint 決定使用哪一組快取 (None 表示不快取)"""
+    if endpoint.startswith("/search/trending"):
+        return "trending"
+    if endpoint.startswith("/search"):
+        return "search"
+    if endpoint.endswith("/market_chart"):
+        return "chart"
+    if endpoint.startswith("/nfts"):
+        return "nft"
+    if endpoint.startswith(("/coins", "/simple", "/exchange_rates")):
+        return "price"
+    return None
+
+def _coingecko_cache_key(endpoint: str, params: Optional[Dict] = None) -> tuple:
+    """快取 key: endpoint + 排序後的參數"""
+    return (endpoint, tuple(sorted((params or {}).items())))
+
+def _stale_fields(data: Any) -> Dict[str, Any]:
+    """若資料是上游失敗時退回的舊快取，回傳要附加給 prompt 的標記欄位"""
+    if isinstance(data, dict) and "_stale" in data:
+        return {"stale": True, "data_age_seconds": data["_stale"]["age_seconds"]}
+    return {}
+
 # NestJS API 調用函數
 async def call_nestjs_api(
     endpoint: str,
@@ -150,35 +633,66 @@ async def call_nestjs_api(
     data: Optional[Dict] = None,
     token: Optional[str] = None
 ) -> Optional[Dict[str, Any]]:
-    """通用 NestJS API 調用函數"""
+    """
+    通用 NestJS API 調用函數
+    GET 請求會以 (endpoint, token) 合併並行的相同請求；POST 不合併
+    """
+    if method == "GET":
+        return await nestjs_flight.do(
+            (endpoint, token),
+            lambda: _call_nestjs_api_raw(endpoint, method, data, token),
+        )
+    return await _call_nestjs_api_raw(endpoint, method, data, token)
+
+async def _call_nestjs_api_raw(
+    endpoint: str,
+    method: str = "GET",
+    data: Optional[Dict] = None,
+    token: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """實際送出 NestJS API 請求"""
     url = f"{NESTJS_API}{endpoint}"
     headers = {}
-    
+
     if token:
         headers["Authorization"] = f"Bearer {token}"
-    
-    async with httpx.AsyncClient() as client:
-        try:
+
+    client = nestjs_http.client
+    label = endpoint_label(endpoint)
+    try:
+        with UPSTREAM_INFLIGHT.track_inprogress(upstream="nestjs"), UPSTREAM_SECONDS.time(upstream="nestjs", endpoint=label):
             if method == "GET":
-                response = await client.get(url, headers=headers, timeout=10.0)
+                response = await client.get(url, headers=headers)
             elif method == "POST":
-                response = await client.post(url, json=data, headers=headers, timeout=10.0)
+                response = await client.post(url, json=data, headers=headers)
             else:
                 raise ValueError(f"Unsupported method: {method}")
-            
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            print(f"API Error: {e}")
-            return None
+
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        UPSTREAM_ERRORS.inc(upstream="nestjs", endpoint=label, reason=type(e).__name__)
+        print(f"API Error: {e}")
+        return None
 
 async def get_coin_data(coin_id: str) -> Optional[Dict[str, Any]]:
     """獲取加密貨幣數據"""
     return await call_nestjs_api(f"/api/coins/{coin_id}")
 
+def _watchlist_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
 async def get_user_watchlist(token: str) -> Optional[list]:
-    """獲取用戶 watchlist"""
+    """獲取用戶 watchlist (短暫快取，重複查詢不必再打 NestJS)"""
+    key = _watchlist_cache_key(token)
+    cached = watchlist_cache.get(key)
+    CACHE_LOOKUPS.inc(cache="watchlist", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        return cached
+
     result = await call_nestjs_api("/api/watchlist", token=token)
+    if isinstance(result, list):
+        watchlist_cache.set(key, result)
     return result if result else []
 
 async def search_coins(query: str) -> Optional[list]:
@@ -187,25 +701,103 @@ async def search_coins(query: str) -> Optional[list]:
 
 # CoinGecko API 直接調用函數
 
-async def fetch_coingecko_data(endpoint: str, params: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
-    """直接調用 CoinGecko API"""
+async def fetch_coingecko_data(
+    endpoint: str,
+    params: Optional[Dict] = None,
+    priority: int = Priority.INTERACTIVE
+) -> Optional[Dict[str, Any]]:
+    """
+    調用 CoinGecko API (經過 stale-while-revalidate 快取)
+    上游失敗而改用舊快取時，回傳的 dict 會帶有 `_stale` 欄位
+    """
+    key = _coingecko_cache_key(endpoint, params)
+
+    # 快取未命中時，相同的並行請求透過 single-flight 共用同一次上游呼叫
+    def load(load_priority: int = priority):
+        return coingecko_flight.do(key, lambda: _fetch_coingecko_raw(endpoint, params, load_priority))
+
+    group = _coingecko_cache_group(endpoint)
+    if not COINGECKO_CACHE_ENABLED or group is None:
+        return await load()
+
+    lookup = await coingecko_caches[group].get_or_load(
+        key,
+        load,
+        revalidate_loader=lambda: load(Priority.BACKGROUND),
+    )
+    CACHE_LOOKUPS.inc(cache=f"coingecko_{group}", result=lookup.status)
+
+    if lookup.status == CacheStatus.STALE_ERROR:
+        # 淺拷貝後再標記，避免污染快取中的原始資料 (列表則逐筆標記)
+        marker = {"_stale": {"age_seconds": round(lookup.age)}}
+        if isinstance(lookup.value, dict):
+            return {**lookup.value, **marker}
+        if isinstance(lookup.value, list):
+            return [{**item, **marker} if isinstance(item, dict) else item for item in lookup.value]
+    return lookup.value
+
+async def _fetch_coingecko_raw(
+    endpoint: str,
+    params: Optional[Dict] = None,
+    priority: int = Priority.INTERACTIVE
+) -> Optional[Dict[str, Any]]:
+    """直接調用 CoinGecko API (不經快取，但受速率限制)"""
     url = f"{COINGECKO_API_BASE}{endpoint}"
-    headers = {
-        "accept": "application/json",
-        "x-cg-demo-api-key": COINGECKO_API_KEY
-    }
-    
-    async with httpx.AsyncClient() as client:
+    max_wait = COINGECKO_RATE_MAX_WAIT if priority == Priority.INTERACTIVE else COINGECKO_BACKGROUND_MAX_WAIT
+    label = endpoint_label(endpoint)
+
+    for attempt in range(2):
+        if not await coingecko_limiter.acquire(priority, max_wait=max_wait):
+            UPSTREAM_ERRORS.inc(upstream="coingecko", endpoint=label, reason="rate_limited")
+            print(f"🚦 CoinGecko 配額不足，放棄請求: {endpoint}")
+            return None
+
         try:
-            response = await client.get(url, headers=headers, params=params, timeout=15.0)
+            # headers (API key) 與 timeout 已設定在共用連線池上
+            with UPSTREAM_INFLIGHT.track_inprogress(upstream="coingecko"), UPSTREAM_SECONDS.time(upstream="coingecko", endpoint=label):
+                response = await coingecko_http.client.get(url, params=params)
+
+            if response.status_code == 429:
+                UPSTREAM_ERRORS.inc(upstream="coingecko", endpoint=label, reason="http_429")
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                coingecko_limiter.pause(retry_after)
+                # 等待時間在可接受範圍內就排隊重試一次，否則交給快取降級
+                if attempt == 0 and retry_after <= max_wait:
+                    continue
+                print(f"CoinGecko API Error: 429 Too Many Requests (retry after {retry_after:.0f}s)")
+                return None
+
             response.raise_for_status()
             return response.json()
         except httpx.HTTPError as e:
+            UPSTREAM_ERRORS.inc(upstream="coingecko", endpoint=label, reason=type(e).__name__)
             print(f"CoinGecko API Error: {e}")
             return None
 
+    return None
+
+def _cached_coin_price(coin_id: str) -> Optional[Dict[str, Any]]:
+    """讀取個別幣種的價格快取 (由批次查詢與背景預取寫入)，不新鮮時回傳 None"""
+    if not COINGECKO_CACHE_ENABLED:
+        return None
+    entry = coingecko_caches["price"].peek(("coin_price", coin_id))
+    return entry.value if entry and entry.is_fresh() else None
+
+def _store_coin_price(price: Dict[str, Any], ttl: Optional[float] = None):
+    """寫入個別幣種的價格快取與 tick 歷史 (上游失敗時退回的舊資料不寫入)"""
+    if not price.get("id") or price.get("stale"):
+        return
+    tick_store.record_price(price)
+    if COINGECKO_CACHE_ENABLED:
+        coingecko_caches["price"].set(("coin_price", price["id"]), price, ttl=ttl)
+
 async def get_crypto_price(coin_id: str) -> Optional[Dict[str, Any]]:
     """獲取單一加密貨幣的即時價格和市場資訊"""
+    market_popularity.record(coin_id)
+    cached = _cached_coin_price(coin_id)
+    if cached:
+        return cached
+
     data = await fetch_coingecko_data(
         f"/coins/{coin_id}",
         params={
@@ -222,7 +814,7 @@ async def get_crypto_price(coin_id: str) -> Optional[Dict[str, Any]]:
     
     # 提取關鍵市場資料
     market_data = data.get("market_data", {})
-    return {
+    price = {
         "id": data.get("id"),
         "symbol": data.get("symbol", "").upper(),
         "name": data.get("name"),
@@ -245,9 +837,184 @@ async def get_crypto_price(coin_id: str) -> Optional[Dict[str, Any]]:
         "ath_date": market_data.get("ath_date", {}).get("usd"),
         "atl": market_data.get("atl", {}).get("usd"),
         "atl_date": market_data.get("atl_date", {}).get("usd"),
-        "last_updated": data.get("last_updated")
+        "last_updated": data.get("last_updated"),
+        **_stale_fields(data)
+    }
+    _store_coin_price(price)
+    return price
+
+# /coins/markets 每頁最多 250 筆，ids 參數另外限制長度以免超過 URL 上限
+COINGECKO_MARKETS_MAX_IDS = 250
+COINGECKO_IDS_MAX_CHARS = 1500
+
+def _chunk_ids(coin_ids: List[str]) -> List[List[str]]:
+    """依數量與逗號串接後的長度切分 ids (length 為目前 chunk 每個 id 加上一個逗號的長度)"""
+    chunks, chunk, length = [], [], 0
+    for coin_id in coin_ids:
+        if chunk and (len(chunk) >= COINGECKO_MARKETS_MAX_IDS or length + len(coin_id) > COINGECKO_IDS_MAX_CHARS):
+            chunks.append(chunk)
+            chunk, length = [], 0
+        chunk.append(coin_id)
+        length += len(coin_id) + 1
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+async def get_usd_twd_rate(priority: int = Priority.INTERACTIVE) -> Optional[float]:
+    """美元兌新台幣匯率 (由 CoinGecko /exchange_rates 的 BTC 基準匯率換算)"""
+    data = await fetch_coingecko_data("/exchange_rates", priority=priority)
+    rates = (data or {}).get("rates", {})
+    try:
+        return rates["twd"]["value"] / rates["usd"]["value"]
+    except (KeyError, TypeError, ZeroDivisionError):
+        return None
+
+def _market_to_price(item: Dict[str, Any], twd_rate: Optional[float]) -> Dict[str, Any]:
+    """將 /coins/markets 的一筆資料轉成與 get_crypto_price 相同的欄位"""
+    price_usd = item.get("current_price")
+    return {
+        "id": item.get("id"),
+        "symbol": (item.get("symbol") or "").upper(),
+        "name": item.get("name"),
+        "image": item.get("image"),
+        "current_price_usd": price_usd,
+        "current_price_twd": price_usd * twd_rate if price_usd is not None and twd_rate else None,
+        "market_cap_usd": item.get("market_cap"),
+        "market_cap_rank": item.get("market_cap_rank"),
+        "total_volume_usd": item.get("total_volume"),
+        "high_24h_usd": item.get("high_24h"),
+        "low_24h_usd": item.get("low_24h"),
+        "price_change_24h": item.get("price_change_24h"),
+        "price_change_percentage_24h": item.get("price_change_percentage_24h"),
+        "price_change_percentage_7d": item.get("price_change_percentage_7d_in_currency"),
+        "price_change_percentage_30d": item.get("price_change_percentage_30d_in_currency"),
+        "circulating_supply": item.get("circulating_supply"),
+        "total_supply": item.get("total_supply"),
+        "max_supply": item.get("max_supply"),
+        "ath": item.get("ath"),
+        "ath_date": item.get("ath_date"),
+        "atl": item.get("atl"),
+        "atl_date": item.get("atl_date"),
+        "last_updated": item.get("last_updated"),
+        **_stale_fields(item)
     }
 
+async def get_crypto_prices(coin_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    批次獲取多個加密貨幣的價格 (以 id 為 key)
+    一次 /coins/markets 取代 N 次 /coins/{id}，ids 過多時切塊並行請求
+    """
+    prices: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for coin_id in sorted(set(coin_ids)):
+        market_popularity.record(coin_id)
+        # 每個幣的價格也個別快取，新鮮的直接沿用，只對缺少的幣發出請求
+        cached = _cached_coin_price(coin_id)
+        if cached:
+            prices[coin_id] = cached
+        else:
+            missing.append(coin_id)
+
+    # 排序後再切塊，相同的幣種組合會命中同一筆快取
+    chunks = _chunk_ids(missing)
+    if not chunks:
+        return prices
+
+    twd_rate, *pages = await asyncio.gather(
+        get_usd_twd_rate(),
+        *(
+            fetch_coingecko_data(
+                "/coins/markets",
+                params={
+                    "vs_currency": "usd",
+                    "ids": ",".join(chunk),
+                    "per_page": COINGECKO_MARKETS_MAX_IDS,
+                    "price_change_percentage": "24h,7d,30d",
+                }
+            )
+            for chunk in chunks
+        )
+    )
+
+    for page in pages:
+        for item in page or []:
+            if isinstance(item, dict) and item.get("id"):
+                price = _market_to_price(item, twd_rate)
+                prices[item["id"]] = price
+                _store_coin_price(price)
+    return prices
+
+async def get_market_charts(coin_ids: List[str], days: int = INDICATOR_CHART_DAYS) -> Dict[str, tuple]:
+    """並行抓取多個幣的 market_chart，回傳 {coin_id: (秒, 價格)}"""
+    charts = await asyncio.gather(*(
+        fetch_coingecko_data(f"/coins/{coin_id}/market_chart", params={"vs_currency": "usd", "days": days})
+        for coin_id in coin_ids
+    ))
+
+    series = {}
+    for coin_id, chart in zip(coin_ids, charts):
+        parsed = parse_market_chart(chart)
+        if parsed:
+            series[coin_id] = parsed
+    return series
+
+async def get_technical_indicators(coin_ids: List[str], days: int = INDICATOR_CHART_DAYS) -> Dict[str, Dict[str, Any]]:
+    """
+    抓取 market_chart 並批次計算技術指標
+    只回傳精簡摘要，走勢以 LTTB 降採樣到 CHART_LLM_POINTS 個點，不論時間範圍多長 token 數都固定
+    """
+    if not coin_ids:
+        return {}
+    series = await get_market_charts(coin_ids, days)
+    summaries = indicator_engine.update(series)
+    for coin_id, summary in summaries.items():
+        summary["days"] = days
+        summary["trend"] = series_to_points(*downsample_series(*series[coin_id], CHART_LLM_POINTS))
+    return summaries
+
+def build_price_chart(series: Dict[str, tuple]) -> Optional[cl.Plotly]:
+    """
+    以降採樣後的走勢建立 Plotly 圖表
+    多個幣種時改畫相對起點的漲跌幅 (%)，讓價格差距很大的幣也能放在同一張圖比較
+    """
+    if not series or not PLOTLY_AVAILABLE:
+        return None
+    from plotly import graph_objects as go
+
+    figure = go.Figure()
+    compare = len(series) > 1
+    for coin_id, (times, prices) in series.items():
+        times, prices = downsample_series(times, prices, CHART_UI_POINTS)
+        values = (prices / prices[0] - 1) * 100 if compare else prices
+        figure.add_trace(go.Scatter(
+            x=(times * 1000).astype("datetime64[ms]"),
+            y=values,
+            mode="lines",
+            name=coin_id,
+        ))
+    figure.update_layout(
+        yaxis_title="漲跌幅 (%)" if compare else "價格 (USD)",
+        margin={"l": 40, "r": 20, "t": 30, "b": 30},
+        hovermode="x unified",
+    )
+    return cl.Plotly(name="price_chart", figure=figure, display="inline")
+
+async def attach_price_chart(status: StatusMessage, coin_ids: List[str]):
+    """
+    在處理中訊息下方附上走勢圖 (market_chart 已在計算指標時快取，不會重複請求)
+    以背景任務執行，不延遲 LLM 回答
+    """
+    if not (CHARTS_ENABLED and PLOTLY_AVAILABLE and coin_ids):
+        return
+    try:
+        chart = build_price_chart(await get_market_charts(coin_ids))
+        if chart:
+            # 圖表附加在處理中訊息上，需要該訊息已經送出
+            await status.flush()
+            await chart.send(for_id=status.message.id)
+    except Exception as e:
+        print(f"⚠️ 走勢圖建立失敗: {e}")
+
 async def get_trending_coins() -> Optional[list]:
     """獲取當前熱門加密貨幣"""
     data = await fetch_coingecko_data("/search/trending")
@@ -264,7 +1031,8 @@ async def get_trending_coins() -> Optional[list]:
             "symbol": coin.get("symbol"),
             "market_cap_rank": coin.get("market_cap_rank"),
             "price_btc": coin.get("price_btc"),
-            "thumb": coin.get("thumb")
+            "thumb": coin.get("thumb"),
+            **_stale_fields(data)
         })
     
     return trending
@@ -288,15 +1056,33 @@ async def get_nft_data(nft_id: str) -> Optional[Dict[str, Any]]:
         "volume_24h_usd": data.get("volume_24h", {}).get("usd"),
         "total_supply": data.get("total_supply"),
         "number_of_unique_addresses": data.get("number_of_unique_addresses"),
-        "links": data.get("links", {})
+        "links": data.get("links", {}),
+        **_stale_fields(data)
     }
 
 async def search_coingecko(query: str) -> Optional[list]:
-    """在 CoinGecko 搜尋加密貨幣和 NFT"""
+    """
+    在 CoinGecko 搜尋加密貨幣和 NFT
+    本地幣種索引完全符合 (id / 代號 / 名稱) 時直接回傳，不花費網路往返與配額；
+    其餘情況仍查詢 CoinGecko (才有 NFT 與縮圖)，本地的前綴 / 模糊比對結果補在後面，
+    CoinGecko 無法連線時改用本地結果
+    """
+    exact = coin_registry.resolve(query) if COIN_REGISTRY_ENABLED else None
+    if exact:
+        return [_local_search_result(exact)]
+
+    local_results = coin_registry.search(query, limit=5) if COIN_REGISTRY_ENABLED else []
+    if COIN_FUZZY_ENABLED and len(local_results) < 5:
+        # 前綴符合優先，不足的部分以模糊比對結果 (依相似度) 補上
+        for hit in coin_fuzzy.lookup(query, limit=5):
+            coin = coin_registry.get(hit.value)
+            if coin and coin not in local_results and len(local_results) < 5:
+                local_results.append(coin)
+
     data = await fetch_coingecko_data("/search", params={"query": query})
     
     if not data:
-        return None
+        return [_local_search_result(coin) for coin in local_results] or None
     
     results = []
     
@@ -308,8 +1094,17 @@ async def search_coingecko(query: str) -> Optional[list]:
             "name": coin.get("name"),
             "symbol": coin.get("symbol"),
             "market_cap_rank": coin.get("market_cap_rank"),
-            "thumb": coin.get("thumb")
+            "thumb": coin.get("thumb"),
+            **_stale_fields(data)
         })
+
+    # CoinGecko 沒找到的本地結果 (例如拼錯的幣名) 補到 5 筆
+    found = {result["id"] for result in results}
+    for coin in local_results:
+        if len(results) >= 5:
+            break
+        if coin.id not in found:
+            results.append(_local_search_result(coin))
     
     # NFT 結果
     for nft in data.get("nfts", [])[:3]:
@@ -318,13 +1113,403 @@ async def search_coingecko(query: str) -> Optional[list]:
             "id": nft.get("id"),
             "name": nft.get("name"),
             "symbol": nft.get("symbol"),
-            "thumb": nft.get("thumb")
+            "thumb": nft.get("thumb"),
+            **_stale_fields(data)
         })
     
     return results
 
+def _local_search_result(coin: CoinRecord) -> Dict[str, Any]:
+    """本地幣種索引的搜尋結果 (沒有縮圖)"""
+    return {
+        "type": "coin",
+        "id": coin.id,
+        "name": coin.name,
+        "symbol": coin.symbol,
+        "market_cap_rank": coin.rank if coin.rank != UNRANKED else None,
+        "thumb": None
+    }
+
+# ============ 市場資料背景預取 ============
+async def prefetch_markets(ttl: float) -> int:
+    """
+    預取市值前 N 名與近期熱門幣種的價格，寫入個別幣種快取
+    快取存活時間 ttl 會配合下一次預取的間隔，回傳寫入的幣種數
+    """
+    base_params = {"vs_currency": "usd", "price_change_percentage": "24h,7d,30d"}
+    requests = [
+        _fetch_coingecko_raw(
+            "/coins/markets",
+            params={**base_params, "order": "market_cap_desc", "per_page": PREFETCH_TOP_N, "page": 1},
+            priority=Priority.BACKGROUND,
+        )
+    ]
+    # 前 N 名以外但最近常被查詢的幣，另外一次批次取得
+    top_ids = {coin.id for coin in coin_registry.top(PREFETCH_TOP_N)}
+    hot_ids = [coin_id for coin_id in market_popularity.hot(PREFETCH_HOT_COINS) if coin_id not in top_ids]
+    if hot_ids:
+        requests.append(_fetch_coingecko_raw(
+            "/coins/markets",
+            params={**base_params, "ids": ",".join(sorted(hot_ids)), "per_page": COINGECKO_MARKETS_MAX_IDS},
+            priority=Priority.BACKGROUND,
+        ))
+
+    twd_rate, *pages = await asyncio.gather(get_usd_twd_rate(Priority.BACKGROUND), *requests)
+    stored = 0
+    for page in pages:
+        for item in page or []:
+            if isinstance(item, dict) and item.get("id"):
+                _store_coin_price(_market_to_price(item, twd_rate), ttl=ttl)
+                stored += 1
+    return stored
+
+async def prefetch_trending():
+    """預取熱門趨勢，寫入 get_trending_coins 使用的快取"""
+    data = await _fetch_coingecko_raw("/search/trending", priority=Priority.BACKGROUND)
+    if data and COINGECKO_CACHE_ENABLED:
+        coingecko_caches["trending"].set(_coingecko_cache_key("/search/trending"), data)
+
+async def market_prefetch_loop():
+    """背景排程: 依查詢頻率與剩餘配額調整預取間隔"""
+    trending_refreshed_at = 0.0
+    while True:
+        quota = get_coingecko_quota()
+        interval = prefetch_interval.next(
+            market_popularity.requests_per_minute(),
+            quota["tokens_available"] / max(quota["burst"], 1),
+            quota["paused_seconds"],
+        )
+        try:
+            stored = await prefetch_markets(ttl=interval + COINGECKO_PRICE_TTL)
+            if time.monotonic() - trending_refreshed_at >= COINGECKO_TRENDING_TTL * 0.8:
+                await prefetch_trending()
+                trending_refreshed_at = time.monotonic()
+            print(f"🔥 已預取 {stored} 個幣種價格，{interval:.0f} 秒後再次更新")
+        except Exception as e:
+            print(f"⚠️ 市場資料預取失敗: {e}")
+        await asyncio.sleep(interval)
+
+# ============ 本地幣種索引 ============
+coin_registry = CoinRegistry()
+_registered_coin_ids = set()
+
+# 模糊比對時略過的字 (意圖關鍵字與常見英文單字)
+_FUZZY_IGNORE_WORDS = (
+    [word for words in INTENT_KEYWORDS.values() for word in words]
+    + sorted(COMMON_WORDS)
+    + ["what", "much", "about", "today", "current", "tell", "show", "please", "info", "market", "worth"]
+)
+
+def build_coin_fuzzy_index(registry: CoinRegistry):
+    """以幣種索引 + 預設別名 (含中文名稱) 建立模糊比對索引"""
+    return build_coin_index(registry.coins, COIN_KEYWORDS, min_score=COIN_FUZZY_MIN_SCORE)
+
+coin_fuzzy = build_coin_fuzzy_index(coin_registry)
+
+def fuzzy_detect_coins(query: str) -> List[str]:
+    """意圖引擎沒找到幣種時，以模糊比對找出可能拼錯的幣名 (依相似度排序)"""
+    hits = []
+    for term in extract_terms(query, _FUZZY_IGNORE_WORDS):
+        hits.extend(coin_fuzzy.lookup(term, limit=1, max_rank=COIN_FUZZY_DETECT_MAX_RANK))
+    hits.sort(key=lambda hit: (-hit.score, hit.rank))
+    return [hit.value for hit in hits]
+
+def register_registry_coins():
+    """把市值前 N 的幣種加入意圖偵測引擎 (只加入尚未註冊的幣)"""
+    added = 0
+    for coin in coin_registry.top(COIN_REGISTRY_DETECT_TOP_N):
+        if coin.id in _registered_coin_ids:
+            continue
+        # 與常見英文單字相同的幣名 / 代號需要大寫或 coin / token 字樣才算；停用字代號不註冊
+        if coin.name.strip().lower() in COMMON_WORDS:
+            intent_engine.add_common_word(coin.id, coin.name)
+        else:
+            intent_engine.add_coin(coin.id, [coin.name])
+        symbol = coin.symbol.lower()
+        if len(symbol) >= 3 and symbol not in SYMBOL_STOPWORDS:
+            if symbol in COMMON_WORDS:
+                intent_engine.add_common_word(coin.id, symbol)
+            else:
+                intent_engine.add_symbol(coin.id, symbol)
+        _registered_coin_ids.add(coin.id)
+        added += 1
+    if added:
+        print(f"🧭 意圖偵測已加入 {added} 個幣種")
+
+async def refresh_coin_registry() -> bool:
+    """從 CoinGecko 重新建立幣種索引並寫入快照"""
+    coins_list = await _fetch_coingecko_raw("/coins/list", priority=Priority.BACKGROUND)
+    if not coins_list:
+        return False
+
+    # /coins/list 沒有市值，另外取前幾頁市值排名用來排序代號衝突
+    markets = []
+    for page in range(1, COIN_REGISTRY_MARKET_PAGES + 1):
+        data = await _fetch_coingecko_raw(
+            "/coins/markets",
+            params={"vs_currency": "usd", "order": "market_cap_desc", "per_page": 250, "page": page},
+            priority=Priority.BACKGROUND,
+        )
+        if not data:
+            break
+        markets.extend(data)
+
+    def build():
+        registry = CoinRegistry()
+        registry.load_records(CoinRegistry.build_records(coins_list, markets))
+        registry.save_snapshot(COIN_REGISTRY_PATH)
+        return registry, build_coin_fuzzy_index(registry)
+
+    global coin_fuzzy
+    registry, coin_fuzzy = await asyncio.to_thread(build)
+    coin_registry.replace_with(registry)
+    register_registry_coins()
+    print(f"🧭 幣種索引已更新: {len(coin_registry)} 個幣種")
+    return True
+
+async def coin_registry_loop():
+    """啟動時載入快照，之後定期更新幣種索引"""
+    global coin_fuzzy
+    snapshot = CoinRegistry()
+    if await asyncio.to_thread(snapshot.load_snapshot, COIN_REGISTRY_PATH):
+        coin_fuzzy = await asyncio.to_thread(build_coin_fuzzy_index, snapshot)
+        coin_registry.replace_with(snapshot)
+        register_registry_coins()
+        print(f"🧭 已載入幣種索引快照: {len(coin_registry)} 個幣種")
+
+    interval = COIN_REGISTRY_REFRESH_HOURS * 3600
+    while True:
+        wait = interval - coin_registry.age_seconds
+        if wait <= 0:
+            try:
+                wait = interval if await refresh_coin_registry() else 600
+            except Exception as e:
+                print(f"⚠️ 幣種索引更新失敗: {e}")
+                wait = 600
+        await asyncio.sleep(wait)
+
+# 應用程式生命週期
+
+# 背景任務 (保留參考避免被 GC，關閉時統一取消)
+background_tasks = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """建立背景任務並追蹤其生命週期"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def warm_up():
+    """背景預熱重量級 SDK，讓第一則訊息不必等待初始化"""
+    try:
+        await gemini_manager.warm_up()
+        if langfuse_enabled:
+            await asyncio.to_thread(get_client)
+            print("🔥 Langfuse client 預熱完成")
+    except Exception as e:
+        print(f"⚠️ 預熱失敗: {e}")
+
+@cl.on_app_startup
+async def on_app_startup():
+    """應用程式啟動時建立共用連線池並開始背景預熱"""
+    coingecko_http.open()
+    nestjs_http.open()
+    if LAZY_INIT:
+        spawn_background(warm_up())
+    if COIN_REGISTRY_ENABLED:
+        spawn_background(coin_registry_loop())
+    if PREFETCH_ENABLED:
+        spawn_background(market_prefetch_loop())
+    if langfuse_enabled:
+        spawn_background(trace_exporter.run())
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+    """應用程式關閉時取消背景任務並釋放所有上游連線"""
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # 送出佇列中剩下的追蹤事件
+    if langfuse_enabled:
+        await trace_exporter.flush()
+    await coingecko_http.aclose()
+    await nestjs_http.aclose()
+
+# ============ /metrics 端點 ============
+COINGECKO_TOKENS = metrics.gauge("coingecko_rate_tokens", "CoinGecko 速率限制剩餘 token")
+COINGECKO_QUEUED = metrics.gauge("coingecko_rate_queued", "等待 CoinGecko 配額的請求數")
+RESPONSE_CACHE_BYTES = metrics.gauge("response_cache_bytes", "LLM 回答快取使用的位元組")
+RESPONSE_CACHE_ENTRIES = metrics.gauge("response_cache_entries", "LLM 回答快取筆數")
+TRACE_EXPORT_PENDING = metrics.gauge("trace_export_pending", "等待匯出的 Langfuse 事件數")
+TRACE_EXPORT_DROPPED = metrics.gauge("trace_export_dropped", "佇列滿而丟棄的 Langfuse 事件總數")
+TICK_STORE_COINS = metrics.gauge("tick_store_coins", "有 tick 歷史的幣種數")
+LLM_MODEL_CALLS = metrics.gauge("llm_model_calls", "各模型送出的請求總數 (kind: calls / hedge_calls / cancelled_calls)", ["model", "kind"])
+LLM_MODEL_TOKENS = metrics.gauge("llm_model_tokens", "各模型估算的 token 用量總數", ["model", "direction"])
+LLM_HEDGE_RATE = metrics.gauge("llm_hedge_rate", "最近請求中送出 hedge 的比例")
+FAST_PATH_HIT_RATE = metrics.gauge("fast_path_hit_rate", "以模板直接回答 (不經過 LLM) 的訊息比例")
+FAST_PATH_AVG_SECONDS = metrics.gauge("fast_path_avg_seconds", "模板渲染與 LLM 回答的平均耗時", ["path"])
+FAST_PATH_SAVED_SECONDS = metrics.gauge("fast_path_saved_seconds", "快速路徑估計省下的 LLM 時間總和")
+
+def collect_component_metrics():
+    """把其他元件自己維護的統計轉成 gauge (每次輸出前執行)"""
+    quota = get_coingecko_quota()
+    COINGECKO_TOKENS.set(quota["tokens_available"])
+    COINGECKO_QUEUED.set(quota["queued"])
+    RESPONSE_CACHE_BYTES.set(response_cache.size_bytes)
+    RESPONSE_CACHE_ENTRIES.set(len(response_cache))
+    TRACE_EXPORT_PENDING.set(trace_exporter.pending())
+    TRACE_EXPORT_DROPPED.set(trace_exporter.stats["dropped"])
+    TICK_STORE_COINS.set(len(tick_store))
+    for model_name, usage in gemini_manager.costs.snapshot().items():
+        for kind in ("calls", "hedge_calls", "cancelled_calls"):
+            LLM_MODEL_CALLS.set(usage[kind], model=model_name, kind=kind)
+        LLM_MODEL_TOKENS.set(usage["input_tokens"], model=model_name, direction="input")
+        LLM_MODEL_TOKENS.set(usage["output_tokens"], model=model_name, direction="output")
+    LLM_HEDGE_RATE.set(gemini_manager.hedge.hedge_rate)
+    fast_path = fast_path_stats.snapshot()
+    FAST_PATH_HIT_RATE.set(fast_path["fast_path_rate"])
+    if fast_path["avg_render_ms"] is not None:
+        FAST_PATH_AVG_SECONDS.set(fast_path["avg_render_ms"] / 1000, path="render")
+    if fast_path["avg_llm_seconds"] is not None:
+        FAST_PATH_AVG_SECONDS.set(fast_path["avg_llm_seconds"], path="llm")
+    if fast_path["estimated_seconds_saved"] is not None:
+        FAST_PATH_SAVED_SECONDS.set(fast_path["estimated_seconds_saved"])
+
+metrics.add_collector(collect_component_metrics)
+
+def mount_metrics_endpoint():
+    """在 Chainlit 的 FastAPI app 上掛載 /metrics (Prometheus text format)"""
+    from chainlit.server import app as chainlit_app
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse, Response
+
+    async def metrics_endpoint(request: Request):
+        client_host = request.client.host if request.client else ""
+        if not is_allowed(client_host, METRICS_ALLOWED_CIDRS):
+            return PlainTextResponse("forbidden", status_code=403)
+        return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+    chainlit_app.add_api_route(METRICS_PATH, metrics_endpoint, methods=["GET"], include_in_schema=False)
+    # Chainlit 在 import 時就註冊了前端的 catch-all 路由，把 /metrics 移到最前面才不會被它攔截
+    routes = chainlit_app.router.routes
+    routes.insert(0, routes.pop())
+    print(f"📈 指標端點: {METRICS_PATH}")
+
+if METRICS_ENABLED:
+    mount_metrics_endpoint()
+
 # AI 助手邏輯
 
+# 快速路徑統計 (命中率與節省的 LLM 時間)
+fast_path_stats = FastPathStats()
+
+# ============ 多意圖資料來源 ============
+# 搜尋字詞中不具意義的請求用語
+SEARCH_FILLER_WORDS = ["幫我", "一下", "請問", "請", "看看", "for me", "please"]
+
+def extract_search_term(query: str, intents: List[str]) -> str:
+    """去掉搜尋 / NFT 關鍵字與請求用語後剩下的部分作為搜尋字詞"""
+    term = query.lower()
+    for word in SEARCH_FILLER_WORDS:
+        term = term.replace(word, " ")
+    for intent in intents:
+        for word in INTENT_KEYWORDS[intent]:
+            term = term.replace(word, "")
+    return " ".join(term.split())
+
+async def fetch_crypto_source(coin_ids: List[str], wants_analysis: bool, query: str) -> Optional[Dict[str, Any]]:
+    """幣價 (多個幣一次批次請求)，需要時附上技術指標與本地 tick 歷史"""
+    prices, indicators = await asyncio.gather(
+        get_crypto_prices(coin_ids) if len(coin_ids) > 1 else _single_price(coin_ids[0]),
+        get_technical_indicators(coin_ids if wants_analysis else [])
+    )
+    items = [
+        {**prices[coin_id], "technical_indicators": indicators[coin_id]} if coin_id in indicators else prices[coin_id]
+        for coin_id in coin_ids if coin_id in prices
+    ]
+    if not items:
+        return None
+    if len(coin_ids) > 1:
+        return {"crypto_data": items}
+
+    crypto_data = items[0]
+    # 問到短時間窗 (例如「過去一小時波動」) 時，本地 tick 歷史足夠就直接附上
+    window = parse_window_seconds(query)
+    if window:
+        history = tick_store.stats(crypto_data["id"], window)
+        if history and history["coverage_seconds"] >= window * LOCAL_HISTORY_MIN_COVERAGE:
+            crypto_data = {**crypto_data, "local_history": history}
+    return {"crypto_data": crypto_data}
+
+async def _single_price(coin_id: str) -> Dict[str, Dict[str, Any]]:
+    price = await get_crypto_price(coin_id)
+    return {coin_id: price} if price else {}
+
+async def fetch_trending_source() -> Optional[Dict[str, Any]]:
+    trending = await get_trending_coins()
+    return {"trending_coins": trending} if trending else None
+
+async def fetch_watchlist_source(token: str) -> Optional[Dict[str, Any]]:
+    """收藏清單給 LLM 的版本: 整體統計 + 每個幣一列"""
+    watchlist = await get_user_watchlist(token)
+    if not watchlist:
+        return None
+    prices = await get_crypto_prices([item["coinId"] for item in watchlist if item.get("coinId")])
+    snapshot = build_watchlist_snapshot(watchlist, prices)
+    summary_fields = ("count", "priced_count", "advancers", "decliners", "weighted_change_24h", "average_change_24h")
+    return {
+        "watchlist_summary": {field: snapshot[field] for field in summary_fields},
+        "watchlist": [
+            {key: value for key, value in item.items() if key != "stale" or value}
+            for item in snapshot["items"]
+        ],
+    }
+
+async def fetch_nft_source(term: str) -> Optional[Dict[str, Any]]:
+    """以 /search 找出最相關的 NFT 系列並取得地板價等資訊"""
+    if not term:
+        return None
+    data = await fetch_coingecko_data("/search", params={"query": term})
+    nfts = (data or {}).get("nfts") or []
+    if not nfts:
+        return None
+    nft = await get_nft_data(nfts[0]["id"])
+    return {"nft_data": nft} if nft else None
+
+async def fetch_search_source(term: str) -> Optional[Dict[str, Any]]:
+    if not term:
+        return None
+    results = await search_coingecko(term)
+    return {"search_results": results, "query": term} if results else None
+
+def plan_sources(detection, coin_ids: List[str], query: str, token: Optional[str], wants_analysis: bool) -> List[DataSource]:
+    """依偵測到的意圖列出要同時查詢的資料來源"""
+    intents = detection.intents
+    sources = []
+    if "trending" in intents:
+        sources.append(DataSource("trending", fetch_trending_source, ROUTER_SOURCE_TIMEOUT, "熱門趨勢"))
+    if coin_ids and ("price" in intents or wants_analysis or (len(coin_ids) > 1 and "compare" in intents)):
+        sources.append(DataSource(
+            "crypto",
+            lambda: fetch_crypto_source(coin_ids, wants_analysis, query),
+            ROUTER_SLOW_SOURCE_TIMEOUT if wants_analysis else ROUTER_SOURCE_TIMEOUT,
+            ", ".join(coin_ids),
+        ))
+    if "watchlist" in intents and token:
+        sources.append(DataSource("watchlist", lambda: fetch_watchlist_source(token), ROUTER_SOURCE_TIMEOUT, "收藏清單"))
+    if "nft" in intents:
+        term = extract_search_term(query, ["nft", "search"])
+        sources.append(DataSource("nft", lambda: fetch_nft_source(term), ROUTER_SLOW_SOURCE_TIMEOUT, "NFT"))
+    # 「查看收藏清單」、「找熱門的幣」中的 查 / 找 只是動詞：有其他意圖時不另外搜尋
+    if "search" in intents and set(intents) == {"search"}:
+        term = extract_search_term(query, ["search"])
+        sources.append(DataSource("search", lambda: fetch_search_source(term), ROUTER_SOURCE_TIMEOUT, f"搜尋 {term}"))
+    return sources
+
+# 意圖與幣種偵測引擎 (模組載入時建立一次)
+intent_engine = build_default_engine()
+
 @cl.on_chat_start
 async def start():
     """聊天開始時的歡迎訊息"""
@@ -347,147 +1532,142 @@ async def start():
 
 @cl.on_message
 async def main(message: cl.Message):
-    """處理用戶訊息"""
+    """
+    處理用戶訊息
+    意圖偵測後立即開始上游查詢，處理中訊息的送出與狀態更新在背景執行，不阻塞關鍵路徑
+    """
+    timer = StageTimer()
     user_query = message.content
-    user_query_lower = user_query.lower()
     user_token = cl.user_session.get("jwt_token")  # 從 session 獲取 JWT
     user_id = cl.user_session.get("user_id", "anonymous")  # 獲取用戶 ID
 
-    # 建立 Langfuse trace (整個對話的追蹤)
-    langfuse_trace = None
-    if langfuse_enabled and LANGFUSE_AVAILABLE:
-        try:
-            langfuse_client = get_client()
-            langfuse_trace = langfuse_client.trace(
-                name="chat_conversation",
-                user_id=user_id,
-                input=user_query,  # 用戶原始訊息作為 input
-                session_id=cl.user_session.get("id", None),
-                metadata={
-                    "source": "chainlit",
-                    "model": gemini_manager.current_model
-                }
-            )
-        except Exception as lf_err:
-            print(f"⚠️ Langfuse trace 建立失敗: {lf_err}")
+    fast_path_stats.record_message()
+    market_popularity.record_request()
+    MESSAGES_INFLIGHT.inc()
+    # 模型尚未載入 (延遲初始化且預熱未完成) 時立即在背景開始載入，與資料查詢並行
+    if not gemini_manager.is_warm and not gemini_manager.warming:
+        spawn_background(gemini_manager.warm_up())
 
-    # 顯示正在處理的訊息
     processing_msg = cl.Message(content="🔍 正在查詢資料...")
-    await processing_msg.send()
+    status = StatusMessage(processing_msg)
+    langfuse_trace = None
+    fast_path_used = False
+    answer_path = None
 
     try:
-        crypto_data = None
         response = None
 
-        # 檢測是否詢問價格、市場資訊等
-        is_price_query = any(keyword in user_query_lower for keyword in [
-            "價格", "price", "多少", "市值", "市場", "漲", "跌", "波動"
-        ])
-
-        # 檢測是否詢問熱門趨勢
-        is_trending_query = any(keyword in user_query_lower for keyword in [
-            "熱門", "trending", "趨勢", "流行"
-        ])
-
-        # 檢測是否詢問 NFT
-        is_nft_query = any(keyword in user_query_lower for keyword in [
-            "nft", "非同質化代幣", "藝術品"
-        ])
-
-        # 常見加密貨幣 ID 映射
-        crypto_map = {
-            "bitcoin": ["bitcoin", "btc", "比特幣"],
-            "ethereum": ["ethereum", "eth", "以太坊", "以太幣"],
-            "binancecoin": ["bnb", "binance", "幣安幣"],
-            "solana": ["solana", "sol"],
-            "cardano": ["cardano", "ada"],
-            "ripple": ["ripple", "xrp", "瑞波幣"],
-            "dogecoin": ["dogecoin", "doge", "狗狗幣"],
-            "polkadot": ["polkadot", "dot"],
-            "avalanche-2": ["avalanche", "avax"],
-            "chainlink": ["chainlink", "link"]
-        }
+        # 單次掃描偵測所有意圖與幣種
+        detect_start = time.perf_counter()
+        detection = intent_engine.detect(user_query)
+        wants_analysis = INDICATORS_ENABLED and "analysis" in detection.intents
 
         # 識別用戶想查詢的加密貨幣
-        detected_coin = None
-        for coin_id, keywords in crypto_map.items():
-            if any(keyword in user_query_lower for keyword in keywords):
-                detected_coin = coin_id
-                break
-
-        # 處理熱門趨勢查詢
-        if is_trending_query:
-            processing_msg.content = "📊 正在獲取熱門加密貨幣..."
-            await processing_msg.update()
-
-            trending = await get_trending_coins()
-            if trending:
-                response = await generate_ai_response_with_data(
-                    user_query,
-                    {"trending_coins": trending},
-                    user_id,
-                    langfuse_trace
-                )
-
-        # 處理特定加密貨幣查詢
-        elif detected_coin and is_price_query:
-            processing_msg.content = f"💰 正在獲取 {detected_coin} 即時資料..."
-            await processing_msg.update()
-
-            crypto_data = await get_crypto_price(detected_coin)
-            if crypto_data:
-                response = await generate_ai_response_with_data(
-                    user_query,
-                    {"crypto_data": crypto_data},
-                    user_id,
-                    langfuse_trace
-                )
-
-        # 處理收藏清單查詢
-        elif any(keyword in user_query_lower for keyword in ["watchlist", "收藏", "清單", "追蹤"]):
-            response = await handle_watchlist_query(user_token)
-
-        # 處理搜尋查詢
-        elif any(keyword in user_query_lower for keyword in ["search", "搜尋", "找", "查"]) and not is_price_query:
-            # 提取搜尋關鍵字
-            search_term = user_query_lower
-            for word in ["search", "搜尋", "找", "查"]:
-                search_term = search_term.replace(word, "").strip()
-
-            processing_msg.content = f"🔍 正在搜尋 {search_term}..."
-            await processing_msg.update()
-
-            results = await search_coingecko(search_term)
-            if results:
+        detected_coin = detection.coins[0] if detection.coins else None
+        if not detected_coin and COIN_FUZZY_ENABLED:
+            fuzzy_coins = fuzzy_detect_coins(user_query)
+            if fuzzy_coins:
+                detected_coin = fuzzy_coins[0]
+                print(f"🔤 模糊比對幣種: {detected_coin}")
+        INTENT_DETECTION_SECONDS.observe(time.perf_counter() - detect_start)
+
+        coin_ids = detection.coins if len(detection.coins) > 1 else [detected_coin] if detected_coin else []
+        sources = plan_sources(detection, coin_ids, user_query, user_token, wants_analysis)
+        timer.mark("intent")
+
+        # 先開始上游查詢，再送出處理中訊息與建立追蹤
+        watchlist_only = "watchlist" in detection.intents and [source.name for source in sources] in ([], ["watchlist"])
+        fetch_task = None
+        if watchlist_only:
+            # 只問收藏清單：直接渲染快照 (未登入時提示登入)，不需要 LLM
+            fetch_task = asyncio.create_task(handle_watchlist_query(user_token))
+        elif sources:
+            # 所有符合的資料來源同時查詢，部分失敗時仍以取得的資料回答
+            fetch_task = asyncio.create_task(gather_sources(sources))
+            processing_msg.content = f"🔍 正在查詢 {'、'.join(source.label for source in sources)}..."
+        else:
+            processing_msg.content = "🤔 正在思考..."
+        timer.mark("fetch_started")
+
+        status.send()
+        langfuse_trace = start_langfuse_trace(user_id, user_query)
+
+        if watchlist_only:
+            response = await fetch_task
+            timer.mark("data_ready")
+            answer_path = "watchlist"
+
+        elif fetch_task is not None:
+            results = await fetch_task
+            timer.mark("data_ready")
+            print(f"🧭 資料來源: {describe_results(results)}")
+            for result in results.values():
+                DATA_SOURCE_SECONDS.observe(result.elapsed, source=result.name, status=result.status)
+            data, unavailable = merge_results(results)
+            if "watchlist" in detection.intents and not user_token:
+                unavailable.append("watchlist: 用戶未登入")
+
+            crypto_data = data.get("crypto_data")
+            crypto_items = crypto_data if isinstance(crypto_data, list) else [crypto_data] if crypto_data else []
+            chart_coins = [item["id"] for item in crypto_items if "technical_indicators" in item]
+            if chart_coins:
+                spawn_background(attach_price_chart(status, chart_coins))
+
+            if FAST_PATH_ENABLED and can_use_fast_path(data, unavailable, user_query):
+                # 單純查價：直接以模板渲染，省下整個 LLM 往返
+                renderer = render_price_table if isinstance(crypto_data, list) else render_price
+                response = timed_render(crypto_data, fast_path_stats, renderer)
+                fast_path_used = True
+                answer_path = "fast_path"
+            elif data:
+                if unavailable:
+                    data["unavailable_sources"] = unavailable
+                if crypto_data:
+                    intent = "analysis" if wants_analysis else "compare" if isinstance(crypto_data, list) else "price"
+                else:
+                    intent = None
+                # 串流會直接寫入訊息內容，開始前等待進行中的狀態更新完成
+                await status.close()
+                answer_path = "llm_data"
                 response = await generate_ai_response_with_data(
                     user_query,
-                    {"search_results": results, "query": search_term},
+                    data,
                     user_id,
-                    langfuse_trace
+                    langfuse_trace,
+                    stream_msg=processing_msg,
+                    intent=intent
                 )
 
         # 如果沒有特定處理,使用 AI 通用回答
         if not response:
-            processing_msg.content = "🤔 正在思考..."
-            await processing_msg.update()
-            response = await generate_ai_response(user_query, user_id=user_id, parent_trace=langfuse_trace)
-
-        # 更新訊息內容
+            answer_path = "llm_general"
+            status.set("🤔 正在思考...")
+            await status.close()
+            response = await generate_ai_response(user_query, user_id=user_id, parent_trace=langfuse_trace, stream_msg=processing_msg)
+        timer.mark("response_ready")
+
+        # 更新訊息內容 (串流模式下也會結束串流狀態)
+        await status.close()
         processing_msg.content = response
         await processing_msg.update()
+        timer.mark("done")
+        for stage, ms in timer.marks.items():
+            MESSAGE_STAGE_SECONDS.observe(ms / 1000, stage=stage)
+        MESSAGES_TOTAL.inc(path=answer_path)
+        print(f"⏱️ {timer.summary()} (狀態更新 {status.updates_sent} 次，合併 {status.updates_coalesced} 次)")
 
-        # 更新 Langfuse trace 的 output 並 flush
+        # 更新 Langfuse trace 的 output (由背景匯出器送出，不在請求路徑上 flush)
         if langfuse_trace:
             try:
-                langfuse_trace.update(output=response)
-                # 確保數據被發送到 Langfuse 伺服器
-                langfuse_client = get_client()
-                langfuse_client.flush()
+                langfuse_trace.update(output=response, metadata={"fast_path": fast_path_used, "stage_ms": timer.marks})
             except Exception as lf_err:
                 print(f"⚠️ Langfuse trace 更新失敗: {lf_err}")
 
     except Exception as e:
+        MESSAGES_TOTAL.inc(path="error")
         error_message = f"❌ 抱歉，發生錯誤: {str(e)}"
+        status.send()
+        await status.close()
         processing_msg.content = error_message
         await processing_msg.update()
 
@@ -496,11 +1676,33 @@ async def main(message: cl.Message):
             try:
                 langfuse_trace.update(
                     output=error_message,
-                    metadata={"error": str(e), "status": "error"}
+                    metadata={"error": str(e), "status": "error", "stage_ms": timer.marks}
                 )
             except:
                 pass
 
+    finally:
+        MESSAGES_INFLIGHT.dec()
+
+def start_langfuse_trace(user_id: str, user_query: str):
+    """建立 Langfuse trace (整個對話的追蹤)，未啟用、未取樣或失敗時回傳 None"""
+    if not (langfuse_enabled and LANGFUSE_AVAILABLE):
+        return None
+    try:
+        return trace_exporter.trace(
+            name="chat_conversation",
+            user_id=user_id,
+            input=user_query,  # 用戶原始訊息作為 input
+            session_id=cl.user_session.get("id", None),
+            metadata={
+                "source": "chainlit",
+                "model": gemini_manager.current_model
+            }
+        )
+    except Exception as lf_err:
+        print(f"⚠️ Langfuse trace 建立失敗: {lf_err}")
+        return None
+
 # 查詢處理函數
 
 async def handle_coin_query(coin_id: str) -> str:
@@ -530,7 +1732,7 @@ async def handle_coin_query(coin_id: str) -> str:
     return response
 
 async def handle_watchlist_query(token: Optional[str]) -> str:
-    """處理 watchlist 查詢"""
+    """處理 watchlist 查詢 (整份清單一次批次取價並計算整體漲跌)"""
     if not token:
         return "⚠️ 請先登入才能查看收藏清單。"
     
@@ -539,14 +1741,8 @@ async def handle_watchlist_query(token: Optional[str]) -> str:
     if not watchlist or len(watchlist) == 0:
         return "📋 你的收藏清單目前是空的。\n\n試試搜尋你感興趣的加密貨幣並加入收藏吧！"
     
-    response = "📋 **你的收藏清單**\n\n"
-    for idx, item in enumerate(watchlist[:10], 1):  # 最多顯示10個
-        response += f"{idx}. {item['coinName']} ({item['symbol'].upper()})\n"
-    
-    if len(watchlist) > 10:
-        response += f"\n... 還有 {len(watchlist) - 10} 個收藏"
-    
-    return response
+    prices = await get_crypto_prices([item["coinId"] for item in watchlist if item.get("coinId")])
+    return render_watchlist_snapshot(build_watchlist_snapshot(watchlist, prices))
 
 async def handle_search_query(query: str) -> str:
     """處理搜尋查詢"""
@@ -562,24 +1758,127 @@ async def handle_search_query(query: str) -> str:
     return response
 
 # Langfuse v3 整合 - 使用 parent_trace 串聯追蹤
-async def generate_ai_response(query: str, user_id: str = None, parent_trace=None) -> str:
+async def generate_ai_response(query: str, user_id: str = None, parent_trace=None, stream_msg: Optional[cl.Message] = None) -> str:
     """使用 Google Gemini 生成 AI 回答"""
-    return await _generate_ai_response_impl(query, user_id, parent_trace)
-
-async def generate_ai_response_with_data(query: str, data: Dict[str, Any], user_id: str = None, parent_trace=None) -> str:
-    """使用 Google Gemini 生成 AI 回答,並帶入即時資料"""
-    return await _generate_ai_response_with_data_impl(query, data, user_id, parent_trace)
+    key = ResponseKey(normalize_query(query), "general", (), "")
+    cached = await _cached_response(key, parent_trace)
+    if cached is not None:
+        return cached
+    response_text = await _generate_ai_response_impl(query, user_id, parent_trace, stream_msg)
+    await _store_response(key, response_text, RESPONSE_CACHE_GENERAL_TTL)
+    return response_text
+
+async def generate_ai_response_with_data(query: str, data: Dict[str, Any], user_id: str = None, parent_trace=None, stream_msg: Optional[cl.Message] = None, intent: Optional[str] = None) -> str:
+    """使用 Google Gemini 生成 AI 回答,並帶入即時資料 (intent 決定 crypto_data 保留哪些欄位)"""
+    key = ResponseKey(
+        normalize_query(query),
+        intent or ",".join(sorted(data)),
+        _response_coins(data),
+        market_fingerprint(data),
+    )
+    cached = await _cached_response(key, parent_trace)
+    if cached is not None:
+        return cached
+    response_text = await _generate_ai_response_with_data_impl(query, data, user_id, parent_trace, stream_msg, intent)
+    # stale 資料的回答不快取 (CoinGecko 恢復後應該重新回答)
+    if not _has_stale(data):
+        await _store_response(key, response_text, _response_ttl(data))
+    return response_text
+
+# ============ LLM 回答快取 ============
+async def embed_query(text: str) -> List[float]:
+    """以 Gemini embedding 模型取得問題向量 (同步 SDK，放到 thread 執行)"""
+    def embed() -> Dict[str, Any]:
+        # get_genai 第一次呼叫會 import SDK 並持有 lock，一併放在 thread 中
+        return get_genai().embed_content(model=GEMINI_EMBEDDING_MODEL, content=text, task_type="semantic_similarity")
+
+    result = await asyncio.to_thread(embed)
+    return result["embedding"]
+
+if RESPONSE_CACHE_SEMANTIC:
+    response_cache.embed = embed_query
+
+def _response_coins(data: Dict[str, Any]) -> tuple:
+    crypto_data = data.get("crypto_data")
+    items = crypto_data if isinstance(crypto_data, list) else [crypto_data] if crypto_data else []
+    return tuple(sorted(item["id"] for item in items if isinstance(item, dict) and item.get("id")))
+
+def _has_stale(value: Any) -> bool:
+    if isinstance(value, dict):
+        return bool(value.get("stale")) or any(_has_stale(child) for child in value.values())
+    if isinstance(value, list):
+        return any(_has_stale(item) for item in value)
+    return False
+
+def _response_ttl(data: Dict[str, Any]) -> float:
+    """回答的 TTL 取決於資料中更新最頻繁的部分"""
+    ttls = []
+    if "crypto_data" in data:
+        # 價格分桶已經讓價格明顯變動時換 key，TTL 只需涵蓋幾個價格更新週期
+        ttls.append(COINGECKO_PRICE_TTL * 2)
+    if "trending_coins" in data:
+        ttls.append(COINGECKO_TRENDING_TTL)
+    if "search_results" in data:
+        ttls.append(600)
+    if "watchlist" in data:
+        ttls.append(WATCHLIST_CACHE_TTL)
+    if "nft_data" in data:
+        ttls.append(300)
+    return min(ttls) if ttls else RESPONSE_CACHE_GENERAL_TTL
+
+async def _cached_response(key: ResponseKey, parent_trace=None) -> Optional[str]:
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    cached = await response_cache.get(key)
+    CACHE_LOOKUPS.inc(cache="llm_response", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        print(f"💾 LLM 回答快取命中 ({key.intent}, {','.join(key.coins) or '-'})")
+        if parent_trace:
+            try:
+                parent_trace.update(metadata={"response_cache": "hit"})
+            except Exception:
+                pass
+    return cached
 
-async def _generate_ai_response_with_data_impl(query: str, data: Dict[str, Any], user_id: str = None, parent_trace=None) -> str:
-    """AI 回答生成的實際實作 (帶即時資料)"""
-    start_time = time.time()
-    langfuse_generation = None
+async def _store_response(key: ResponseKey, response_text: str, ttl: float):
+    # 錯誤訊息不快取
+    if RESPONSE_CACHE_ENABLED and response_text and not response_text.startswith("❌"):
+        await response_cache.set(key, response_text, ttl)
 
-    try:
-        import json
+async def _generate_text(full_prompt: str, stream_msg: Optional[cl.Message] = None) -> tuple:
+    """
+    調用 Gemini 取得完整回答
+    有傳入 stream_msg 且啟用串流時，會把 token 逐段串流到該訊息
 
-        # 建立系統提示詞
-        system_prompt = """你是一位專業的加密貨幣投資顧問，名叫 Crypto Assistant。
+    Returns:
+        (回答文字, 首個 token 的時間點)
+    """
+    start = time.perf_counter()
+    with LLM_INFLIGHT.track_inprogress():
+        if stream_msg is None or not GEMINI_STREAMING:
+            response = await gemini_model.generate_content_async(full_prompt)
+            text, first_token_at = response.text, datetime.now()
+            LLM_TTFT_SECONDS.observe(time.perf_counter() - start)
+        else:
+            first_token_at = None
+            parts = []
+            async for token in gemini_model.stream_content_async(full_prompt):
+                if first_token_at is None:
+                    first_token_at = datetime.now()
+                    LLM_TTFT_SECONDS.observe(time.perf_counter() - start)
+                    # 第一個 token 到達時清掉「正在思考」的提示文字
+                    stream_msg.content = ""
+                parts.append(token)
+                await stream_msg.stream_token(token)
+            text = "".join(parts)
+
+    duration = time.perf_counter() - start
+    LLM_GENERATION_SECONDS.observe(duration)
+    fast_path_stats.record_llm(duration)
+    return text, first_token_at
+
+# 帶即時資料回答時的系統提示詞 (欄位說明由 prompt_builder 依資料內容附加)
+MARKET_DATA_SYSTEM_PROMPT = """你是一位專業的加密貨幣投資顧問，名叫 Crypto Assistant。
 你的特點：
 - 用繁體中文回答
 - 專業但友善
@@ -595,12 +1894,15 @@ async def _generate_ai_response_with_data_impl(query: str, data: Dict[str, Any],
 - 適時提醒投資風險
 """
 
-        # 格式化資料為易讀文字
-        data_text = "\n\n--- 即時市場資料 (來自 CoinGecko) ---\n"
-        data_text += json.dumps(data, ensure_ascii=False, indent=2)
+async def _generate_ai_response_with_data_impl(query: str, data: Dict[str, Any], user_id: str = None, parent_trace=None, stream_msg: Optional[cl.Message] = None, intent: Optional[str] = None) -> str:
+    """AI 回答生成的實際實作 (帶即時資料)"""
+    start_time = time.time()
+    langfuse_generation = None
 
-        # 組合完整的提示詞
-        full_prompt = f"{system_prompt}\n\n用戶問題: {query}{data_text}\n\n請根據以上即時資料,用專業且友善的方式回答用戶問題。"
+    try:
+        # 依意圖投影欄位並以精簡格式編碼資料 (只附上實際出現欄位的說明)
+        built_prompt = build_data_prompt(MARKET_DATA_SYSTEM_PROMPT, query, data, intent)
+        full_prompt = built_prompt.text
 
         # Langfuse v3 追蹤 - 使用 parent_trace 建立 generation (子項)
         if langfuse_enabled and LANGFUSE_AVAILABLE and parent_trace:
@@ -612,27 +1914,33 @@ async def _generate_ai_response_with_data_impl(query: str, data: Dict[str, Any],
                     metadata={
                         "query": query,
                         "has_market_data": True,
-                        "data_keys": list(data.keys())
+                        "data_keys": list(data.keys()),
+                        "intent": intent,
+                        "prompt_tokens_estimate": built_prompt.tokens,
+                        "data_tokens_estimate": built_prompt.data_tokens
                     }
                 )
             except Exception as lf_err:
                 print(f"⚠️ Langfuse generation 建立失敗: {lf_err}")
 
         # 調用 Gemini API
-        response = gemini_model.generate_content(full_prompt)
-        response_text = response.text
+        response_text, first_token_at = await _generate_text(full_prompt, stream_msg)
 
-        # 計算執行時間
+        # 計算執行時間 (首個 token 與完整回答分開記錄)
         duration = time.time() - start_time
+        time_to_first_token = first_token_at.timestamp() - start_time
 
         # 更新 Langfuse generation
         if langfuse_generation:
             try:
                 langfuse_generation.end(
                     output=response_text,
+                    completion_start_time=first_token_at,
                     metadata={
                         "status": "success",
                         "response_length": len(response_text),
+                        "streaming": stream_msg is not None and GEMINI_STREAMING,
+                        "time_to_first_token_seconds": round(time_to_first_token, 2),
                         "duration_seconds": round(duration, 2),
                         "model_used": gemini_manager.current_model
                     }
@@ -662,7 +1970,7 @@ async def _generate_ai_response_with_data_impl(query: str, data: Dict[str, Any],
 
         return error_message
 
-async def _generate_ai_response_impl(query: str, user_id: str = None, parent_trace=None) -> str:
+async def _generate_ai_response_impl(query: str, user_id: str = None, parent_trace=None, stream_msg: Optional[cl.Message] = None) -> str:
     """AI 回答生成的實際實作"""
     start_time = time.time()
     langfuse_generation = None
@@ -694,20 +2002,23 @@ async def _generate_ai_response_impl(query: str, user_id: str = None, parent_tra
                 print(f"⚠️ Langfuse generation 建立失敗: {lf_err}")
 
         # 調用 Gemini API
-        response = gemini_model.generate_content(full_prompt)
-        response_text = response.text
+        response_text, first_token_at = await _generate_text(full_prompt, stream_msg)
 
-        # 計算執行時間
+        # 計算執行時間 (首個 token 與完整回答分開記錄)
         duration = time.time() - start_time
+        time_to_first_token = first_token_at.timestamp() - start_time
 
         # 更新 Langfuse generation
         if langfuse_generation:
             try:
                 langfuse_generation.end(
                     output=response_text,
+                    completion_start_time=first_token_at,
                     metadata={
                         "status": "success",
                         "response_length": len(response_text),
+                        "streaming": stream_msg is not None and GEMINI_STREAMING,
+                        "time_to_first_token_seconds": round(time_to_first_token, 2),
                         "duration_seconds": round(duration, 2),
                         "model_used": gemini_manager.current_model
                     }
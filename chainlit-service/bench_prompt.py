@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Prompt 格式基準測試腳本
+以典型的市場資料比較原本的 json.dumps(indent=2) 與 prompt_builder 精簡格式的 token 數與組裝時間，
+加上 --live 時實際呼叫 Gemini 比較回應延遲
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# 基準測試不需要背景任務與 Langfuse
+os.environ.setdefault("LAZY_INIT", "true")
+
+import app
+from hedging import estimate_tokens
+from indicators import IndicatorEngine
+from prompt_builder import DATA_NOTES, build_data_prompt, legacy_data_prompt
+from downsample import downsample_series, series_to_points
+
+
+def sample_market(coin_id: str, symbol: str, price: float, rank: int) -> dict:
+    """/coins/markets 格式的範例資料"""
+    return {
+        "id": coin_id, "symbol": symbol, "name": coin_id.title(),
+        "image": f"https://coin-images.coingecko.com/coins/images/1/large/{coin_id}.png",
+        "current_price": price, "market_cap": price * 19_700_000.123, "market_cap_rank": rank,
+        "total_volume": price * 512_345.678, "high_24h": price * 1.0213, "low_24h": price * 0.9788,
+        "price_change_24h": price * 0.0123456, "price_change_percentage_24h": 1.234567,
+        "price_change_percentage_7d_in_currency": -3.4567891, "price_change_percentage_30d_in_currency": 12.3456789,
+        "circulating_supply": 19_700_000.0, "total_supply": 21_000_000.0, "max_supply": None,
+        "ath": price * 1.15, "ath_date": "2024-03-14T07:10:36.635Z",
+        "atl": price * 0.001, "atl_date": "2013-07-06T00:00:00.000Z",
+        "last_updated": "2024-05-01T12:00:00.000Z",
+    }
+
+
+def sample_indicators(coin_ids: list) -> dict:
+    rng = np.random.default_rng(0)
+    times = np.arange(721) * 3600.0 + 1.7e9
+    series = {coin_id: (times, 100 * np.exp(np.cumsum(rng.normal(0, 0.01, times.size)))) for coin_id in coin_ids}
+    summaries = IndicatorEngine().update(series)
+    for coin_id, summary in summaries.items():
+        summary["days"] = 30
+        summary["trend"] = series_to_points(*downsample_series(*series[coin_id], app.CHART_LLM_POINTS))
+    return summaries
+
+
+def scenarios() -> list:
+    """(名稱, 問題, 資料, 意圖)"""
+    coins = [("bitcoin", "btc", 63012.53, 1), ("ethereum", "eth", 3012.42, 2), ("solana", "sol", 145.67, 5)]
+    prices = [app._market_to_price(sample_market(*coin), 32.15) for coin in coins]
+    indicators = sample_indicators([coin[0] for coin in coins])
+    return [
+        ("單一幣種查價", "BTC 現在值得買嗎？", {"crypto_data": prices[0]}, "price"),
+        ("多幣種比較", "比較 BTC ETH SOL", {"crypto_data": prices}, "compare"),
+        ("走勢分析", "分析 BTC 走勢", {"crypto_data": {**prices[0], "technical_indicators": indicators["bitcoin"]}}, "analysis"),
+        ("多幣種走勢分析", "分析 BTC ETH SOL 走勢", {
+            "crypto_data": [{**price, "technical_indicators": indicators[price["id"]]} for price in prices]
+        }, "analysis"),
+        ("熱門趨勢", "現在熱門的幣有哪些？", {"trending_coins": [
+            {"id": f"coin-{i}", "name": f"Coin {i}", "symbol": f"C{i}", "market_cap_rank": 100 + i,
+             "price_btc": 0.0000012345678 * (i + 1), "thumb": f"https://example.com/thumb/{i}.png"}
+            for i in range(10)
+        ]}, None),
+    ]
+
+
+def measure_build(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+async def measure_live(prompt: str, runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await app.gemini_manager.generate_content_async(prompt)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="市場資料 prompt 格式基準測試")
+    parser.add_argument("--runs", type=int, default=200, help="組裝時間的測試次數")
+    parser.add_argument("--live", action="store_true", help="實際呼叫 Gemini 比較延遲 (需要 GEMINI_API_KEY)")
+    parser.add_argument("--live-runs", type=int, default=3, help="每種格式實際呼叫的次數")
+    args = parser.parse_args()
+
+    # 原本的系統提示詞固定包含所有欄位說明
+    legacy_system = app.MARKET_DATA_SYSTEM_PROMPT.rstrip("\n").replace(
+        "- 適時提醒投資風險", "\n".join(DATA_NOTES.values()) + "\n- 適時提醒投資風險"
+    ) + "\n"
+
+    print("=" * 72)
+    print("🧾 Prompt 格式基準測試 (token 為估計值)")
+    print("=" * 72)
+    print(f"{'情境':<12}{'原格式 tokens':>14}{'精簡 tokens':>12}{'減少':>8}{'原格式 µs':>12}{'精簡 µs':>10}")
+
+    totals = [0, 0]
+    live_results = []
+    for name, query, data, intent in scenarios():
+        legacy = legacy_data_prompt(legacy_system, query, data)
+        built = build_data_prompt(app.MARKET_DATA_SYSTEM_PROMPT, query, data, intent)
+        legacy_tokens = estimate_tokens(legacy)
+        totals[0] += legacy_tokens
+        totals[1] += built.tokens
+        legacy_us = measure_build(lambda: legacy_data_prompt(legacy_system, query, data), args.runs)
+        built_us = measure_build(lambda: build_data_prompt(app.MARKET_DATA_SYSTEM_PROMPT, query, data, intent), args.runs)
+        print(
+            f"{name:<12}{legacy_tokens:>14}{built.tokens:>12}"
+            f"{(1 - built.tokens / legacy_tokens) * 100:>7.0f}%{legacy_us:>12.0f}{built_us:>10.0f}"
+        )
+        if args.live:
+            live_results.append((name, legacy, built.text))
+
+    print("-" * 72)
+    print(f"⏬ 總 token: {totals[0]} → {totals[1]} (減少 {(1 - totals[1] / totals[0]) * 100:.0f}%)")
+
+    if live_results:
+        if not app.GEMINI_API_KEY:
+            print("❌ 未設定 GEMINI_API_KEY，略過實際延遲測試")
+            sys.exit(1)
+        print("-" * 72)
+        print("⏱️ Gemini 回應延遲 (中位數)")
+        for name, legacy, compact in live_results:
+            legacy_seconds = asyncio.run(measure_live(legacy, args.live_runs))
+            compact_seconds = asyncio.run(measure_live(compact, args.live_runs))
+            print(f"{name:<12} 原格式 {legacy_seconds:.2f}s → 精簡 {compact_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+啟動時間基準測試腳本
+在乾淨的子程序中重複 import app，比較延遲初始化與立即初始化的冷啟動時間
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app; "
+    "print(f'__IMPORT_SECONDS__={time.perf_counter() - start:.4f}')"
+)
+
+
+def measure(lazy: bool, runs: int) -> list:
+    """在子程序中 import app 多次，回傳每次的 import 秒數"""
+    env = dict(os.environ, LAZY_INIT="true" if lazy else "false")
+    timings = []
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        for line in result.stdout.splitlines():
+            if line.startswith("__IMPORT_SECONDS__="):
+                timings.append(float(line.split("=", 1)[1]))
+                break
+        else:
+            print(result.stderr)
+            raise RuntimeError("import app 失敗")
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chainlit 服務冷啟動基準測試")
+    parser.add_argument("--runs", type=int, default=5, help="每種模式的測試次數")
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=float(os.getenv("STARTUP_TARGET_SECONDS", "2.0")),
+        help="延遲初始化模式的目標 import 秒數 (中位數)",
+    )
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🚀 冷啟動基準測試 (import app)")
+    print("=" * 60)
+
+    results = {}
+    for label, lazy in (("延遲初始化", True), ("立即初始化", False)):
+        timings = measure(lazy, args.runs)
+        results[lazy] = statistics.median(timings)
+        print(
+            f"{label}: 中位數 {results[lazy]:.3f}s "
+            f"(最快 {min(timings):.3f}s / 最慢 {max(timings):.3f}s, {args.runs} 次)"
+        )
+
+    saved = results[False] - results[True]
+    print("-" * 60)
+    print(f"⏱️ 延遲初始化節省: {saved:.3f}s ({saved / results[False] * 100:.0f}%)")
+
+    if results[True] > args.target:
+        print(f"❌ 超過目標 {args.target:.2f}s")
+        sys.exit(1)
+    print(f"✅ 在目標 {args.target:.2f}s 內")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+記憶體快取
+提供有容量上限的 LRU + TTL 快取，以及 stale-while-revalidate 的讀取流程
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+
+class CacheStatus:
+    """快取查詢結果的狀態"""
+    FRESH = "fresh"              # 在 TTL 內，直接回傳
+    STALE = "stale"              # 超過 TTL 但仍在 stale 視窗內，回傳舊值並在背景更新
+    MISS = "miss"                # 沒有可用的快取，已向上游取得新資料
+    STALE_ERROR = "stale_error"  # 上游失敗，改用過期的舊資料
+
+
+class CacheEntry:
+    """單一快取項目"""
+
+    __slots__ = ("value", "stored_at", "ttl", "stale_ttl")
+
+    def __init__(self, value: Any, ttl: float, stale_ttl: float, stored_at: Optional[float] = None):
+        self.value = value
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stored_at = time.monotonic() if stored_at is None else stored_at
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.monotonic() if now is None else now) - self.stored_at
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return self.age(now) <= self.ttl
+
+    def is_revalidatable(self, now: Optional[float] = None) -> bool:
+        return self.age(now) <= self.ttl + self.stale_ttl
+
+
+class CacheLookup(NamedTuple):
+    """get_or_load 的回傳結果"""
+    value: Any
+    status: str
+    age: float
+
+
+class TTLCache:
+    """
+    有容量上限的 LRU 快取，每個項目帶有自己的 TTL
+    超過容量時淘汰最久未使用的項目
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get_entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """取得快取項目 (不論是否過期)，並標記為最近使用"""
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """取得仍在 TTL 內的值"""
+        entry = self.get_entry(key)
+        if entry is None or not entry.is_fresh():
+            return default
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        """寫入快取，必要時淘汰最久未使用的項目"""
+        self._data[key] = CacheEntry(
+            value,
+            self.ttl if ttl is None else ttl,
+            self.stale_ttl if stale_ttl is None else stale_ttl,
+        )
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class StaleWhileRevalidateCache:
+    """
+    stale-while-revalidate 快取
+    - TTL 內: 直接回傳
+    - stale 視窗內: 立即回傳舊值，同時在背景向上游更新
+    - 無快取或太舊: 等待上游
+    - 上游失敗: 若有不超過 max_stale_on_error 的舊值，改回傳舊值
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 256,
+        ttl: float = 60.0,
+        stale_ttl: float = 60.0,
+        max_stale_on_error: float = 3600.0,
+    ):
+        self.name = name
+        self.max_stale_on_error = max_stale_on_error
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, stale_ttl=stale_ttl)
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {status: 0 for status in (
+            CacheStatus.FRESH, CacheStatus.STALE, CacheStatus.MISS, CacheStatus.STALE_ERROR
+        )}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """直接寫入快取 (例如由背景預取填入)"""
+        self._cache.set(key, value, ttl=ttl)
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """查看快取項目但不觸發更新"""
+        return self._cache.get_entry(key)
+
+    def invalidate(self, key: Hashable):
+        self._cache.delete(key)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        revalidate_loader: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> CacheLookup:
+        """
+        讀取快取，必要時透過 loader 向上游取得
+        loader 回傳 None 代表上游失敗，不會被寫入快取；
+        revalidate_loader 用於背景更新 (例如以較低優先順序取得)，未指定時使用 loader
+        """
+        now = time.monotonic()
+        entry = self._cache.get_entry(key)
+
+        if entry is not None and entry.is_fresh(now):
+            self.stats[CacheStatus.FRESH] += 1
+            return CacheLookup(entry.value, CacheStatus.FRESH, entry.age(now))
+
+        if entry is not None and entry.is_revalidatable(now):
+            self.stats[CacheStatus.STALE] += 1
+            self._schedule_revalidate(key, revalidate_loader or loader, ttl)
+            return CacheLookup(entry.value, CacheStatus.STALE, entry.age(now))
+
+        value = await loader()
+        if value is not None:
+            self._cache.set(key, value, ttl=ttl)
+            self.stats[CacheStatus.MISS] += 1
+            return CacheLookup(value, CacheStatus.MISS, 0.0)
+
+        # 上游失敗，退而求其次使用舊資料
+        if entry is not None and entry.age() <= self.max_stale_on_error:
+            self.stats[CacheStatus.STALE_ERROR] += 1
+            print(f"♻️ {self.name} 上游失敗，使用 {entry.age():.0f} 秒前的快取資料")
+            return CacheLookup(entry.value, CacheStatus.STALE_ERROR, entry.age())
+
+        self.stats[CacheStatus.MISS] += 1
+        return CacheLookup(None, CacheStatus.MISS, 0.0)
+
+    def _schedule_revalidate(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float]):
+        """在背景更新快取，同一個 key 同時只會有一個更新任務"""
+        if key in self._refreshing:
+            return
+
+        async def revalidate():
+            try:
+                value = await loader()
+                if value is not None:
+                    self._cache.set(key, value, ttl=ttl)
+            except Exception as e:
+                print(f"⚠️ {self.name} 背景更新失敗 ({key}): {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(revalidate())
@@ -0,0 +1,174 @@
+"""
+本地幣種索引
+由 CoinGecko /coins/list (+ /coins/markets 的市值排名) 建立，
+可依 id、代號、名稱查詢與前綴搜尋，並以 gzip JSON 快照加速啟動
+"""
+
+import bisect
+import gzip
+import heapq
+import json
+import os
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# 沒有市值排名的幣排在最後
+UNRANKED = 10 ** 9
+
+
+class CoinRecord(NamedTuple):
+    id: str
+    symbol: str
+    name: str
+    rank: int  # 市值排名，UNRANKED 表示未知
+
+
+class CoinRegistry:
+    """
+    幣種索引
+    - 代號衝突 (例如多個幣都叫 "ETH") 依市值排名排序
+    - 前綴搜尋使用排序後的 key 陣列 + 二分搜尋 (攤平的 trie)，比逐節點 dict 省記憶體
+    """
+
+    def __init__(self):
+        self.coins: List[CoinRecord] = []
+        self.fetched_at: float = 0.0
+        self._by_id: Dict[str, int] = {}
+        self._by_symbol: Dict[str, List[int]] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._prefix_keys: List[str] = []
+        self._prefix_values: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.coins)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.fetched_at if self.fetched_at else float("inf")
+
+    def load_records(self, records: Iterable[CoinRecord], fetched_at: Optional[float] = None):
+        """以新的資料重建所有索引"""
+        coins = sorted(records, key=lambda coin: (coin.rank, coin.id))
+        by_id: Dict[str, int] = {}
+        by_symbol: Dict[str, List[int]] = {}
+        by_name: Dict[str, List[int]] = {}
+        prefix_pairs = []
+
+        for index, coin in enumerate(coins):
+            symbol = coin.symbol.lower()
+            name = coin.name.lower()
+            by_id[coin.id] = index
+            by_symbol.setdefault(symbol, []).append(index)
+            by_name.setdefault(name, []).append(index)
+            for key in {symbol, name, coin.id}:
+                if key:
+                    prefix_pairs.append((key, index))
+
+        prefix_pairs.sort()
+        self.coins = coins
+        self.fetched_at = fetched_at or time.time()
+        self._by_id = by_id
+        self._by_symbol = by_symbol
+        self._by_name = by_name
+        self._prefix_keys = [key for key, _ in prefix_pairs]
+        self._prefix_values = [index for _, index in prefix_pairs]
+
+    @staticmethod
+    def build_records(coins_list: List[dict], markets: List[dict]) -> List[CoinRecord]:
+        """合併 /coins/list 與 /coins/markets 的結果"""
+        ranks = {
+            item["id"]: item.get("market_cap_rank") or UNRANKED
+            for item in markets
+            if item.get("id")
+        }
+        return [
+            CoinRecord(
+                coin["id"],
+                coin.get("symbol") or "",
+                coin.get("name") or coin["id"],
+                ranks.get(coin["id"], UNRANKED),
+            )
+            for coin in coins_list
+            if coin.get("id")
+        ]
+
+    def replace_with(self, other: "CoinRegistry"):
+        """以另一個 (在背景 thread 建好的) 索引取代目前內容"""
+        self.coins = other.coins
+        self.fetched_at = other.fetched_at
+        self._by_id = other._by_id
+        self._by_symbol = other._by_symbol
+        self._by_name = other._by_name
+        self._prefix_keys = other._prefix_keys
+        self._prefix_values = other._prefix_values
+
+    def get(self, coin_id: str) -> Optional[CoinRecord]:
+        index = self._by_id.get(coin_id)
+        return self.coins[index] if index is not None else None
+
+    def by_symbol(self, symbol: str) -> List[CoinRecord]:
+        """依代號查詢，已依市值排名排序"""
+        return [self.coins[index] for index in self._by_symbol.get(symbol.lower(), ())]
+
+    def resolve(self, term: str) -> Optional[CoinRecord]:
+        """將使用者輸入的 id / 代號 / 名稱解析成單一幣種 (衝突時取市值最高者)"""
+        term = term.strip().lower()
+        if not term:
+            return None
+        if term in self._by_id:
+            return self.coins[self._by_id[term]]
+        candidates = self._by_symbol.get(term, []) + self._by_name.get(term, [])
+        if not candidates:
+            return None
+        return self.coins[min(candidates)]
+
+    def prefix_search(self, prefix: str, limit: int = 10) -> List[CoinRecord]:
+        """前綴搜尋，回傳市值排名最高的 limit 個結果"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self._prefix_keys, prefix)
+        end = bisect.bisect_left(self._prefix_keys, prefix + "\uffff", lo=start)
+        indexes = set(self._prefix_values[start:end])
+        return [self.coins[index] for index in heapq.nsmallest(limit, indexes)]
+
+    def search(self, query: str, limit: int = 5) -> List[CoinRecord]:
+        """完全符合的結果優先，其次是前綴符合"""
+        exact = self.resolve(query)
+        results = [exact] if exact else []
+        for coin in self.prefix_search(query, limit + 1):
+            if coin not in results:
+                results.append(coin)
+        return results[:limit]
+
+    def top(self, n: int) -> List[CoinRecord]:
+        """市值排名前 n 的幣種"""
+        return [coin for coin in self.coins[:n] if coin.rank != UNRANKED]
+
+    def save_snapshot(self, path: str):
+        """寫入 gzip JSON 快照 (先寫暫存檔再替換，避免讀到寫到一半的檔案)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        payload = {
+            "fetched_at": self.fetched_at,
+            "coins": [list(coin) for coin in self.coins],
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str) -> bool:
+        """讀取快照，成功回傳 True"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+            self.load_records(
+                (CoinRecord(*coin) for coin in payload["coins"]),
+                fetched_at=payload.get("fetched_at"),
+            )
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ 幣種索引快照讀取失敗: {e}")
+            return False
@@ -0,0 +1,2 @@
+# test_coingecko.py / test_langfuse.py 是需要網路與金鑰的手動整合腳本，不納入 pytest
+collect_ignore = ["test_coingecko.py", "test_langfuse.py"]
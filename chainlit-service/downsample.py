@@ -0,0 +1,65 @@
+"""
+時間序列降採樣 (Largest-Triangle-Three-Buckets)
+把上千個點的走勢壓縮到固定點數，保留高低點與轉折，
+讓送進 prompt 的 token 數與圖表的繪製成本不隨時間範圍成長
+"""
+
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    回傳保留下來的索引 (遞增，包含第一個與最後一個點)
+
+    每個 bucket 選出與「上一個選中點」及「下一個 bucket 平均點」構成最大三角形面積的點；
+    bucket 邊界與所有 bucket 的平均點一次算好，每個 bucket 內的面積以向量運算求得
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 中間 n - 2 個點平均分到 threshold - 2 個 bucket
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # 每個 bucket 的平均點 (以累積和一次計算)，最後一個 bucket 的「下一個」是終點
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    avg_x = np.append((cum_x[ends] - cum_x[starts]) / counts, x[-1])
+    avg_y = np.append((cum_y[ends] - cum_y[starts]) / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = starts[bucket], ends[bucket]
+        next_x, next_y = avg_x[bucket + 1], avg_y[bucket + 1]
+        # 三角形面積 (省略常數 1/2)
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_series(times: np.ndarray, prices: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """依點數預算降採樣 (times, prices)"""
+    indexes = lttb(times, prices, points)
+    return np.asarray(times)[indexes], np.asarray(prices)[indexes]
+
+
+def series_to_points(times: np.ndarray, prices: np.ndarray, significant_digits: int = 6) -> List[list]:
+    """轉成給 LLM 的精簡格式 [["2024-05-01 12:00", 63012.5], ...] (UTC)"""
+    points = []
+    for timestamp, price in zip(times.tolist(), prices.tolist()):
+        label = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M")
+        points.append([label, float(f"{price:.{significant_digits}g}")])
+    return points
@@ -0,0 +1,165 @@
+"""
+純資料查詢的快速路徑
+像「BTC 價格多少」這類只需要數字的問題，直接以預先編譯的模板渲染，不經過 LLM
+"""
+
+import re
+import time
+from string import Template
+from typing import Any, Callable, Dict, List, Optional
+
+# 出現這些字眼代表需要分析或建議，交給 LLM
+ANALYTICAL_PATTERN = re.compile(
+    r"分析|建議|波動|為什麼|為何|原因|預測|預期|未來|趨勢|比較|應該|值得|可以買|要不要|買入|賣出|投資|風險|策略|看法|怎麼看|解釋|"
+    r"\bwhy\b|\bshould\b|analy|predict|forecast|volatil|compare|\bvs\b|recommend|advice|\bbuy\b|\bsell\b|strategy|outlook",
+    re.IGNORECASE,
+)
+
+# 查詢超過這個長度通常帶有上下文，交給 LLM
+MAX_FAST_PATH_QUERY_LENGTH = 40
+
+PRICE_TEMPLATE = Template("""${emoji} **${name} (${symbol})** 即時行情
+$stale_note
+💰 **當前價格**: ${price_usd} (NT$$${price_twd})
+📊 **24小時漲跌**: ${change_24h}
+📅 **7天漲跌**: ${change_7d}
+📈 **24小時最高**: ${high_24h}
+📉 **24小時最低**: ${low_24h}
+💎 **市值**: ${market_cap} (排名 #${rank})
+🔄 **24小時交易量**: ${volume}
+
+---
+資料來源: CoinGecko (更新時間 ${last_updated})
+💡 想要走勢分析或投資建議，可以直接問我喔！
+""")
+
+
+def is_plain_data_query(query: str) -> bool:
+    """判斷查詢是否只是單純的資料查詢 (不需要 LLM 分析)"""
+    query = query.strip()
+    if len(query) > MAX_FAST_PATH_QUERY_LENGTH:
+        return False
+    return ANALYTICAL_PATTERN.search(query) is None
+
+
+# 模板只渲染報價欄位；附帶這些資料時 (例如「過去一小時」的本地 tick 統計) 交給 LLM 解讀
+EXTRA_DATA_FIELDS = ("local_history", "technical_indicators")
+
+
+def can_use_fast_path(data: Dict[str, Any], unavailable: List[str], query: str) -> bool:
+    """只有單純的報價資料 (沒有其他來源、失敗的來源或附帶資料) 且查詢不需要分析時，才以模板直接回答"""
+    crypto_data = data.get("crypto_data")
+    if not crypto_data or set(data) != {"crypto_data"} or unavailable:
+        return False
+    items = crypto_data if isinstance(crypto_data, list) else [crypto_data]
+    if any(field in item for item in items for field in EXTRA_DATA_FIELDS):
+        return False
+    return is_plain_data_query(query)
+
+
+def format_usd(value: Optional[float], decimals: int = 2) -> str:
+    if value is None:
+        return "N/A"
+    if decimals == 2 and abs(value) < 1:
+        # 小額價格保留有效位數，去掉尾端的 0 (0 本身顯示為 $0)
+        return f"${value:,.6f}".rstrip("0").rstrip(".")
+    return f"${value:,.{decimals}f}"
+
+
+def format_percent(value: Optional[float]) -> str:
+    return "N/A" if value is None else f"{value:+.2f}%"
+
+
+def render_price(data: Dict[str, Any]) -> str:
+    """將 get_crypto_price 的結果渲染成回答"""
+    change_24h = data.get("price_change_percentage_24h")
+    stale_note = ""
+    if data.get("stale"):
+        stale_note = f"\n⚠️ CoinGecko 暫時無法連線，以下為約 {data.get('data_age_seconds', 0) // 60} 分鐘前的資料\n"
+
+    return PRICE_TEMPLATE.substitute(
+        emoji="📈" if (change_24h or 0) >= 0 else "📉",
+        name=data.get("name") or data.get("id"),
+        symbol=data.get("symbol") or "",
+        stale_note=stale_note,
+        price_usd=format_usd(data.get("current_price_usd")),
+        price_twd=f"{data['current_price_twd']:,.0f}" if data.get("current_price_twd") is not None else "N/A",
+        change_24h=format_percent(change_24h),
+        change_7d=format_percent(data.get("price_change_percentage_7d")),
+        high_24h=format_usd(data.get("high_24h_usd")),
+        low_24h=format_usd(data.get("low_24h_usd")),
+        market_cap=format_usd(data.get("market_cap_usd"), 0),
+        rank=data.get("market_cap_rank") or "N/A",
+        volume=format_usd(data.get("total_volume_usd"), 0),
+        last_updated=data.get("last_updated") or "N/A",
+    )
+
+
+def render_price_table(items: List[Dict[str, Any]]) -> str:
+    """將多個幣種 (get_crypto_prices 的結果) 渲染成一張比較表"""
+    lines = [
+        "📊 **即時行情**",
+        "",
+        "| 幣種 | 價格 (USD) | 24小時 | 7天 | 市值排名 |",
+        "| --- | ---: | ---: | ---: | ---: |",
+    ]
+    for data in items:
+        lines.append(
+            f"| {data.get('name') or data.get('id')} ({data.get('symbol') or ''}) "
+            f"| {format_usd(data.get('current_price_usd'))} "
+            f"| {format_percent(data.get('price_change_percentage_24h'))} "
+            f"| {format_percent(data.get('price_change_percentage_7d'))} "
+            f"| #{data.get('market_cap_rank') or 'N/A'} |"
+        )
+
+    stale_ages = [data.get("data_age_seconds", 0) for data in items if data.get("stale")]
+    if stale_ages:
+        lines += ["", f"⚠️ CoinGecko 暫時無法連線，以上為約 {max(stale_ages) // 60} 分鐘前的資料"]
+
+    lines += ["", "---", "資料來源: CoinGecko", "💡 想要比較分析或投資建議，可以直接問我喔！"]
+    return "\n".join(lines) + "\n"
+
+
+class FastPathStats:
+    """快速路徑命中率與節省的延遲"""
+
+    def __init__(self):
+        self.messages = 0
+        self.fast_path_hits = 0
+        self.render_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def record_message(self):
+        self.messages += 1
+
+    def record_fast_path(self, render_seconds: float):
+        self.fast_path_hits += 1
+        self.render_seconds += render_seconds
+
+    def record_llm(self, seconds: float):
+        self.llm_calls += 1
+        self.llm_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        avg_llm = self.llm_seconds / self.llm_calls if self.llm_calls else None
+        avg_render = self.render_seconds / self.fast_path_hits if self.fast_path_hits else None
+        saved = None
+        if avg_llm is not None and avg_render is not None:
+            saved = (avg_llm - avg_render) * self.fast_path_hits
+        return {
+            "messages": self.messages,
+            "fast_path_hits": self.fast_path_hits,
+            "fast_path_rate": round(self.fast_path_hits / self.messages, 3) if self.messages else 0.0,
+            "avg_render_ms": round(avg_render * 1000, 3) if avg_render is not None else None,
+            "avg_llm_seconds": round(avg_llm, 3) if avg_llm is not None else None,
+            "estimated_seconds_saved": round(saved, 1) if saved is not None else None,
+        }
+
+
+def timed_render(data: Any, stats: FastPathStats, renderer: Callable[[Any], str] = render_price) -> str:
+    """渲染並記錄耗時"""
+    start = time.perf_counter()
+    text = renderer(data)
+    stats.record_fast_path(time.perf_counter() - start)
+    return text
@@ -0,0 +1,192 @@
+"""
+模糊幣種比對
+以 n-gram 倒排索引挑出候選，再以編輯距離計分，
+讓 "etherum"、"solanna"、"比特bi" 這類拼錯或混打的輸入也能找到幣種
+"""
+
+import math
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from coin_registry import CoinRecord, UNRANKED
+
+_CJK_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+_TERM_PATTERN = re.compile(r"[a-z0-9\u3400-\u9fff\uf900-\ufaff]+")
+
+# 英文詞至少這麼長才做模糊比對 (太短的詞拼錯與否無法判斷)
+MIN_LATIN_TERM_LENGTH = 4
+
+
+class FuzzyHit(NamedTuple):
+    value: str   # 幣種 id
+    key: str     # 比對到的名稱 / 代號
+    score: float  # 0 ~ 1，1 表示完全相同
+    rank: int
+
+
+def ngrams(text: str) -> List[str]:
+    """含中文時取 bigram (單字資訊量高)，否則取 trigram，前後補空白讓字首字尾權重較高"""
+    n = 2 if _CJK_PATTERN.search(text) else 3
+    padded = " " * (n - 1) + text + " "
+    return list({padded[i:i + n] for i in range(len(padded) - n + 1)})
+
+
+def levenshtein(a: str, b: str, max_distance: int) -> int:
+    """編輯距離，超過 max_distance 時提早結束並回傳 max_distance + 1"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ch_a in enumerate(a, 1):
+        current = [i]
+        for j, ch_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ch_a != ch_b),
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def extract_terms(query: str, ignore_words: Iterable[str] = ()) -> List[str]:
+    """從訊息中取出可能是幣名的詞 (去除意圖關鍵字等常見字)"""
+    text = query.lower()
+    ignore = set()
+    for word in ignore_words:
+        word = word.lower()
+        if _CJK_PATTERN.search(word):
+            # 中文沒有空白分詞，直接把關鍵字挖掉
+            text = text.replace(word, " ")
+        else:
+            ignore.add(word)
+
+    terms = []
+    for term in _TERM_PATTERN.findall(text):
+        if term in ignore or term.isdigit():
+            continue
+        if _CJK_PATTERN.search(term):
+            if len(term) >= 2:
+                terms.append(term)
+        elif len(term) >= MIN_LATIN_TERM_LENGTH:
+            terms.append(term)
+    return terms
+
+
+class FuzzyIndex:
+    """
+    n-gram 倒排索引
+    - 候選: 以 numpy bincount 一次算出每個 key 共有的 n-gram 數，取 Dice 係數最高的前幾名
+    - 計分: 1 - 編輯距離 / 較長字串長度，中文字資訊量較高所以門檻較低
+    """
+
+    def __init__(self, min_score: float = 0.75, cjk_min_score: float = 0.5, candidates: int = 8):
+        self.min_score = min_score
+        self.cjk_min_score = cjk_min_score
+        self.candidates = candidates
+        self._keys: List[str] = []
+        self._values: List[str] = []
+        self._ranks: List[int] = []
+        self._seen = set()
+        self._postings: Dict[str, np.ndarray] = {}
+        self._gram_counts = np.zeros(0, dtype=np.int32)
+        self._rank_array = np.zeros(0, dtype=np.int64)
+        self._built = True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str, value: str, rank: int = UNRANKED):
+        key = key.strip().lower()
+        if not key or (key, value) in self._seen:
+            return
+        self._seen.add((key, value))
+        self._keys.append(key)
+        self._values.append(value)
+        self._ranks.append(rank)
+        self._built = False
+
+    def build(self):
+        """建立倒排索引 (幣種多時約數百毫秒，應在背景 thread 執行)"""
+        postings: Dict[str, List[int]] = {}
+        gram_counts = []
+        for index, key in enumerate(self._keys):
+            grams = ngrams(key)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(index)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._gram_counts = np.array(gram_counts, dtype=np.int32)
+        self._rank_array = np.array(self._ranks, dtype=np.int64)
+        self._built = True
+
+    def lookup(self, term: str, limit: int = 5, max_rank: Optional[int] = None) -> List[FuzzyHit]:
+        """回傳分數達門檻的結果，依分數、市值排名排序，同一幣種只出現一次"""
+        if not self._built:
+            self.build()
+        term = term.strip().lower()
+        if not term or not self._keys:
+            return []
+
+        grams = ngrams(term)
+        arrays = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not arrays:
+            return []
+        shared = np.bincount(np.concatenate(arrays), minlength=len(self._keys))
+
+        # 至少要有三成的 n-gram 相同才列為候選
+        mask = shared >= max(1, math.ceil(len(grams) * 0.3))
+        if max_rank is not None:
+            mask &= self._rank_array <= max_rank
+        candidate_ids = np.flatnonzero(mask)
+        if candidate_ids.size == 0:
+            return []
+        if candidate_ids.size > self.candidates:
+            dice = 2 * shared[candidate_ids] / (len(grams) + self._gram_counts[candidate_ids])
+            top = np.argpartition(-dice, self.candidates - 1)[:self.candidates]
+            candidate_ids = candidate_ids[top]
+
+        min_score = self.cjk_min_score if _CJK_PATTERN.search(term) else self.min_score
+        hits = []
+        for index in candidate_ids.tolist():
+            key = self._keys[index]
+            longest = max(len(term), len(key))
+            max_distance = int(longest * (1 - min_score))
+            distance = levenshtein(term, key, max_distance)
+            if distance > max_distance:
+                continue
+            hits.append(FuzzyHit(self._values[index], key, 1 - distance / longest, self._ranks[index]))
+
+        hits.sort(key=lambda hit: (-hit.score, hit.rank))
+        results: List[FuzzyHit] = []
+        for hit in hits:
+            if all(hit.value != other.value for other in results):
+                results.append(hit)
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def build_coin_index(records: Iterable[CoinRecord], aliases: Dict[str, List[str]], **kwargs) -> FuzzyIndex:
+    """
+    以幣種索引 + 額外別名 (例如中文名稱) 建立模糊索引
+    額外別名的幣沒有排名資料時視為最優先
+    """
+    index = FuzzyIndex(**kwargs)
+    ranks = {}
+    for coin in records:
+        ranks[coin.id] = coin.rank
+        index.add(coin.name, coin.id, coin.rank)
+        index.add(coin.id, coin.id, coin.rank)
+        if len(coin.symbol) >= 3:
+            index.add(coin.symbol, coin.id, coin.rank)
+    for coin_id, words in aliases.items():
+        for word in words:
+            index.add(word, coin_id, ranks.get(coin_id, 0))
+    index.build()
+    return index
@@ -0,0 +1,102 @@
+"""
+LLM hedged request 策略與成本統計
+主要模型超過延遲門檻仍未回應時，同時把相同 prompt 送給下一個健康的模型，
+以限制 hedge 比例的方式控制額外成本
+"""
+
+from collections import deque
+from typing import Any, Dict, Optional
+
+from model_health import ModelHealth
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """粗估 token 數 (英文約 4 字元一個 token，中文約 1.5 字元一個 token)"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return int(cjk / 1.5 + (len(text) - cjk) / 4) + 1
+
+
+class HedgePolicy:
+    """
+    決定何時送出 hedge 請求
+
+    - 門檻: 主要模型最近延遲的第 percentile 百分位數，樣本不足時使用 default_delay
+    - 上限: 最近 window 個請求中，hedge 的比例不超過 max_rate
+    """
+
+    def __init__(
+        self,
+        percentile: float = 90.0,
+        default_delay: float = 3.0,
+        min_delay: float = 0.5,
+        min_samples: int = 10,
+        max_rate: float = 0.1,
+        window: int = 200,
+    ):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self._history = deque(maxlen=window)  # True = 該請求有送出 hedge
+
+    def delay_for(self, health: ModelHealth) -> float:
+        """主要模型等待多久後才送出 hedge"""
+        if len(health.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, health.latency_percentile(self.percentile))
+
+    def allow(self) -> bool:
+        """目前的 hedge 比例是否還在上限內"""
+        if not self._history:
+            return self.max_rate > 0
+        return sum(self._history) / len(self._history) < self.max_rate
+
+    def record(self, hedged: bool):
+        """每個請求結束時記錄是否有 hedge"""
+        self._history.append(hedged)
+
+    @property
+    def hedge_rate(self) -> float:
+        if not self._history:
+            return 0.0
+        return sum(self._history) / len(self._history)
+
+
+class CostLedger:
+    """
+    每個模型的用量統計
+    被取消的 hedge 請求仍會計入 input token (上游已經收到 prompt)
+    """
+
+    def __init__(self):
+        self.models: Dict[str, Dict[str, int]] = {}
+
+    def _get(self, model_name: str) -> Dict[str, int]:
+        if model_name not in self.models:
+            self.models[model_name] = {
+                "calls": 0,
+                "hedge_calls": 0,
+                "cancelled_calls": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+            }
+        return self.models[model_name]
+
+    def record_call(self, model_name: str, prompt: str, hedge: bool = False):
+        entry = self._get(model_name)
+        entry["calls"] += 1
+        entry["input_tokens"] += estimate_tokens(prompt)
+        if hedge:
+            entry["hedge_calls"] += 1
+
+    def record_cancelled(self, model_name: str):
+        self._get(model_name)["cancelled_calls"] += 1
+
+    def record_output(self, model_name: str, text: str):
+        self._get(model_name)["output_tokens"] += estimate_tokens(text)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(entry) for name, entry in self.models.items()}
@@ -0,0 +1,78 @@
+"""
+上游 HTTP 連線池
+為每個上游服務 (CoinGecko / NestJS) 維護一個共用的 httpx.AsyncClient，
+讓所有聊天 session 重複使用已建立的 TCP + TLS 連線
+"""
+
+from typing import Dict, Optional
+
+import httpx
+
+# HTTP/2 需要額外安裝 h2 套件 (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class UpstreamClientPool:
+    """
+    單一上游服務的共用連線池
+    在 Chainlit 應用程式啟動時建立，關閉時釋放；
+    若在生命週期之外使用 (例如測試腳本)，會在第一次存取時自動建立
+    """
+
+    def __init__(
+        self,
+        name: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 10.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+    ):
+        self.name = name
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+
+        if self.http2 and not HTTP2_AVAILABLE:
+            print(f"⚠️ {self.name}: 未安裝 h2 套件，改用 HTTP/1.1")
+            self.http2 = False
+
+    def open(self) -> httpx.AsyncClient:
+        """建立連線池 (已建立則直接回傳)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+            print(
+                f"🔌 {self.name} 連線池已建立 "
+                f"(max={self.limits.max_connections}, "
+                f"keepalive={self.limits.max_keepalive_connections}, "
+                f"http2={self.http2})"
+            )
+        return self._client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """取得共用的 AsyncClient"""
+        return self.open()
+
+    async def aclose(self):
+        """關閉連線池並釋放所有連線"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            print(f"🔌 {self.name} 連線池已關閉")
+        self._client = None
@@ -0,0 +1,220 @@
+"""
+技術指標引擎
+以 NumPy 對 /coins/{id}/market_chart 的價格序列計算 RSI、MACD、布林通道、已實現波動度與回撤
+
+- 批次: 相同長度的序列堆成 (幣種數 x 時間) 矩陣，遞迴型指標 (EMA / Wilder 平滑) 每個時間點只做一次向量運算
+- 增量: 保留每個幣的遞迴狀態，之後的資料只需要處理新增的點，不必整段重算
+
+增量結果與整段重算只有在序列單純往後延伸時才完全相同。market_chart 是滑動的時間窗，
+前端舊資料移出後，增量狀態仍帶著視窗外的歷史，整段重算則以新視窗的第一點重新起算；
+兩者的差異來自起始值，以 (1 - alpha)^n 衰減 (慢速 EMA 與 RSI 每 100 點約縮小到 1/2000)，
+預設 30 天約 720 點的序列中已遠小於顯示的有效位數，但較短的序列 (數十點) 會有可見的差異
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+SECONDS_PER_YEAR = 365 * 86400
+
+
+def _ema_step(alpha: float, previous: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """對矩陣的每一欄依序套用 EMA，回傳每個時間點的 EMA (previous 為前一個時間點的值)"""
+    out = np.empty_like(values)
+    for t in range(values.shape[1]):
+        previous = alpha * values[:, t] + (1 - alpha) * previous
+        out[:, t] = previous
+    return out
+
+
+def _wilder_step(period: int, previous: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Wilder 平滑 (RSI 使用)，只回傳最後一個值"""
+    for t in range(values.shape[1]):
+        previous = (previous * (period - 1) + values[:, t]) / period
+    return previous
+
+
+def _rsi(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        rsi = 100 - 100 / (1 + rs)
+    return np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), rsi)
+
+
+class _CoinState:
+    """單一幣種的遞迴狀態與最近一次的價格序列"""
+
+    __slots__ = ("last_time", "ema_fast", "ema_slow", "signal", "avg_gain", "avg_loss", "times", "prices")
+
+    def __init__(self, last_time, ema_fast, ema_slow, signal, avg_gain, avg_loss, times, prices):
+        self.last_time = last_time
+        self.ema_fast = ema_fast
+        self.ema_slow = ema_slow
+        self.signal = signal
+        self.avg_gain = avg_gain
+        self.avg_loss = avg_loss
+        self.times = times
+        self.prices = prices
+
+
+class IndicatorEngine:
+    """
+    批次計算技術指標並保留增量狀態
+    update() 接收 {coin_id: (times 秒, prices)}，回傳 {coin_id: 精簡摘要}
+    """
+
+    def __init__(
+        self,
+        rsi_period: int = 14,
+        macd_fast: int = 12,
+        macd_slow: int = 26,
+        macd_signal: int = 9,
+        bollinger_window: int = 20,
+        bollinger_k: float = 2.0,
+        max_coins: int = 200,
+    ):
+        self.rsi_period = rsi_period
+        self.fast_alpha = 2 / (macd_fast + 1)
+        self.slow_alpha = 2 / (macd_slow + 1)
+        self.signal_alpha = 2 / (macd_signal + 1)
+        self.bollinger_window = bollinger_window
+        self.bollinger_k = bollinger_k
+        self.min_points = max(macd_slow + macd_signal, rsi_period + 1, bollinger_window)
+        self.max_coins = max_coins
+        self._states: "OrderedDict[str, _CoinState]" = OrderedDict()
+        self.stats = {"full": 0, "incremental": 0, "unchanged": 0}
+
+    def update(self, series: Dict[str, Tuple[Iterable[float], Iterable[float]]]) -> Dict[str, Dict[str, Any]]:
+        full: Dict[int, list] = {}
+        for coin_id, (times, prices) in series.items():
+            times = np.asarray(times, dtype=np.float64)
+            prices = np.asarray(prices, dtype=np.float64)
+            if prices.size < self.min_points:
+                continue
+
+            state = self._states.get(coin_id)
+            if state is not None and times[0] <= state.last_time <= times[-1]:
+                self._extend(state, times, prices)
+            else:
+                # 沒有狀態或序列已經不連續，整段重算 (依長度分組以便堆成矩陣)
+                full.setdefault(prices.size, []).append((coin_id, times, prices))
+
+        for group in full.values():
+            self._compute_full(group)
+
+        results = {}
+        for coin_id in series:
+            state = self._states.get(coin_id)
+            if state is not None:
+                self._states.move_to_end(coin_id)
+                results[coin_id] = self._summarize(state)
+        while len(self._states) > self.max_coins:
+            self._states.popitem(last=False)
+        return results
+
+    def _compute_full(self, group: list):
+        """相同長度的幣種一起計算"""
+        prices = np.vstack([item[2] for item in group])
+
+        ema_fast = _ema_step(self.fast_alpha, prices[:, 0], prices)
+        ema_slow = _ema_step(self.slow_alpha, prices[:, 0], prices)
+        macd = ema_fast - ema_slow
+        signal = _ema_step(self.signal_alpha, macd[:, 0], macd)
+
+        changes = np.diff(prices, axis=1)
+        gains = np.clip(changes, 0, None)
+        losses = np.clip(-changes, 0, None)
+        period = self.rsi_period
+        avg_gain = _wilder_step(period, gains[:, :period].mean(axis=1), gains[:, period:])
+        avg_loss = _wilder_step(period, losses[:, :period].mean(axis=1), losses[:, period:])
+
+        for row, (coin_id, times, coin_prices) in enumerate(group):
+            self._states[coin_id] = _CoinState(
+                float(times[-1]), float(ema_fast[row, -1]), float(ema_slow[row, -1]), float(signal[row, -1]),
+                float(avg_gain[row]), float(avg_loss[row]), times, coin_prices,
+            )
+        self.stats["full"] += len(group)
+
+    def _extend(self, state: _CoinState, times: np.ndarray, prices: np.ndarray):
+        """只用 last_time 之後的新資料推進遞迴狀態"""
+        new = times > state.last_time
+        if not new.any():
+            self.stats["unchanged"] += 1
+            state.times, state.prices = times, prices
+            return
+
+        start = int(np.argmax(new))
+        new_prices = prices[start:][None, :]
+        previous_price = prices[start - 1] if start > 0 else state.prices[-1]
+
+        ema_fast = _ema_step(self.fast_alpha, np.array([state.ema_fast]), new_prices)
+        ema_slow = _ema_step(self.slow_alpha, np.array([state.ema_slow]), new_prices)
+        signal = _ema_step(self.signal_alpha, np.array([state.signal]), ema_fast - ema_slow)
+
+        changes = np.diff(np.concatenate(([previous_price], new_prices[0])))[None, :]
+        state.avg_gain = float(_wilder_step(self.rsi_period, np.array([state.avg_gain]), np.clip(changes, 0, None))[0])
+        state.avg_loss = float(_wilder_step(self.rsi_period, np.array([state.avg_loss]), np.clip(-changes, 0, None))[0])
+        state.ema_fast = float(ema_fast[0, -1])
+        state.ema_slow = float(ema_slow[0, -1])
+        state.signal = float(signal[0, -1])
+        state.last_time = float(times[-1])
+        state.times, state.prices = times, prices
+        self.stats["incremental"] += 1
+
+    def _summarize(self, state: _CoinState) -> Dict[str, Any]:
+        """精簡摘要 (給 LLM 的資料，不含原始序列)"""
+        prices = state.prices
+        price = float(prices[-1])
+
+        tail = prices[-self.bollinger_window:]
+        middle = float(tail.mean())
+        width = self.bollinger_k * float(tail.std())
+        upper, lower = middle + width, middle - width
+
+        log_returns = np.diff(np.log(prices))
+        step = float(np.median(np.diff(state.times)))
+        periods_per_year = SECONDS_PER_YEAR / step if step > 0 else 0.0
+
+        running_peak = np.maximum.accumulate(prices)
+        drawdowns = prices / running_peak - 1
+
+        macd = state.ema_fast - state.ema_slow
+        return {
+            "price": _round_price(price),
+            "change_pct": round((price / float(prices[0]) - 1) * 100, 2),
+            "rsi": round(float(_rsi(np.array([state.avg_gain]), np.array([state.avg_loss]))[0]), 1),
+            "macd": {
+                "macd": _round_price(macd),
+                "signal": _round_price(state.signal),
+                "histogram": _round_price(macd - state.signal),
+            },
+            "bollinger": {
+                "upper": _round_price(upper),
+                "middle": _round_price(middle),
+                "lower": _round_price(lower),
+                "percent_b": round((price - lower) / (upper - lower), 2) if upper > lower else None,
+            },
+            "realized_volatility_annualized_pct": round(float(log_returns.std() * np.sqrt(periods_per_year)) * 100, 1),
+            "max_drawdown_pct": round(float(drawdowns.min()) * 100, 2),
+            "current_drawdown_pct": round(float(drawdowns[-1]) * 100, 2),
+            "points": int(prices.size),
+            "interval_seconds": round(step),
+        }
+
+
+def _round_price(value: float) -> float:
+    """依數量級保留有效位數 (小幣價格常低於 0.0001)"""
+    if value == 0 or not np.isfinite(value):
+        return 0.0
+    digits = max(2, 6 - int(np.floor(np.log10(abs(value)))))
+    return round(float(value), digits)
+
+
+def parse_market_chart(data: Optional[Dict[str, Any]]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """把 market_chart 的 prices ([[毫秒, 價格], ...]) 轉成 (秒, 價格) 陣列"""
+    points = (data or {}).get("prices") or []
+    if not points:
+        return None
+    array = np.asarray(points, dtype=np.float64)
+    return array[:, 0] / 1000, array[:, 1]
@@ -0,0 +1,274 @@
+"""
+意圖與幣種偵測引擎
+模組載入時建立一次，每則訊息只掃描一遍：
+- 英數字: 以單字為單位查表 (支援多字詞組)，避免 "dot"、"link" 誤中一般單字
+- 中文: 以 Aho-Corasick 自動機在連續中文字串中比對 (中文沒有空白分詞)
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+# 意圖關鍵字 (英文以完整單字比對，中文以子字串比對)
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "price": ["價格", "price", "prices", "多少", "市值", "市場", "漲", "跌", "波動"],
+    "trending": ["熱門", "trending", "趨勢", "流行"],
+    "nft": ["nft", "nfts", "非同質化代幣", "藝術品"],
+    "watchlist": ["watchlist", "收藏", "清單", "追蹤"],
+    "search": ["search", "搜尋", "找", "查"],
+    "compare": ["比較", "對比", "compare", "vs"],
+    "analysis": ["分析", "走勢", "技術指標", "指標", "布林", "rsi", "macd", "bollinger", "technical", "analysis", "analyze"],
+}
+
+# 常見加密貨幣 ID 映射
+COIN_KEYWORDS: Dict[str, List[str]] = {
+    "bitcoin": ["bitcoin", "btc", "比特幣"],
+    "ethereum": ["ethereum", "eth", "以太坊", "以太幣"],
+    "binancecoin": ["bnb", "binance", "幣安幣"],
+    "solana": ["solana", "sol"],
+    "cardano": ["cardano", "ada"],
+    "ripple": ["ripple", "xrp", "瑞波幣"],
+    "dogecoin": ["dogecoin", "doge", "狗狗幣"],
+    "polkadot": ["polkadot", "dot"],
+    "avalanche-2": ["avalanche", "avax"],
+    "chainlink": ["chainlink", "link"],
+}
+
+# 交易代號的上下文：代號前後緊鄰這些字詞時，小寫代號也視為幣種 ("pepe price"、"pepe 價格")
+SYMBOL_CONTEXT_WORDS = frozenset(
+    [word for word in INTENT_KEYWORDS["price"] if word.isascii()]
+    + ["coin", "coins", "token", "tokens", "crypto"]
+)
+SYMBOL_CONTEXT_CJK = tuple(word for word in INTENT_KEYWORDS["price"] if not word.isascii()) + ("幣", "價")
+
+# 不註冊為交易代號的常見英文單字 (即使是大寫也常出現在一般句子中)
+SYMBOL_STOPWORDS = frozenset({
+    "the", "and", "for", "you", "are", "not", "all", "any", "can", "how", "new", "now",
+    "one", "two", "top", "buy", "sell", "get", "near", "gas", "key", "max", "pay", "win",
+    "hot", "fun", "sun", "moon", "coin", "token", "what", "when", "who", "why", "usd",
+    "etc", "just", "via", "its", "our", "out", "off", "was", "has", "had", "but", "yes",
+    "big", "low", "high", "best", "more", "most", "much", "some", "this", "that", "with",
+    "from", "have", "will", "your", "they", "them", "then", "than", "time", "real", "open",
+    "live", "good", "safe", "free", "tell", "show", "about", "today", "next", "last", "like",
+    "over", "also", "only", "very", "here", "there", "ever", "game", "love", "life", "work",
+})
+
+# 幣名或代號剛好是常見英文單字時 ("Just"、"Core"、"Gas")，即使旁邊有 price 也多半是一般用法，
+# 只有大寫或緊鄰 coin / token / 幣 才算 (見 IntentEngine.add_common_word)
+COMMON_WORDS = SYMBOL_STOPWORDS | frozenset({
+    "core", "flow", "sky", "dogs", "render", "maker", "beam", "usual", "movement", "dash", "quant",
+    "compound", "optimism", "stellar", "immutable", "origin", "status", "harmony", "band", "civic",
+    "verge", "wax", "ocean", "aurora", "nano", "waves", "ice", "flux", "pump", "plasma", "stable",
+    "story", "gravity", "sonic", "mask", "graph", "helium", "zero", "omni", "energy", "magic",
+    "spell", "hook", "ark", "amp", "bone", "chain", "hive", "prime", "rose", "solar", "space",
+    "world", "wild", "neon", "echelon", "kernel", "bounce", "rally", "radiant", "degen", "trust",
+})
+COMMON_WORD_CONTEXT = frozenset({"coin", "coins", "token", "tokens"})
+COMMON_WORD_CONTEXT_CJK = ("幣",)
+
+# 英數字單字 (允許中間的 . 與 -) 或連續的中日韓文字
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*|[\u3400-\u9fff\uf900-\ufaff]+")
+_CJK_PATTERN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+
+
+class AhoCorasick:
+    """多字串比對自動機，掃描一次即可找出所有關鍵字 (含重疊)"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, tuple]]] = [[]]
+        self._built = True
+
+    def add(self, word: str, value: tuple):
+        node = 0
+        for ch in word:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(word), value))
+        self._built = False
+
+    def build(self):
+        """以 BFS 建立 failure link"""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+
+    def iter(self, text: str):
+        """產生 (起始位置, 長度, 值)"""
+        if not self._built:
+            self.build()
+        node = 0
+        for index, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, value in self._output[node]:
+                yield index - length + 1, length, value
+
+
+class IntentMatch(NamedTuple):
+    """偵測結果"""
+    intents: Set[str]
+    coins: List[str]  # 依在訊息中出現的順序，不重複
+
+
+class IntentEngine:
+    """
+    意圖與幣種偵測
+    關鍵字可以在執行期間持續加入 (例如從幣種清單載入上千個幣)，
+    查詢時間只和訊息長度有關，不隨關鍵字數量線性成長
+    """
+
+    def __init__(self, max_phrase_words: int = 3):
+        self.max_phrase_words = max_phrase_words
+        self._latin: Dict[str, List[tuple]] = {}
+        self._cjk = AhoCorasick()
+
+    def add_keyword(self, keyword: str, value: tuple):
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return
+        if _CJK_PATTERN.search(keyword):
+            self._cjk.add(keyword, value)
+        else:
+            # 詞組統一以單一空白分隔
+            phrase = " ".join(_TOKEN_PATTERN.findall(keyword))
+            if phrase:
+                self.max_phrase_words = max(self.max_phrase_words, phrase.count(" ") + 1)
+                values = self._latin.setdefault(phrase, [])
+                if value not in values:
+                    values.append(value)
+
+    def add_intent(self, intent: str, keywords: Iterable[str]):
+        for keyword in keywords:
+            self.add_keyword(keyword, ("intent", intent))
+
+    def add_coin(self, coin_id: str, aliases: Iterable[str]):
+        for alias in aliases:
+            self.add_keyword(alias, ("coin", coin_id))
+
+    def add_symbol(self, coin_id: str, symbol: str):
+        """
+        註冊交易代號 (例如從幣種清單載入的上百個代號)
+        代號常與一般英文單字相同 ("just"、"one")，只有在訊息中為大寫，
+        或緊鄰價格 / 幣種相關字詞時才算 (見 _symbol_in_context)
+        """
+        self.add_keyword(symbol, ("symbol", coin_id))
+
+    def add_common_word(self, coin_id: str, word: str):
+        """
+        註冊剛好是常見英文單字的幣名或代號 (見 COMMON_WORDS)
+        比代號更嚴格：只有在訊息中為大寫 (整句全大寫時不算)，或緊鄰 coin / token / 幣 時才算，
+        "gas price"、"just tell me" 不會被當成幣種
+        """
+        self.add_keyword(word, ("word", coin_id))
+
+    def _symbol_in_context(self, query: str, tokens: List[Tuple[int, int, str]], first: int, last: int, strict: bool = False) -> bool:
+        start, end = tokens[first][0], tokens[last][1]
+        original = query[start:end]
+        if original.isupper() and not (strict and query.isupper()):
+            return True
+        words, cjk = (COMMON_WORD_CONTEXT, COMMON_WORD_CONTEXT_CJK) if strict else (SYMBOL_CONTEXT_WORDS, SYMBOL_CONTEXT_CJK)
+        if first > 0:
+            previous = tokens[first - 1][2]
+            if previous in words or (_CJK_PATTERN.match(previous) and previous.endswith(cjk)):
+                return True
+        if last + 1 < len(tokens):
+            following = tokens[last + 1][2]
+            if following in words or (_CJK_PATTERN.match(following) and following.startswith(cjk)):
+                return True
+        return False
+
+    def detect(self, query: str) -> IntentMatch:
+        """
+        單次掃描找出所有意圖與幣種
+        幣種以最左最長比對：被較長詞組涵蓋的較短詞組不算 ("bitcoin cash" 不會同時算成 bitcoin)
+        """
+        intents: Set[str] = set()
+        coin_hits: List[Tuple[int, int, str]] = []  # (起始, 結束, 幣種)
+        symbol_hits: List[Tuple[int, int, str, bool]] = []  # (第一個 token, 最後一個 token, 幣種, 是否為常見單字)
+
+        lowered = query.lower()
+        if len(lowered) != len(query):
+            # 少數字元轉小寫後長度會改變，此時無法對回原文判斷大小寫
+            query = lowered
+        tokens = [(match.start(), match.end(), match.group()) for match in _TOKEN_PATTERN.finditer(lowered)]
+
+        latin_run: List[int] = []
+        for index, (token_start, token_end, token) in enumerate(tokens):
+            if _CJK_PATTERN.match(token):
+                for offset, length, (kind, name) in self._cjk.iter(token):
+                    start = token_start + offset
+                    if kind == "intent":
+                        intents.add(name)
+                    else:
+                        coin_hits.append((start, start + length, name))
+                latin_run = []
+                continue
+
+            # 以目前單字結尾的 1..N 字詞組查表
+            latin_run.append(index)
+            latin_run = latin_run[-self.max_phrase_words:]
+            for size in range(1, len(latin_run) + 1):
+                first = latin_run[-size]
+                phrase = " ".join(tokens[i][2] for i in latin_run[-size:])
+                for kind, name in self._latin.get(phrase, ()):
+                    if kind == "intent":
+                        intents.add(name)
+                    elif kind in ("symbol", "word"):
+                        symbol_hits.append((first, index, name, kind == "word"))
+                    else:
+                        coin_hits.append((tokens[first][0], token_end, name))
+
+        for first, last, name, strict in symbol_hits:
+            if self._symbol_in_context(query, tokens, first, last, strict):
+                coin_hits.append((tokens[first][0], tokens[last][1], name))
+
+        coins: List[str] = []
+        for coin_id in _leftmost_longest(coin_hits):
+            if coin_id not in coins:
+                coins.append(coin_id)
+        return IntentMatch(intents, coins)
+
+
+def _leftmost_longest(hits: List[Tuple[int, int, str]]) -> List[str]:
+    """
+    依位置由左到右，每個起點取最長的詞組，與已選詞組重疊的略過
+    (同一個範圍對應多個幣種時全部保留)
+    """
+    selected: List[str] = []
+    chosen_span = None
+    for start, end, coin_id in sorted(hits, key=lambda hit: (hit[0], hit[0] - hit[1])):
+        if chosen_span == (start, end):
+            selected.append(coin_id)
+        elif chosen_span is None or start >= chosen_span[1]:
+            chosen_span = (start, end)
+            selected.append(coin_id)
+    return selected
+
+
+def build_default_engine() -> IntentEngine:
+    """建立包含預設意圖與常見幣種的引擎"""
+    engine = IntentEngine()
+    for intent, keywords in INTENT_KEYWORDS.items():
+        engine.add_intent(intent, keywords)
+    for coin_id, aliases in COIN_KEYWORDS.items():
+        engine.add_coin(coin_id, aliases)
+    return engine
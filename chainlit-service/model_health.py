@@ -0,0 +1,198 @@
+"""
+模型健康狀態追蹤
+每個 Gemini 模型一個 circuit breaker，記錄錯誤率與延遲，
+讓 GeminiModelManager 依目前健康狀態排序候選模型
+"""
+
+import re
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class CircuitState:
+    CLOSED = "closed"        # 正常
+    OPEN = "open"            # 冷卻中，不會被選用
+    HALF_OPEN = "half_open"  # 冷卻結束，允許一次試探
+
+
+# google.api_core 的配額例外 (不直接 import，避免載入 SDK)
+_QUOTA_EXCEPTION_NAMES = {"ResourceExhausted", "TooManyRequests"}
+
+# 只比對完整的字詞：Google API 錯誤訊息常帶有 ":generateContent"，不能以子字串 "rate" 判斷
+_QUOTA_MESSAGE_PATTERN = re.compile(
+    r"\b429\b|\bquota\b|\brate[- _]?limit|\bresource[_ ]exhausted\b|\btoo many requests\b",
+    re.IGNORECASE,
+)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """判斷是否為配額 / 速率限制錯誤 (優先依例外類型與 HTTP 狀態碼，其次才看錯誤訊息)"""
+    if any(cls.__name__ in _QUOTA_EXCEPTION_NAMES for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429
+    return bool(_QUOTA_MESSAGE_PATTERN.search(str(error)))
+
+
+def parse_retry_delay(error: Exception) -> Optional[float]:
+    """
+    從 Gemini 的 429 錯誤訊息中取出建議的等待秒數
+    例如 "Please retry in 37.5s" 或 "retry_delay { seconds: 37 }"
+    """
+    error_str = str(error)
+    match = re.search(r"retry in ([\d.]+)\s*s", error_str, re.IGNORECASE)
+    if not match:
+        match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", error_str)
+    return float(match.group(1)) if match else None
+
+
+class ModelHealth:
+    """單一模型的 circuit breaker 與統計"""
+
+    def __init__(self, name: str, window: int = 50):
+        self.name = name
+        self.state = CircuitState.CLOSED
+        self.open_until = 0.0
+        self.consecutive_failures = 0
+        self.cooldown = 0.0
+        self.outcomes = deque(maxlen=window)   # True = 成功
+        self.latencies = deque(maxlen=window)  # 成功請求的延遲 (秒)
+        self.trial_in_flight = False
+
+    def available(self, now: Optional[float] = None) -> bool:
+        """是否可以送出請求 (OPEN 冷卻結束後轉為 HALF_OPEN，只放行一個試探請求)"""
+        now = time.monotonic() if now is None else now
+        if self.state == CircuitState.OPEN and now >= self.open_until:
+            self.state = CircuitState.HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == CircuitState.HALF_OPEN:
+            return not self.trial_in_flight
+        return self.state == CircuitState.CLOSED
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """成功請求延遲的百分位數 (0-100)"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "state": self.state,
+            "cooldown_remaining": round(max(0.0, self.open_until - time.monotonic()), 1),
+            "error_rate": round(self.error_rate, 3),
+            "p50_latency": round(p50, 3) if p50 is not None else None,
+            "p95_latency": round(p95, 3) if p95 is not None else None,
+            "samples": len(self.outcomes),
+        }
+
+
+class ModelHealthTracker:
+    """
+    管理所有模型的健康狀態
+
+    - 配額錯誤 (429): 立即開啟 circuit，冷卻時間優先採用錯誤訊息中的 retry delay，
+      否則依連續失敗次數指數成長
+    - 其他錯誤: 連續 failure_threshold 次後開啟 circuit
+    - HALF_OPEN 試探成功即恢復，失敗則以加倍的冷卻時間重新開啟
+    """
+
+    def __init__(
+        self,
+        model_names: Iterable[str],
+        failure_threshold: int = 3,
+        base_cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        slow_latency: float = 15.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.slow_latency = slow_latency
+        self.models: Dict[str, ModelHealth] = {name: ModelHealth(name) for name in model_names}
+
+    def get(self, name: str) -> ModelHealth:
+        if name not in self.models:
+            self.models[name] = ModelHealth(name)
+        return self.models[name]
+
+    def ordered(self, model_names: Iterable[str]) -> List[str]:
+        """
+        依健康狀態排序候選模型
+        可用 > 冷卻中；可用的模型中，錯誤率高或明顯偏慢的排到後面，其餘維持原本的優先順序
+        全部都在冷卻時仍回傳最快結束冷卻的模型，避免完全沒有嘗試就失敗
+        """
+        now = time.monotonic()
+        names = list(model_names)
+        available = [name for name in names if self.get(name).available(now)]
+
+        if not available:
+            return sorted(names, key=lambda name: self.get(name).open_until)[:1]
+
+        def degraded(name: str) -> bool:
+            health = self.get(name)
+            p50 = health.latency_percentile(50)
+            return health.error_rate >= 0.5 or (p50 is not None and p50 > self.slow_latency)
+
+        return sorted(available, key=lambda name: (degraded(name), names.index(name)))
+
+    def begin(self, name: str):
+        """送出請求前呼叫，HALF_OPEN 狀態只允許一個試探請求"""
+        health = self.get(name)
+        if health.state == CircuitState.HALF_OPEN:
+            health.trial_in_flight = True
+
+    def abandon(self, name: str):
+        """請求被取消 (例如 hedge 落敗)，不計入成功或失敗，但釋放 HALF_OPEN 試探名額"""
+        self.get(name).trial_in_flight = False
+
+    def record_success(self, name: str, latency: float):
+        health = self.get(name)
+        health.outcomes.append(True)
+        health.latencies.append(latency)
+        health.consecutive_failures = 0
+        health.cooldown = 0.0
+        health.trial_in_flight = False
+        if health.state != CircuitState.CLOSED:
+            print(f"✅ {name} 已恢復")
+        health.state = CircuitState.CLOSED
+
+    def record_failure(self, name: str, error: Exception):
+        health = self.get(name)
+        health.outcomes.append(False)
+        health.consecutive_failures += 1
+        health.trial_in_flight = False
+
+        if is_quota_error(error):
+            cooldown = parse_retry_delay(error)
+            if cooldown is None:
+                cooldown = self._backoff(health)
+            self._open(health, cooldown, "配額已滿")
+        elif health.state == CircuitState.HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+            self._open(health, self._backoff(health), "連續錯誤")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: health.snapshot() for name, health in self.models.items()}
+
+    def _backoff(self, health: ModelHealth) -> float:
+        cooldown = self.base_cooldown if health.cooldown <= 0 else health.cooldown * 2
+        return min(cooldown, self.max_cooldown)
+
+    def _open(self, health: ModelHealth, cooldown: float, reason: str):
+        health.cooldown = min(cooldown, self.max_cooldown)
+        health.state = CircuitState.OPEN
+        health.open_until = time.monotonic() + health.cooldown
+        print(f"⛔ {health.name} {reason}，冷卻 {health.cooldown:.0f} 秒")
@@ -0,0 +1,85 @@
+"""
+訊息處理管線的輔助工具
+- StatusMessage: 處理中訊息的送出與狀態更新改為背景執行 (fire-and-forget)，
+  連續的狀態更新只送出最新的一次，UI 往返不再阻塞資料查詢
+- StageTimer: 記錄每則訊息各階段的時間點，用來確認關鍵路徑的長度 (彙總由 /metrics 的 histogram 負責)
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+
+class StatusMessage:
+    """
+    包裝 Chainlit 的處理中訊息
+    send() / set() 立即返回，實際的 websocket 往返在背景依序執行；
+    更新還在送出時又有新的狀態，只保留最新內容 (coalesce)
+    """
+
+    def __init__(self, message):
+        self.message = message
+        self._pending: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sent = False
+        self._closed = False
+        self.updates_sent = 0
+        self.updates_coalesced = 0
+
+    def send(self):
+        self._schedule()
+
+    def set(self, content: str):
+        """設定新的狀態文字 (關閉後忽略)"""
+        if self._closed or (self._pending is None and content == self.message.content):
+            return
+        if self._pending is not None:
+            self.updates_coalesced += 1
+        self._pending = content
+        self._schedule()
+
+    def _schedule(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            if not self._sent:
+                self._sent = True
+                await self.message.send()
+            while self._pending is not None:
+                self.message.content, self._pending = self._pending, None
+                await self.message.update()
+                self.updates_sent += 1
+        except Exception as e:
+            print(f"⚠️ 狀態訊息更新失敗: {e}")
+
+    async def flush(self):
+        """等待背景的送出 / 更新完成"""
+        if self._task is not None:
+            await self._task
+
+    async def close(self):
+        """
+        停止接受狀態更新並等待進行中的更新完成
+        之後才可以直接寫入訊息內容 (串流或最終回答)，避免被較晚送達的狀態覆蓋
+        """
+        self._closed = True
+        await self.flush()
+
+
+class StageTimer:
+    """單則訊息的階段時間點 (相對於開始的毫秒數)"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> float:
+        elapsed = (time.perf_counter() - self._start) * 1000
+        self.marks[stage] = round(elapsed, 1)
+        return elapsed
+
+    def summary(self) -> str:
+        """log 用，例如 "intent=0.4ms fetch_started=0.6ms data_ready=412.3ms" """
+        return " ".join(f"{stage}={ms}ms" for stage, ms in self.marks.items())
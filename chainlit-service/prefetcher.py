@@ -0,0 +1,86 @@
+"""
+市場資料背景預取的排程策略
+- 熱門度: 以指數衰減計數記錄最近被查詢的幣種與查詢頻率
+- 間隔: 查詢越頻繁越常更新，配額吃緊或閒置時拉長間隔
+"""
+
+import math
+import time
+from typing import Dict, List, Optional
+
+
+class PopularityTracker:
+    """以半衰期衰減的查詢計數 (舊的查詢影響力逐漸降低)"""
+
+    def __init__(self, half_life: float = 600.0, maxsize: int = 1000):
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self._scores: Dict[str, float] = {}
+        self._updated: Dict[str, float] = {}
+        self._requests = 0.0
+        self._requests_updated = time.monotonic()
+
+    def _decay(self, elapsed: float) -> float:
+        return math.pow(0.5, elapsed / self.half_life)
+
+    def record_request(self, now: Optional[float] = None):
+        """記錄一則使用者訊息 (用來估計查詢頻率)"""
+        now = time.monotonic() if now is None else now
+        self._requests = self._requests * self._decay(now - self._requests_updated) + 1
+        self._requests_updated = now
+
+    def record(self, coin_id: str, now: Optional[float] = None):
+        """記錄一次幣種查詢"""
+        now = time.monotonic() if now is None else now
+        score = self._scores.get(coin_id, 0.0) * self._decay(now - self._updated.get(coin_id, now))
+        self._scores[coin_id] = score + 1
+        self._updated[coin_id] = now
+        if len(self._scores) > self.maxsize:
+            # 移除目前分數最低的一半
+            for stale_id in self.hot(len(self._scores))[self.maxsize // 2:]:
+                del self._scores[stale_id]
+                del self._updated[stale_id]
+
+    def hot(self, n: int, now: Optional[float] = None) -> List[str]:
+        """目前最熱門的 n 個幣種"""
+        now = time.monotonic() if now is None else now
+        current = {
+            coin_id: score * self._decay(now - self._updated[coin_id])
+            for coin_id, score in self._scores.items()
+        }
+        return sorted(current, key=current.get, reverse=True)[:n]
+
+    def requests_per_minute(self, now: Optional[float] = None) -> float:
+        """近期的每分鐘查詢數 (衰減計數換算成穩態速率)"""
+        now = time.monotonic() if now is None else now
+        decayed = self._requests * self._decay(now - self._requests_updated)
+        return decayed * math.log(2) / self.half_life * 60
+
+
+class AdaptiveInterval:
+    """
+    決定下一次預取前要等多久
+
+    - 查詢頻率達 busy_rpm 時使用 min_interval，完全閒置時使用 max_interval，中間依比例內插
+    - 可用配額低於 low_quota 比例時，間隔加倍 (不超過 max_interval)
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 30.0,
+        max_interval: float = 300.0,
+        busy_rpm: float = 10.0,
+        low_quota: float = 0.3,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.busy_rpm = busy_rpm
+        self.low_quota = low_quota
+
+    def next(self, requests_per_minute: float, quota_ratio: float, paused_seconds: float = 0.0) -> float:
+        activity = min(1.0, requests_per_minute / self.busy_rpm) if self.busy_rpm > 0 else 1.0
+        interval = self.max_interval - (self.max_interval - self.min_interval) * activity
+        if quota_ratio < self.low_quota:
+            interval = min(self.max_interval, interval * 2)
+        # 上游要求暫停 (429) 時，至少等到暫停結束
+        return max(interval, paused_seconds)
@@ -0,0 +1,209 @@
+"""
+市場資料 prompt 組裝
+取代 json.dumps(data, indent=2)：
+- 依意圖只保留需要的欄位 (field projection)，去除 None / 空值
+- 數字依數量級四捨五入 (百分比 2 位小數、其他 6 位有效數字、大數取整數)
+- 多筆資料以表格 (表頭 + 以 | 分隔的列) 編碼，單筆資料以 key=value 編碼
+- 只附上資料中實際出現欄位的說明 (例如 stale、technical_indicators)
+"""
+
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+from hedging import estimate_tokens
+
+# 各意圖下 crypto_data 保留的欄位 (依序輸出)
+CRYPTO_FIELDS: Dict[str, List[str]] = {
+    "price": [
+        "name", "symbol", "current_price_usd", "current_price_twd",
+        "price_change_percentage_24h", "price_change_percentage_7d", "price_change_percentage_30d",
+        "high_24h_usd", "low_24h_usd", "market_cap_usd", "market_cap_rank", "total_volume_usd",
+        "circulating_supply", "max_supply", "ath", "ath_date", "atl", "atl_date", "last_updated",
+        "stale", "data_age_seconds", "local_history",
+    ],
+    "compare": [
+        "name", "symbol", "current_price_usd",
+        "price_change_percentage_24h", "price_change_percentage_7d", "price_change_percentage_30d",
+        "market_cap_usd", "market_cap_rank", "total_volume_usd", "ath", "stale", "data_age_seconds",
+    ],
+    "analysis": [
+        "name", "symbol", "current_price_usd",
+        "price_change_percentage_24h", "price_change_percentage_7d", "price_change_percentage_30d",
+        "market_cap_usd", "market_cap_rank", "total_volume_usd", "ath", "atl",
+        "stale", "data_age_seconds", "local_history", "technical_indicators",
+    ],
+}
+
+# 其他資料類型保留的欄位
+DATA_FIELDS: Dict[str, List[str]] = {
+    "trending_coins": ["name", "symbol", "market_cap_rank", "price_btc", "stale", "data_age_seconds"],
+    "search_results": ["type", "name", "symbol", "id", "market_cap_rank", "stale", "data_age_seconds"],
+    "watchlist": ["name", "symbol", "current_price_usd", "price_change_percentage_24h", "market_cap_rank", "stale"],
+    "nft_data": [
+        "name", "symbol", "floor_price_usd", "floor_price_native", "market_cap_usd", "volume_24h_usd",
+        "total_supply", "number_of_unique_addresses", "stale", "data_age_seconds",
+    ],
+}
+
+# 資料中出現這些欄位時才加入的說明
+DATA_NOTES: Dict[str, str] = {
+    "stale": "- 若資料標記 stale: true，代表 CoinGecko 暫時無法連線，這是 data_age_seconds 秒前的快取資料，請提醒用戶資料可能不是最新",
+    "local_history": "- local_history 是本服務記錄的最近 window_seconds 秒價格統計 (最高 / 最低、報酬率、波動度 %)，回答短時間波動問題時請優先使用",
+    "watchlist_summary": "- watchlist 是用戶的收藏清單，watchlist_summary 為整體統計 (weighted_change_24h 為市值加權 24 小時漲跌 %)",
+    "unavailable_sources": "- unavailable_sources 列出這次查詢失敗或逾時的資料來源，請以取得的資料回答並告知用戶哪部分暫時無法取得",
+    "technical_indicators": "- technical_indicators 是以過去 days 天走勢計算的 RSI、MACD、布林通道 (percent_b)、年化已實現波動度與回撤摘要，trend 為降採樣後的走勢 [UTC 時間, 價格]，分析走勢時請引用",
+}
+
+
+class BuiltPrompt(NamedTuple):
+    text: str
+    tokens: int       # 估計的 input token 數
+    data_tokens: int  # 其中市場資料的 token 數
+
+
+def _round(key: str, value: float) -> Any:
+    """依欄位與數量級決定精度"""
+    if "percentage" in key or key.endswith("_pct") or key in ("rsi", "percent_b"):
+        return round(value, 2)
+    if abs(value) >= 1e6:
+        return int(round(value))
+    return float(f"{value:.6g}")
+
+
+def compact(value: Any, key: str = "") -> Any:
+    """遞迴去除 None / 空值並四捨五入數字"""
+    if isinstance(value, dict):
+        result = {}
+        for child_key, child in value.items():
+            child = compact(child, child_key)
+            if child is not None and child != "" and child != [] and child != {}:
+                result[child_key] = child
+        return result
+    if isinstance(value, list):
+        return [compact(item, key) for item in value if item is not None]
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        return _round(key, value)
+    return value
+
+
+def project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+
+def _flatten(record: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """巢狀 dict 攤平成 a.b 的欄位名稱"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _scalar(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def encode_records(records: List[Dict[str, Any]]) -> str:
+    """多筆資料編碼成表格；列表型欄位 (例如 trend) 不適合放進表格，另外逐筆列出"""
+    rows = [_flatten(record) for record in records]
+    columns: List[str] = []
+    for row in rows:
+        for column in row:
+            if column not in columns and not isinstance(row[column], list):
+                columns.append(column)
+
+    lines = ["|".join(columns)]
+    extras = []
+    for row in rows:
+        lines.append("|".join(_scalar(row.get(column, "")) for column in columns))
+        label = row.get("symbol") or row.get("name") or row.get("id") or ""
+        for column, value in row.items():
+            if isinstance(value, list):
+                extras.append(f"{label}.{column}={_scalar(value)}")
+    return "\n".join(lines + extras)
+
+
+def encode_record(record: Dict[str, Any]) -> str:
+    """單筆資料編碼成 key=value 行"""
+    return "\n".join(f"{key}={_scalar(value)}" for key, value in _flatten(record).items())
+
+
+def _keys(value: Any) -> Set[str]:
+    """所有出現過的欄位名稱 (用來決定要加入哪些說明)"""
+    if isinstance(value, dict):
+        keys = set(value)
+        for child in value.values():
+            keys |= _keys(child)
+        return keys
+    if isinstance(value, list):
+        keys = set()
+        for item in value:
+            keys |= _keys(item)
+        return keys
+    return set()
+
+
+def project_data(data: Dict[str, Any], intent: Optional[str] = None) -> Dict[str, Any]:
+    """依意圖投影欄位並去除空值、四捨五入"""
+    projected = {}
+    for name, value in data.items():
+        fields = CRYPTO_FIELDS.get(intent or "price") if name == "crypto_data" else DATA_FIELDS.get(name)
+        if isinstance(value, list):
+            projected[name] = [compact(project(item, fields)) if isinstance(item, dict) else item for item in value]
+        elif isinstance(value, dict):
+            projected[name] = compact(project(value, fields))
+        else:
+            projected[name] = compact(value, name)
+    return projected
+
+
+def encode_data(projected: Dict[str, Any]) -> str:
+    """把投影後的資料編碼成表格 / key=value 區塊"""
+    sections = []
+    for name, value in projected.items():
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            sections.append(f"[{name}]\n{encode_records(value)}")
+        elif isinstance(value, dict):
+            sections.append(f"[{name}]\n{encode_record(value)}")
+        elif value not in (None, "", []):
+            sections.append(f"[{name}]\n{_scalar(value)}")
+    return "\n\n".join(sections)
+
+
+def data_notes(projected: Dict[str, Any]) -> List[str]:
+    keys = _keys(projected)
+    return [note for key, note in DATA_NOTES.items() if key in keys]
+
+
+def build_data_prompt(system_prompt: str, query: str, data: Dict[str, Any], intent: Optional[str] = None) -> BuiltPrompt:
+    """組合系統提示詞、用戶問題與精簡後的市場資料"""
+    projected = project_data(data, intent)
+    data_text = encode_data(projected)
+    notes = data_notes(projected)
+    text = system_prompt
+    if notes:
+        text += "\n".join(notes) + "\n"
+    text += (
+        f"\n\n用戶問題: {query}"
+        f"\n\n--- 即時市場資料 (來自 CoinGecko，多筆資料為 | 分隔的表格，第一列為欄位名稱) ---\n{data_text}"
+        "\n\n請根據以上即時資料,用專業且友善的方式回答用戶問題。"
+    )
+    return BuiltPrompt(text, estimate_tokens(text), estimate_tokens(data_text))
+
+
+def legacy_data_prompt(system_prompt: str, query: str, data: Dict[str, Any]) -> str:
+    """原本的格式 (json.dumps indent=2)，供基準測試比較"""
+    data_text = "\n\n--- 即時市場資料 (來自 CoinGecko) ---\n" + json.dumps(data, ensure_ascii=False, indent=2)
+    return f"{system_prompt}\n\n用戶問題: {query}{data_text}\n\n請根據以上即時資料,用專業且友善的方式回答用戶問題。"
+
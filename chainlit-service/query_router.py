@@ -0,0 +1,63 @@
+"""
+多意圖資料來源路由
+一則訊息可能同時問到熱門趨勢、價格、收藏清單、NFT 與搜尋；
+符合的資料來源以 asyncio.gather 同時執行，每個來源有自己的逾時，
+失敗或逾時的來源不影響其他來源，結果合併成一份給 LLM 的資料
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class DataSource(NamedTuple):
+    name: str
+    fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]  # 回傳要合併進 prompt 資料的 dict
+    timeout: float
+    label: str = ""  # 顯示在處理中訊息的名稱
+
+
+class SourceResult(NamedTuple):
+    name: str
+    status: str  # ok / empty / timeout / error
+    value: Optional[Dict[str, Any]]
+    elapsed: float
+    error: Optional[str] = None
+
+
+async def run_source(source: DataSource) -> SourceResult:
+    """執行單一來源，例外與逾時都轉成結果狀態而不往外拋"""
+    start = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(source.fetch(), timeout=source.timeout)
+    except asyncio.TimeoutError:
+        return SourceResult(source.name, "timeout", None, time.perf_counter() - start)
+    except Exception as e:
+        return SourceResult(source.name, "error", None, time.perf_counter() - start, str(e))
+    return SourceResult(source.name, "ok" if value else "empty", value or None, time.perf_counter() - start)
+
+
+async def gather_sources(sources: List[DataSource]) -> Dict[str, SourceResult]:
+    """同時執行所有來源 (總耗時約等於最慢的來源)"""
+    results = await asyncio.gather(*(run_source(source) for source in sources))
+    return {result.name: result for result in results}
+
+
+def merge_results(results: Dict[str, SourceResult]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    合併成功來源的資料
+    回傳 (資料, 無法取得的來源)，後者以「名稱: 原因」表示，讓 LLM 可以告知用戶哪部分缺資料
+    """
+    data: Dict[str, Any] = {}
+    unavailable = []
+    for result in results.values():
+        if result.status == "ok":
+            data.update(result.value)
+        elif result.status in ("timeout", "error"):
+            unavailable.append(f"{result.name}: {result.status}")
+    return data, unavailable
+
+
+def describe_results(results: Dict[str, SourceResult]) -> str:
+    """log 用的摘要，例如 "trending=ok 0.42s, watchlist=timeout 8.00s" """
+    return ", ".join(f"{result.name}={result.status} {result.elapsed:.2f}s" for result in results.values())
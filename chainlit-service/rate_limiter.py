@@ -0,0 +1,167 @@
+"""
+客戶端速率限制
+Token bucket + 優先順序佇列：互動查詢優先於背景更新，
+遇到 429 時依 Retry-After 暫停整個 bucket
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+
+class Priority:
+    """請求優先順序 (數字越小越優先)"""
+    INTERACTIVE = 0   # 使用者正在等待的查詢
+    BACKGROUND = 1    # 快取背景更新、預取
+
+
+def parse_retry_after(value: Optional[str], default: float = 60.0) -> float:
+    """解析 Retry-After header (秒數或 HTTP 日期)，回傳需等待的秒數"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucketLimiter:
+    """
+    非同步 token bucket 速率限制器
+
+    - 每分鐘補充 rate_per_minute 個 token，最多累積 burst 個
+    - 取不到 token 的請求會排隊等待 (依優先順序，其次依到達順序)
+    - 背景請求需保留 background_reserve 個 token 給互動查詢
+    - 超過 max_wait 仍無法取得 token 時回傳 False，由呼叫端決定如何降級
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_minute: float,
+        burst: int,
+        background_reserve: int = 1,
+    ):
+        if rate_per_minute <= 0:
+            raise ValueError(f"{name} 的 rate_per_minute 必須大於 0，收到 {rate_per_minute}")
+        if burst < 1:
+            raise ValueError(f"{name} 的 burst 至少為 1，收到 {burst}")
+        if not 0 <= background_reserve < burst:
+            # 保留量不小於 burst 時 bucket 永遠不會多出可給背景請求的 token，背景請求只會逾時
+            raise ValueError(
+                f"{name} 的 background_reserve 必須介於 0 與 burst - 1 之間，收到 {background_reserve} (burst={burst})"
+            )
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.background_reserve = background_reserve
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[list] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = 0.0
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"granted": 0, "timeouts": 0, "throttled": 0}
+
+    async def acquire(self, priority: int = Priority.INTERACTIVE, max_wait: float = 5.0) -> bool:
+        """取得一個 token；最多等待 max_wait 秒"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._seq), future])
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+            self.stats["granted"] += 1
+            return True
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # 逾時的同時剛好拿到 token，仍視為成功
+                self.stats["granted"] += 1
+                return True
+            future.cancel()
+            self.stats["timeouts"] += 1
+            return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已分配的 token 沒被使用，歸還
+                self._tokens = min(self.burst, self._tokens + 1)
+            future.cancel()
+            self._dispatch()
+            raise
+
+    def pause(self, seconds: float):
+        """上游回傳 429 時暫停所有請求"""
+        self.stats["throttled"] += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        print(f"🚦 {self.name} 觸發速率限制，暫停 {seconds:.0f} 秒")
+        self._dispatch()
+
+    def remaining(self) -> Dict[str, Any]:
+        """目前剩餘的配額狀態"""
+        self._refill()
+        return {
+            "tokens_available": round(self._tokens, 2),
+            "burst": self.burst,
+            "rate_per_minute": round(self.rate * 60, 2),
+            "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 1),
+            "queued": sum(1 for waiter in self._waiters if not waiter[2].done()),
+            **self.stats,
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        if now >= self._paused_until:
+            start = max(self._updated_at, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._updated_at = now
+
+    def _dispatch(self):
+        """依優先順序分配 token 給排隊中的請求"""
+        self._refill()
+
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            now = time.monotonic()
+            if now < self._paused_until:
+                self._schedule(self._paused_until - now)
+                return
+
+            needed = 1 + (self.background_reserve if priority > Priority.INTERACTIVE else 0)
+            if self._tokens < needed:
+                self._schedule((needed - self._tokens) / self.rate)
+                return
+
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            future.set_result(None)
+
+    def _schedule(self, delay: float):
+        """排定下一次分配；已有更早的排程時不重複設定"""
+        loop = asyncio.get_running_loop()
+        fire_at = loop.time() + max(delay, 0.001)
+        if self._timer is not None and self._timer_loop is loop:
+            if self._timer_at <= fire_at:
+                return
+            self._timer.cancel()
+        self._timer_at = fire_at
+        self._timer_loop = loop
+        self._timer = loop.call_at(fire_at, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
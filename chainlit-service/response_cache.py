@@ -0,0 +1,196 @@
+"""
+LLM 回答快取
+key = 正規化後的問題 + 意圖 + 幣種 + 市場資料的粗略分桶；
+市場資料變動超過分桶範圍時 key 自然改變，不會回傳過時的分析
+"""
+
+import hashlib
+import math
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+_PUNCTUATION_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+# get() 與 set() 之間 (等待 LLM 回答時) 最多暫存幾個問題向量
+MAX_PENDING_EMBEDDINGS = 256
+
+# 價格以對數分桶 (每 0.5% 一格)，漲跌幅以 1 個百分點分桶
+PRICE_BUCKET_RATIO = 1.005
+
+
+def normalize_query(query: str) -> str:
+    """全形轉半形、小寫、去除空白與標點 ("ETH 現在怎麼樣？" -> "eth現在怎麼樣")"""
+    return _PUNCTUATION_PATTERN.sub("", unicodedata.normalize("NFKC", query).lower())
+
+
+def _bucket(key: str, value: Any) -> Any:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if key in ("current_price_usd", "price", "price_btc", "floor_price_usd"):
+        return round(math.log(value) / math.log(PRICE_BUCKET_RATIO)) if value > 0 else 0
+    if "percentage" in key or key.endswith("_pct"):
+        return round(value)
+    return None
+
+
+# 參與分桶的欄位 (其他欄位不影響 key)
+FINGERPRINT_FIELDS = {
+    "id", "stale", "market_cap_rank", "current_price_usd", "price_btc", "floor_price_usd",
+    "price_change_percentage_24h", "price_change_percentage_7d", "rsi", "return_pct",
+}
+
+
+def market_fingerprint(data: Any) -> str:
+    """市場資料的粗略指紋 (小幅波動不改變指紋)"""
+    parts: List[Tuple[str, Any]] = []
+
+    def walk(value: Any):
+        if isinstance(value, dict):
+            for key in sorted(value):
+                child = value[key]
+                if isinstance(child, (dict, list)):
+                    walk(child)
+                elif key in FINGERPRINT_FIELDS:
+                    parts.append((key, _bucket(key, child)))
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(data)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16] if parts else ""
+
+
+class ResponseKey(NamedTuple):
+    query: str
+    intent: str
+    coins: Tuple[str, ...]
+    fingerprint: str
+
+    @property
+    def scope(self) -> Tuple[str, Tuple[str, ...], str]:
+        """語意比對只在相同意圖 / 幣種 / 市場資料之間進行"""
+        return self.intent, self.coins, self.fingerprint
+
+
+class _Entry:
+    __slots__ = ("text", "size", "expires_at", "embedding")
+
+    def __init__(self, text: str, size: int, expires_at: float, embedding: Optional[np.ndarray]):
+        self.text = text
+        self.size = size
+        self.expires_at = expires_at
+        self.embedding = embedding
+
+
+class ResponseCache:
+    """
+    依位元組大小淘汰的 LRU 回答快取，每筆有自己的 TTL
+    embed 不為 None 時，完全比對失敗後會以向量相似度尋找相近的問題
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 16 * 1024 * 1024,
+        embed: Optional[Callable[[str], Awaitable[Sequence[float]]]] = None,
+        similarity_threshold: float = 0.92,
+    ):
+        self.max_bytes = max_bytes
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[ResponseKey, _Entry]" = OrderedDict()
+        self._bytes = 0
+        # get() 未命中時算出的問題向量，留給接下來 set() 同一個問題時使用 (避免重複呼叫 embedding)
+        self._pending_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _live(self, key: ResponseKey, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < now:
+            self._remove(key)
+            return None
+        return entry
+
+    async def _embedding(self, query: str) -> Optional[np.ndarray]:
+        if self.embed is None:
+            return None
+        try:
+            vector = np.asarray(await self.embed(query), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ 問題向量化失敗: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    async def get(self, key: ResponseKey) -> Optional[str]:
+        now = time.monotonic()
+        entry = self._live(key, now)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry.text
+
+        if self.embed is not None:
+            candidates = [
+                (other, entry) for other, entry in list(self._entries.items())
+                if other.scope == key.scope and entry.embedding is not None and self._live(other, now)
+            ]
+            if candidates:
+                vector = await self._embedding(key.query)
+                if vector is not None:
+                    matrix = np.vstack([entry.embedding for _, entry in candidates])
+                    scores = matrix @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        other, entry = candidates[best]
+                        self._entries.move_to_end(other)
+                        self.stats["semantic_hits"] += 1
+                        return entry.text
+                    self._pending_embeddings[key.query] = vector
+                    while len(self._pending_embeddings) > MAX_PENDING_EMBEDDINGS:
+                        self._pending_embeddings.popitem(last=False)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: ResponseKey, text: str, ttl: float):
+        size = len(text.encode("utf-8")) + len(key.query.encode("utf-8"))
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        embedding = self._pending_embeddings.pop(key.query, None)
+        if embedding is None:
+            embedding = await self._embedding(key.query)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(text, size, time.monotonic() + ttl, embedding)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": round((self.stats["hits"] + self.stats["semantic_hits"]) / lookups, 3) if lookups else 0.0,
+        }
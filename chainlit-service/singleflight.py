@@ -0,0 +1,68 @@
+"""
+Single-flight 請求合併
+相同 key 的並行請求只會真正送出一次，所有等待者共用同一個結果
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    """一個進行中的上游請求與其等待者數量"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合併相同 key 的並行請求
+
+    取消語意：
+    - 單一等待者被取消，不會影響其他等待者依賴的上游請求 (asyncio.shield)
+    - 只有在所有等待者都離開後，才會取消上游請求
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.stats = {"leader": 0, "shared": 0}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """執行 fn()，若相同 key 已有進行中的請求則直接等待它的結果"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, task))
+            self.stats["leader"] += 1
+        else:
+            self.stats["shared"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # 最後一個等待者也離開了，上游結果已沒有人需要
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                # 立即移除，之後進來的請求會重新發起而不是等到已取消的任務
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        """請求結束後移除記錄，並讀取例外避免 "exception was never retrieved" 警告"""
+        flight = self._flights.get(key)
+        if flight is not None and flight.task is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,164 @@
+"""app.py 中不需要網路的路由與資料整理邏輯的測試"""
+
+import app
+
+
+def plan(query: str, token: str = "jwt"):
+    """與 main() 相同的方式偵測意圖並規劃資料來源"""
+    detection = app.intent_engine.detect(query)
+    detected_coin = detection.coins[0] if detection.coins else None
+    coin_ids = detection.coins if len(detection.coins) > 1 else [detected_coin] if detected_coin else []
+    wants_analysis = app.INDICATORS_ENABLED and "analysis" in detection.intents
+    return app.plan_sources(detection, coin_ids, query, token, wants_analysis)
+
+
+def names(sources):
+    return [source.name for source in sources]
+
+
+# ============ plan_sources ============
+
+def test_watchlist_with_search_verb_is_watchlist_only():
+    assert names(plan("查看我的收藏清單")) == ["watchlist"]
+    assert names(plan("幫我查一下我的收藏")) == ["watchlist"]
+
+
+def test_watchlist_without_login_plans_nothing():
+    # main() 以 watchlist_only 路徑提示登入，不會改成搜尋
+    assert names(plan("查看我的收藏清單", token=None)) == []
+
+
+def test_trending_with_search_verb_is_trending_only():
+    assert names(plan("找熱門的幣")) == ["trending"]
+
+
+def test_plain_search_strips_filler_words():
+    sources = plan("幫我查一下 pepe")
+    assert names(sources) == ["search"]
+    assert sources[0].label == "搜尋 pepe"
+
+
+def test_price_question_does_not_search():
+    assert names(plan("查 BTC 價格")) == ["crypto"]
+
+
+def test_multi_intent_sources():
+    assert sorted(names(plan("熱門幣種和我的收藏清單"))) == ["trending", "watchlist"]
+    assert sorted(names(plan("BTC 價格和熱門趨勢"))) == ["crypto", "trending"]
+
+
+def test_extract_search_term():
+    assert app.extract_search_term("Search for me solana", ["search"]) == "solana"
+    assert app.extract_search_term("找 Bored Ape NFT", ["nft", "search"]) == "bored ape"
+
+
+# ============ register_registry_coins ============
+
+def registry_engine(monkeypatch):
+    """以真實的 register_registry_coins 流程載入 (市值前段常見的) 幣種"""
+    registry = app.CoinRegistry()
+    registry.load_records(app.CoinRegistry.build_records(
+        [
+            {"id": "just", "symbol": "jst", "name": "JUST"},
+            {"id": "coredaoorg", "symbol": "core", "name": "Core"},
+            {"id": "gas", "symbol": "gas", "name": "Gas"},
+            {"id": "safe", "symbol": "safe", "name": "Safe"},
+            {"id": "pepe", "symbol": "pepe", "name": "Pepe"},
+            {"id": "thorchain", "symbol": "rune", "name": "THORChain"},
+            {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+        ],
+        [{"id": coin_id, "market_cap_rank": rank} for rank, coin_id in enumerate(
+            ["ethereum", "pepe", "thorchain", "just", "coredaoorg", "gas", "safe"], start=1
+        )],
+    ))
+    engine = app.build_default_engine()
+    monkeypatch.setattr(app, "coin_registry", registry)
+    monkeypatch.setattr(app, "intent_engine", engine)
+    monkeypatch.setattr(app, "_registered_coin_ids", set())
+    app.register_registry_coins()
+    return engine
+
+
+def test_registry_names_that_are_common_words(monkeypatch):
+    engine = registry_engine(monkeypatch)
+    assert engine.detect("just tell me the eth price").coins == ["ethereum"]
+    assert engine.detect("is it safe to check the price now").coins == []
+    assert engine.detect("what is the core price trend").coins == []
+    assert engine.detect("gas price on ethereum").coins == ["ethereum"]
+    # 意圖引擎沒找到幣種時的模糊比對也略過這些單字
+    monkeypatch.setattr(app, "coin_fuzzy", app.build_coin_fuzzy_index(app.coin_registry))
+    assert app.fuzzy_detect_coins("what is the core price trend") == []
+    assert app.fuzzy_detect_coins("is it safe to check the price now") == []
+
+
+def test_registry_common_words_with_explicit_context(monkeypatch):
+    engine = registry_engine(monkeypatch)
+    assert engine.detect("CORE price").coins == ["coredaoorg"]
+    assert engine.detect("safe token 多少").coins == ["safe"]
+    assert engine.detect("JST 價格").coins == ["just"]
+
+
+def test_registry_names_and_symbols(monkeypatch):
+    engine = registry_engine(monkeypatch)
+    assert engine.detect("how is pepe doing").coins == ["pepe"]
+    assert engine.detect("thorchain 和 RUNE").coins == ["thorchain"]
+    assert engine.detect("the rune on the wall").coins == []
+
+
+# ============ /coins/markets 批次 ============
+
+def test_chunk_ids_count_limit():
+    coin_ids = [f"c{i}" for i in range(app.COINGECKO_MARKETS_MAX_IDS * 2 + 1)]
+    chunks = app._chunk_ids(coin_ids)
+    assert [len(chunk) for chunk in chunks] == [250, 250, 1]
+    assert sum(chunks, []) == coin_ids
+    assert app._chunk_ids(coin_ids[:250]) == [coin_ids[:250]]
+    assert app._chunk_ids([]) == []
+
+
+def test_chunk_ids_url_length_boundary():
+    # 79 個 18 字元的 id 以逗號串接剛好 1500 字元
+    coin_ids = [f"{i:018d}" for i in range(79)]
+    assert len(",".join(coin_ids)) == app.COINGECKO_IDS_MAX_CHARS
+    assert app._chunk_ids(coin_ids) == [coin_ids]
+
+    longer = coin_ids[:-1] + ["0" * 19]
+    chunks = app._chunk_ids(longer)
+    assert chunks == [longer[:-1], longer[-1:]]
+    assert all(len(",".join(chunk)) <= app.COINGECKO_IDS_MAX_CHARS for chunk in chunks)
+
+
+def test_chunk_ids_overlong_id_gets_its_own_chunk():
+    huge = "x" * (app.COINGECKO_IDS_MAX_CHARS + 10)
+    assert app._chunk_ids(["bitcoin", huge, "ethereum"]) == [["bitcoin"], [huge], ["ethereum"]]
+
+
+def test_market_to_price_maps_fields():
+    price = app._market_to_price({
+        "id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "current_price": 60000.0,
+        "market_cap": 1.2e12, "market_cap_rank": 1, "price_change_percentage_24h": 1.5,
+        "price_change_percentage_7d_in_currency": -3.0, "high_24h": 61000.0,
+    }, twd_rate=32.0)
+    assert price["symbol"] == "BTC"
+    assert price["current_price_twd"] == 60000.0 * 32.0
+    assert price["market_cap_usd"] == 1.2e12
+    assert price["high_24h_usd"] == 61000.0
+    assert price["price_change_percentage_7d"] == -3.0
+    assert "stale" not in price
+
+
+def test_market_to_price_missing_fields():
+    price = app._market_to_price({"id": "newcoin", "symbol": None}, twd_rate=32.0)
+    assert price["id"] == "newcoin"
+    assert price["symbol"] == ""
+    assert price["current_price_usd"] is None
+    assert price["current_price_twd"] is None
+    assert price["price_change_percentage_30d"] is None
+    # 沒有匯率時不換算台幣
+    assert app._market_to_price({"id": "bitcoin", "current_price": 1.0}, twd_rate=None)["current_price_twd"] is None
+    assert app._market_to_price({"id": "bitcoin", "current_price": 0.0}, twd_rate=32.0)["current_price_twd"] == 0.0
+
+
+def test_market_to_price_keeps_stale_marker():
+    price = app._market_to_price({"id": "bitcoin", "current_price": 1.0, "_stale": {"age_seconds": 90}}, twd_rate=None)
+    assert (price["stale"], price["data_age_seconds"]) == (True, 90)
@@ -0,0 +1,131 @@
+"""TTL / stale-while-revalidate 快取的測試"""
+
+import asyncio
+
+from cache import CacheStatus, StaleWhileRevalidateCache, TTLCache
+
+
+def make_loader(values):
+    """依序回傳 values 的 loader，並記錄呼叫次數"""
+    calls = []
+
+    async def loader():
+        calls.append(len(calls))
+        return values[min(len(calls) - 1, len(values) - 1)]
+
+    return loader, calls
+
+
+def age_entry(cache: StaleWhileRevalidateCache, key, seconds: float):
+    cache.peek(key).stored_at -= seconds
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+
+
+def test_ttl_cache_get_ignores_expired_entry():
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1)
+    cache.get_entry("a").stored_at -= 61
+    assert cache.get("a") is None
+    assert cache.get_entry("a").value == 1
+
+
+def test_miss_then_fresh():
+    async def scenario():
+        cache = StaleWhileRevalidateCache("test", ttl=60, stale_ttl=60)
+        loader, calls = make_loader(["v1"])
+        first = await cache.get_or_load("k", loader)
+        second = await cache.get_or_load("k", loader)
+        return first, second, calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert (first.value, first.status) == ("v1", CacheStatus.MISS)
+    assert (second.value, second.status) == ("v1", CacheStatus.FRESH)
+    assert len(calls) == 1
+
+
+def test_stale_value_served_and_revalidated_in_background():
+    async def scenario():
+        cache = StaleWhileRevalidateCache("test", ttl=60, stale_ttl=60)
+        loader, calls = make_loader(["v1", "v2"])
+        await cache.get_or_load("k", loader)
+        age_entry(cache, "k", 90)
+
+        stale = await cache.get_or_load("k", loader)
+        # 背景更新完成前，同一個 key 不會重複排程
+        again = await cache.get_or_load("k", loader)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        fresh = await cache.get_or_load("k", loader)
+        return stale, again, fresh, calls
+
+    stale, again, fresh, calls = asyncio.run(scenario())
+    assert (stale.value, stale.status) == ("v1", CacheStatus.STALE)
+    assert again.status == CacheStatus.STALE
+    assert (fresh.value, fresh.status) == ("v2", CacheStatus.FRESH)
+    assert len(calls) == 2
+
+
+def test_revalidate_loader_used_for_background_refresh():
+    async def scenario():
+        cache = StaleWhileRevalidateCache("test", ttl=60, stale_ttl=60)
+        loader, calls = make_loader(["v1"])
+        background, background_calls = make_loader(["v2"])
+        await cache.get_or_load("k", loader)
+        age_entry(cache, "k", 90)
+        await cache.get_or_load("k", loader, revalidate_loader=background)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return cache.peek("k").value, calls, background_calls
+
+    value, calls, background_calls = asyncio.run(scenario())
+    assert value == "v2"
+    assert len(calls) == 1
+    assert len(background_calls) == 1
+
+
+def test_too_old_entry_waits_for_upstream():
+    async def scenario():
+        cache = StaleWhileRevalidateCache("test", ttl=60, stale_ttl=60)
+        loader, _ = make_loader(["v1", "v2"])
+        await cache.get_or_load("k", loader)
+        age_entry(cache, "k", 200)
+        return await cache.get_or_load("k", loader)
+
+    result = asyncio.run(scenario())
+    assert (result.value, result.status) == ("v2", CacheStatus.MISS)
+
+
+def test_upstream_failure_falls_back_to_stale_value():
+    async def scenario():
+        cache = StaleWhileRevalidateCache("test", ttl=60, stale_ttl=60, max_stale_on_error=3600)
+        loader, _ = make_loader(["v1", None])
+        await cache.get_or_load("k", loader)
+        age_entry(cache, "k", 600)
+        return await cache.get_or_load("k", loader)
+
+    result = asyncio.run(scenario())
+    assert (result.value, result.status) == ("v1", CacheStatus.STALE_ERROR)
+
+
+def test_upstream_failure_without_usable_entry_is_miss():
+    async def scenario():
+        cache = StaleWhileRevalidateCache("test", ttl=60, stale_ttl=60, max_stale_on_error=300)
+        loader, _ = make_loader(["v1", None])
+        await cache.get_or_load("k", loader)
+        age_entry(cache, "k", 600)
+        failed = await cache.get_or_load("k", loader)
+        return failed, len(cache)
+
+    failed, size = asyncio.run(scenario())
+    assert (failed.value, failed.status) == (None, CacheStatus.MISS)
+    # 失敗結果不會寫入快取
+    assert size == 1
@@ -0,0 +1,87 @@
+"""本地幣種索引的測試"""
+
+from coin_registry import UNRANKED, CoinRecord, CoinRegistry
+
+
+def make_registry() -> CoinRegistry:
+    registry = CoinRegistry()
+    registry.load_records(CoinRegistry.build_records(
+        [
+            {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+            {"id": "bitcoin-cash", "symbol": "bch", "name": "Bitcoin Cash"},
+            {"id": "wrapped-bitcoin", "symbol": "wbtc", "name": "Wrapped Bitcoin"},
+            {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+            {"id": "ethereum-wormhole", "symbol": "eth", "name": "Ethereum (Wormhole)"},
+            {"id": "bitcoin-fake", "symbol": "btcf", "name": "Bitcoin Fake"},
+        ],
+        [
+            {"id": "bitcoin", "market_cap_rank": 1},
+            {"id": "ethereum", "market_cap_rank": 2},
+            {"id": "wrapped-bitcoin", "market_cap_rank": 15},
+            {"id": "bitcoin-cash", "market_cap_rank": 20},
+            {"id": "ethereum-wormhole", "market_cap_rank": 900},
+        ],
+    ))
+    return registry
+
+
+def test_build_records_marks_unranked():
+    registry = make_registry()
+    assert registry.get("bitcoin-fake").rank == UNRANKED
+    assert registry.top(10)[-1].id == "ethereum-wormhole"
+
+
+def test_symbol_collision_prefers_market_cap():
+    registry = make_registry()
+    assert [coin.id for coin in registry.by_symbol("ETH")] == ["ethereum", "ethereum-wormhole"]
+    assert registry.resolve("eth").id == "ethereum"
+
+
+def test_resolve_by_id_symbol_and_name():
+    registry = make_registry()
+    assert registry.resolve("bitcoin-cash").id == "bitcoin-cash"
+    assert registry.resolve(" BCH ").id == "bitcoin-cash"
+    assert registry.resolve("Wrapped Bitcoin").id == "wrapped-bitcoin"
+    assert registry.resolve("dogecoin") is None
+    assert registry.resolve("") is None
+
+
+def test_prefix_search_ordered_by_rank():
+    registry = make_registry()
+    assert [coin.id for coin in registry.prefix_search("bitc")] == ["bitcoin", "bitcoin-cash", "bitcoin-fake"]
+    assert [coin.id for coin in registry.prefix_search("bitc", limit=2)] == ["bitcoin", "bitcoin-cash"]
+
+
+def test_prefix_search_matches_symbol_name_and_id():
+    registry = make_registry()
+    # 代號 "wbtc"、名稱 "wrapped bitcoin"、id "wrapped-bitcoin" 都以 "w" 開頭，但只回傳一次
+    assert [coin.id for coin in registry.prefix_search("w")] == ["wrapped-bitcoin"]
+    assert registry.prefix_search("") == []
+    assert registry.prefix_search("zzz") == []
+
+
+def test_search_puts_exact_match_first():
+    registry = make_registry()
+    results = registry.search("bitcoin cash")
+    assert results[0].id == "bitcoin-cash"
+    assert [coin.id for coin in registry.search("bitcoin")] == ["bitcoin", "bitcoin-cash", "bitcoin-fake"]
+
+
+def test_snapshot_round_trip(tmp_path):
+    registry = make_registry()
+    path = str(tmp_path / "registry.json.gz")
+    registry.save_snapshot(path)
+
+    restored = CoinRegistry()
+    assert restored.load_snapshot(path)
+    assert restored.coins == registry.coins
+    assert restored.fetched_at == registry.fetched_at
+    assert restored.prefix_search("eth")[0] == CoinRecord("ethereum", "eth", "Ethereum", 2)
+
+
+def test_missing_or_corrupt_snapshot(tmp_path):
+    registry = CoinRegistry()
+    assert not registry.load_snapshot(str(tmp_path / "missing.json.gz"))
+    corrupt = tmp_path / "corrupt.json.gz"
+    corrupt.write_bytes(b"not gzip")
+    assert not registry.load_snapshot(str(corrupt))
@@ -0,0 +1,53 @@
+"""LTTB 降採樣的測試"""
+
+import numpy as np
+import pytest
+
+from downsample import downsample_series, lttb, series_to_points
+
+
+def random_walk(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=np.float64) * 60, 100 + np.cumsum(rng.normal(0, 1, n))
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (1000, 3), (101, 50), (20, 19)])
+def test_keeps_endpoints_and_threshold_length(n, threshold):
+    x, y = random_walk(n)
+    indexes = lttb(x, y, threshold)
+    assert len(indexes) == threshold
+    assert indexes[0] == 0
+    assert indexes[-1] == n - 1
+    assert np.all(np.diff(indexes) > 0)
+
+
+@pytest.mark.parametrize("threshold", [2, 0, 10, 50])
+def test_returns_all_points_when_nothing_to_drop(threshold):
+    x, y = random_walk(10)
+    assert lttb(x, y, threshold).tolist() == list(range(10))
+
+
+def test_one_point_per_bucket():
+    x, y = random_walk(1000)
+    indexes = lttb(x, y, 100)
+    edges = np.floor(np.linspace(1, 999, 99)).astype(int)
+    buckets = np.searchsorted(edges, indexes[1:-1], side="right") - 1
+    assert buckets.tolist() == list(range(98))
+
+
+def test_keeps_spike():
+    x = np.arange(500, dtype=np.float64)
+    y = np.zeros(500)
+    y[237] = 50.0
+    assert 237 in lttb(x, y, 20)
+
+
+def test_downsample_series_and_points():
+    times = np.array([1_700_000_000.0 + 60 * i for i in range(10)])
+    prices = np.linspace(1, 2, 10) * 63012.123456
+    small_times, small_prices = downsample_series(times, prices, 4)
+    assert small_times[0] == times[0] and small_times[-1] == times[-1]
+    assert len(small_prices) == 4
+
+    points = series_to_points(small_times[:1], small_prices[:1])
+    assert points == [["2023-11-14 22:13", 63012.1]]
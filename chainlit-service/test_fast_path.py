@@ -0,0 +1,58 @@
+"""快速路徑模板與統計的測試"""
+
+from fast_path import FastPathStats, can_use_fast_path, format_usd, is_plain_data_query, render_price_table
+
+
+def test_format_usd():
+    assert format_usd(None) == "N/A"
+    assert format_usd(0.0) == "$0"
+    assert format_usd(0.5) == "$0.5"
+    assert format_usd(0.00001234) == "$0.000012"
+    assert format_usd(-0.25) == "$-0.25"
+    assert format_usd(67000.5) == "$67,000.50"
+    assert format_usd(1234567.8, 0) == "$1,234,568"
+
+
+def test_plain_data_query():
+    assert is_plain_data_query("BTC 價格多少")
+    assert not is_plain_data_query("BTC 值得買嗎")
+    assert not is_plain_data_query("should I buy eth")
+
+
+def test_fast_path_only_for_plain_price_data():
+    btc = {"id": "bitcoin", "current_price_usd": 63000.0}
+    assert can_use_fast_path({"crypto_data": btc}, [], "BTC 價格多少")
+    assert can_use_fast_path({"crypto_data": [btc, {"id": "ethereum"}]}, [], "BTC ETH 價格")
+    assert not can_use_fast_path({"crypto_data": btc}, [], "BTC 值得買嗎")
+    assert not can_use_fast_path({"crypto_data": btc}, ["nft: timeout"], "BTC 價格多少")
+    assert not can_use_fast_path({"crypto_data": btc, "trending_coins": [{}]}, [], "BTC 價格和熱門")
+    assert not can_use_fast_path({"trending_coins": [{}]}, [], "熱門")
+
+
+def test_fast_path_skips_attached_history_and_indicators():
+    history = {"window_seconds": 3600, "high": 64000.0, "low": 62000.0}
+    btc = {"id": "bitcoin", "current_price_usd": 63000.0, "local_history": history}
+    assert is_plain_data_query("BTC 過去一小時價格")
+    assert not can_use_fast_path({"crypto_data": btc}, [], "BTC 過去一小時價格")
+    assert not can_use_fast_path(
+        {"crypto_data": [{"id": "ethereum"}, {"id": "bitcoin", "technical_indicators": {"rsi": 50}}]}, [], "BTC ETH"
+    )
+
+
+def test_price_table_renders_zero_price():
+    table = render_price_table([{"id": "dead-coin", "name": "Dead", "symbol": "DEAD", "current_price_usd": 0.0}])
+    assert "| $0 |" in table
+
+
+def test_stats_snapshot():
+    stats = FastPathStats()
+    for _ in range(4):
+        stats.record_message()
+    stats.record_fast_path(0.001)
+    stats.record_llm(2.0)
+    stats.record_llm(4.0)
+    snapshot = stats.snapshot()
+    assert snapshot["fast_path_rate"] == 0.25
+    assert snapshot["avg_render_ms"] == 1.0
+    assert snapshot["avg_llm_seconds"] == 3.0
+    assert snapshot["estimated_seconds_saved"] == 3.0
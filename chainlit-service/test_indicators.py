@@ -0,0 +1,89 @@
+"""技術指標引擎的測試 (增量更新與整段重算的比較)"""
+
+import numpy as np
+import pytest
+
+from indicators import IndicatorEngine, parse_market_chart
+
+STATE_FIELDS = ("ema_fast", "ema_slow", "signal", "avg_gain", "avg_loss")
+
+
+def random_walk(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    times = np.arange(n) * 3600.0
+    return times, prices
+
+
+def incremental_and_full(times, prices, first: slice, second: slice):
+    incremental = IndicatorEngine()
+    incremental.update({"coin": (times[first], prices[first])})
+    summary = incremental.update({"coin": (times[second], prices[second])})["coin"]
+
+    full = IndicatorEngine()
+    full_summary = full.update({"coin": (times[second], prices[second])})["coin"]
+    return incremental, summary, full, full_summary
+
+
+def test_appended_series_matches_full_recompute():
+    times, prices = random_walk(300)
+    incremental, summary, full, full_summary = incremental_and_full(times, prices, slice(0, 200), slice(0, 300))
+    assert incremental.stats["incremental"] == 1
+    for field in STATE_FIELDS:
+        assert getattr(incremental._states["coin"], field) == pytest.approx(getattr(full._states["coin"], field), rel=1e-12)
+    assert summary == full_summary
+
+
+@pytest.mark.parametrize("length", [168, 720])
+def test_sliding_window_converges_to_full_recompute(length):
+    times, prices = random_walk(length + 24)
+    # 視窗往後滑動 24 點：增量狀態保有被移出的歷史，整段重算從新視窗起算
+    incremental, summary, _, full_summary = incremental_and_full(
+        times, prices, slice(0, length), slice(24, length + 24)
+    )
+    assert incremental.stats["incremental"] == 1
+    assert summary["rsi"] == pytest.approx(full_summary["rsi"], abs=0.1)
+    for field in ("macd", "signal", "histogram"):
+        assert summary["macd"][field] == pytest.approx(full_summary["macd"][field], abs=summary["price"] * 1e-5)
+    # 非遞迴的指標只看目前視窗，兩者相同
+    assert summary["bollinger"] == full_summary["bollinger"]
+    assert summary["max_drawdown_pct"] == full_summary["max_drawdown_pct"]
+
+
+def test_short_sliding_window_differs_only_by_seed():
+    times, prices = random_walk(72)
+    incremental, summary, _, full_summary = incremental_and_full(times, prices, slice(0, 60), slice(12, 72))
+    assert incremental.stats["incremental"] == 1
+    # 短序列的起始值影響尚未衰減，只保證在合理範圍內
+    assert summary["rsi"] == pytest.approx(full_summary["rsi"], abs=5)
+
+
+def test_unchanged_and_discontinuous_series():
+    times, prices = random_walk(200)
+    engine = IndicatorEngine()
+    engine.update({"coin": (times[:100], prices[:100])})
+    engine.update({"coin": (times[:100], prices[:100])})
+    # 與上次沒有重疊的序列整段重算
+    engine.update({"coin": (times[150:], prices[150:])})
+    assert engine.stats == {"full": 2, "incremental": 0, "unchanged": 1}
+
+
+def test_batches_same_length_series():
+    times, prices = random_walk(100)
+    engine = IndicatorEngine()
+    results = engine.update({
+        "a": (times, prices),
+        "b": (times, prices * 2),
+        "short": (times[:10], prices[:10]),
+    })
+    assert set(results) == {"a", "b"}
+    assert results["a"]["rsi"] == results["b"]["rsi"]
+    assert results["b"]["price"] == pytest.approx(results["a"]["price"] * 2)
+
+
+def test_parse_market_chart():
+    times, prices = parse_market_chart({"prices": [[1_700_000_000_000, 1.5], [1_700_000_060_000, 2.0]]})
+    assert times.tolist() == [1_700_000_000.0, 1_700_000_060.0]
+    assert prices.tolist() == [1.5, 2.0]
+    assert parse_market_chart(None) is None
+    assert parse_market_chart({"prices": []}) is None
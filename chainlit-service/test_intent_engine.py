@@ -0,0 +1,99 @@
+"""意圖與幣種偵測引擎的測試"""
+
+from intent_engine import build_default_engine
+
+
+def make_engine():
+    engine = build_default_engine()
+    # 與 register_registry_coins 相同：以幣名註冊多字詞組
+    engine.add_coin("bitcoin-cash", ["Bitcoin Cash"])
+    engine.add_coin("wrapped-bitcoin", ["Wrapped Bitcoin"])
+    engine.add_coin("shiba-inu", ["柴犬幣"])
+    engine.add_coin("inu", ["犬幣"])
+    return engine
+
+
+def test_longer_phrase_wins_over_contained_name():
+    engine = make_engine()
+    result = engine.detect("bitcoin cash price")
+    assert result.coins == ["bitcoin-cash"]
+    assert "price" in result.intents
+
+
+def test_longer_phrase_wins_when_short_name_is_suffix():
+    assert make_engine().detect("wrapped bitcoin 價格").coins == ["wrapped-bitcoin"]
+
+
+def test_cjk_longest_match():
+    assert make_engine().detect("柴犬幣多少").coins == ["shiba-inu"]
+
+
+def test_separate_mentions_are_still_compared():
+    result = make_engine().detect("bitcoin vs bitcoin cash")
+    assert result.coins == ["bitcoin", "bitcoin-cash"]
+    assert "compare" in result.intents
+
+
+def test_whole_word_matching():
+    # "dot" / "link" 不應在一般單字中被比對到
+    assert make_engine().detect("download the linked doc").coins == []
+
+
+def test_coins_in_order_without_duplicates():
+    result = make_engine().detect("ETH 和 btc 還有 以太坊")
+    assert result.coins == ["ethereum", "bitcoin"]
+
+
+def make_registry_engine():
+    """模擬 register_registry_coins 載入的代號"""
+    engine = build_default_engine()
+    engine.add_coin("just", ["JUST"])
+    engine.add_symbol("just", "jst")
+    engine.add_coin("pepe", ["Pepe"])
+    engine.add_symbol("pepe", "pepe")
+    engine.add_coin("thorchain", ["THORChain"])
+    engine.add_symbol("thorchain", "rune")
+    return engine
+
+
+def test_symbol_stopwords_cover_common_words():
+    from intent_engine import SYMBOL_STOPWORDS
+    assert {"etc", "just", "one", "via"} <= SYMBOL_STOPWORDS
+
+
+def test_common_word_needs_uppercase_or_coin_word():
+    # 幣名與一般單字相同時 ("just")，價格字詞不夠，需要大寫或 coin / token / 幣
+    engine = build_default_engine()
+    engine.add_common_word("just", "JUST")
+    assert engine.detect("just tell me the eth price").coins == ["ethereum"]
+    assert engine.detect("just price").coins == []
+    assert engine.detect("JUST price").coins == ["just"]
+    assert engine.detect("just token 價格").coins == ["just"]
+    assert engine.detect("just幣").coins == ["just"]
+    # 整句全大寫時無法以大小寫判斷
+    assert engine.detect("JUST TELL ME THE ETH PRICE").coins == ["ethereum"]
+
+
+def test_lowercase_symbol_without_context_is_ignored():
+    assert make_registry_engine().detect("the rune on the wall").coins == []
+
+
+def test_uppercase_symbol_is_matched():
+    assert make_registry_engine().detect("how is RUNE doing").coins == ["thorchain"]
+
+
+def test_lowercase_symbol_next_to_price_keyword():
+    engine = make_registry_engine()
+    assert engine.detect("rune price").coins == ["thorchain"]
+    assert engine.detect("rune 價格").coins == ["thorchain"]
+    assert engine.detect("現在幣價 rune").coins == ["thorchain"]
+
+
+def test_etc_is_not_ethereum_classic():
+    from intent_engine import SYMBOL_STOPWORDS
+    engine = build_default_engine()
+    # 與 register_registry_coins 相同：停用字不註冊為代號
+    for coin_id, symbol in [("ethereum-classic", "etc"), ("thorchain", "rune")]:
+        if symbol not in SYMBOL_STOPWORDS:
+            engine.add_symbol(coin_id, symbol)
+    assert engine.detect("BTC, ETH, etc. 價格").coins == ["bitcoin", "ethereum"]
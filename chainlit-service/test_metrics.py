@@ -0,0 +1,101 @@
+"""Prometheus 指標輸出與 /metrics 來源限制的測試"""
+
+import pytest
+
+from metrics import MetricsRegistry, _Metric, is_allowed, parse_networks
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("x", "doc")
+
+
+def test_render_counter_gauge_histogram():
+    registry = MetricsRegistry("app")
+    requests = registry.counter("requests_total", "requests", ["path"])
+    inflight = registry.gauge("inflight", "in flight")
+    latency = registry.histogram("latency_seconds", "latency", buckets=(0.1, 1.0))
+
+    requests.inc(path="fast")
+    requests.inc(2, path="fast")
+    with inflight.track_inprogress():
+        assert inflight.value() == 1
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE app_requests_total counter" in lines
+    assert 'app_requests_total{path="fast"} 3' in lines
+    assert "app_inflight 0" in lines
+    assert 'app_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'app_latency_seconds_bucket{le="1"} 2' in lines
+    assert 'app_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "app_latency_seconds_sum 5.55" in lines
+    assert "app_latency_seconds_count 3" in lines
+
+
+def test_label_mismatch_and_duplicate_names():
+    registry = MetricsRegistry()
+    counter = registry.counter("c", "doc", ["path"])
+    with pytest.raises(ValueError):
+        counter.inc(model="x")
+    with pytest.raises(ValueError):
+        registry.gauge("c", "doc")
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("c", "doc", ["reason"]).inc(reason='bad "quote"\n')
+    assert 'c{reason="bad \\"quote\\"\\n"} 1' in registry.render()
+
+
+def test_collector_failure_does_not_break_render():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("g", "doc")
+    registry.add_collector(lambda: 1 / 0)
+    registry.add_collector(lambda: gauge.set(7))
+    assert "g 7" in registry.render()
+
+
+def test_allowed_networks():
+    networks = parse_networks("127.0.0.1, ::1,10.0.0.0/8")
+    assert is_allowed("127.0.0.1", networks)
+    assert is_allowed("::1", networks)
+    assert is_allowed("10.1.2.3", networks)
+    assert is_allowed("::ffff:10.1.2.3", networks)
+    assert not is_allowed("192.168.1.5", networks)
+    assert not is_allowed("testclient", networks)
+
+
+def test_empty_allow_list_denies_everyone():
+    assert parse_networks("") == []
+    assert not is_allowed("127.0.0.1", [])
+
+
+def test_default_allow_list_is_local_and_private():
+    import app
+
+    assert is_allowed("127.0.0.1", app.METRICS_ALLOWED_CIDRS)
+    assert is_allowed("172.18.0.5", app.METRICS_ALLOWED_CIDRS)
+    assert not is_allowed("203.0.113.9", app.METRICS_ALLOWED_CIDRS)
+    assert not is_allowed("2001:db8::1", app.METRICS_ALLOWED_CIDRS)
+
+
+def test_unlabelled_metrics_render_zero_before_first_update():
+    registry = MetricsRegistry()
+    registry.counter("c_total", "doc")
+    registry.gauge("g", "doc")
+    registry.histogram("h_seconds", "doc", buckets=(1.0,))
+    registry.counter("labelled_total", "doc", ["path"])
+    lines = registry.render().splitlines()
+    assert "c_total 0" in lines
+    assert "g 0" in lines
+    assert 'h_seconds_bucket{le="+Inf"} 0' in lines
+    assert "h_seconds_count 0" in lines
+    assert not any(line.startswith("labelled_total") for line in lines)
+
+
+def test_invalid_network_is_rejected():
+    with pytest.raises(ValueError):
+        parse_networks("10.0.0.0/33")
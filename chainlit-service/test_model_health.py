@@ -0,0 +1,96 @@
+"""模型 circuit breaker 與配額錯誤判斷的測試"""
+
+import time
+
+from model_health import CircuitState, ModelHealthTracker, is_quota_error
+
+
+class ResourceExhausted(Exception):
+    """模擬 google.api_core.exceptions.ResourceExhausted"""
+
+    code = 429
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+def test_quota_error_by_exception_type():
+    assert is_quota_error(ResourceExhausted("Resource has been exhausted"))
+
+
+def test_quota_error_by_status_code():
+    assert is_quota_error(ApiError("too busy", 429))
+    assert not is_quota_error(ApiError("429 in the message but status is 400", 400))
+
+
+def test_quota_error_by_message():
+    assert is_quota_error(Exception("429 Resource exhausted"))
+    assert is_quota_error(Exception("Quota exceeded for metric"))
+    assert is_quota_error(Exception("rate limit reached"))
+    assert is_quota_error(Exception("RESOURCE_EXHAUSTED"))
+
+
+def test_rate_substring_is_not_quota():
+    assert not is_quota_error(Exception("400 models/gemini-2.0-flash:generateContent invalid argument"))
+    assert not is_quota_error(Exception("failed to generate response"))
+    assert not is_quota_error(Exception("response blocked: moderate harm probability"))
+
+
+def test_opens_after_consecutive_failures():
+    tracker = ModelHealthTracker(["m"], failure_threshold=3)
+    for _ in range(2):
+        tracker.record_failure("m", Exception("500 internal"))
+    assert tracker.get("m").state == CircuitState.CLOSED
+    tracker.record_failure("m", Exception("500 internal"))
+    assert tracker.get("m").state == CircuitState.OPEN
+    assert not tracker.get("m").available()
+
+
+def test_quota_error_opens_immediately_with_retry_delay():
+    tracker = ModelHealthTracker(["m"])
+    tracker.record_failure("m", Exception("429 quota exceeded. Please retry in 12s"))
+    health = tracker.get("m")
+    assert health.state == CircuitState.OPEN
+    assert health.cooldown == 12
+
+
+def test_half_open_allows_one_trial_then_closes():
+    tracker = ModelHealthTracker(["m"], failure_threshold=1, base_cooldown=5)
+    tracker.record_failure("m", Exception("500 internal"))
+    health = tracker.get("m")
+    assert not health.available()
+
+    later = time.monotonic() + 6
+    assert health.available(later)
+    assert health.state == CircuitState.HALF_OPEN
+    tracker.begin("m")
+    assert not health.available(later)
+
+    tracker.record_success("m", 0.5)
+    assert health.state == CircuitState.CLOSED
+    assert health.available()
+
+
+def test_half_open_failure_reopens_with_longer_cooldown():
+    tracker = ModelHealthTracker(["m"], failure_threshold=1, base_cooldown=5)
+    tracker.record_failure("m", Exception("500 internal"))
+    health = tracker.get("m")
+    assert health.available(time.monotonic() + 6)
+    tracker.begin("m")
+    tracker.record_failure("m", Exception("500 internal"))
+    assert health.state == CircuitState.OPEN
+    assert health.cooldown == 10
+
+
+def test_abandon_releases_half_open_trial():
+    tracker = ModelHealthTracker(["m"], failure_threshold=1, base_cooldown=5)
+    tracker.record_failure("m", Exception("500 internal"))
+    health = tracker.get("m")
+    later = time.monotonic() + 6
+    assert health.available(later)
+    tracker.begin("m")
+    tracker.abandon("m")
+    assert health.available(later)
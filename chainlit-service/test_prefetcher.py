@@ -0,0 +1,71 @@
+"""背景預取排程策略 (熱門度衰減與自適應間隔) 的測試"""
+
+import pytest
+
+from prefetcher import AdaptiveInterval, PopularityTracker
+
+
+def test_hot_orders_by_decayed_score():
+    tracker = PopularityTracker(half_life=60)
+    for _ in range(3):
+        tracker.record("bitcoin", now=0)
+    tracker.record("ethereum", now=0)
+    assert tracker.hot(2, now=0) == ["bitcoin", "ethereum"]
+    # 兩個半衰期後 bitcoin 剩 0.75 分，新查詢的 solana 以 1 分超前
+    tracker.record("solana", now=120)
+    assert tracker.hot(3, now=120) == ["solana", "bitcoin", "ethereum"]
+    assert tracker.hot(1, now=120) == ["solana"]
+
+
+def test_repeated_queries_decay_before_adding():
+    tracker = PopularityTracker(half_life=60)
+    tracker.record("bitcoin", now=0)
+    tracker.record("bitcoin", now=60)
+    tracker.record("ethereum", now=60)
+    tracker.record("ethereum", now=60)
+    # bitcoin: 1 * 0.5 + 1 = 1.5 < ethereum: 2
+    assert tracker.hot(2, now=60) == ["ethereum", "bitcoin"]
+
+
+def test_maxsize_keeps_the_hottest_half():
+    tracker = PopularityTracker(half_life=60, maxsize=4)
+    for rank, coin_id in enumerate(["a", "b", "c", "d"]):
+        for _ in range(4 - rank):
+            tracker.record(coin_id, now=0)
+    tracker.record("e", now=0)
+    assert tracker.hot(10, now=0) == ["a", "b"]
+
+
+def test_requests_per_minute_steady_state():
+    tracker = PopularityTracker(half_life=600)
+    # 每 6 秒一則訊息 (10 rpm) 持續到衰減計數接近穩態
+    for i in range(2000):
+        tracker.record_request(now=i * 6.0)
+    assert tracker.requests_per_minute(now=1999 * 6.0) == pytest.approx(10, rel=0.05)
+    # 閒置一個半衰期後減半
+    assert tracker.requests_per_minute(now=1999 * 6.0 + 600) == pytest.approx(5, rel=0.05)
+
+
+def test_interval_interpolates_with_activity():
+    interval = AdaptiveInterval(min_interval=30, max_interval=300, busy_rpm=10)
+    assert interval.next(0, quota_ratio=1.0) == 300
+    assert interval.next(5, quota_ratio=1.0) == 165
+    assert interval.next(10, quota_ratio=1.0) == 30
+    assert interval.next(50, quota_ratio=1.0) == 30
+
+
+def test_interval_doubles_on_low_quota_up_to_max():
+    interval = AdaptiveInterval(min_interval=30, max_interval=300, busy_rpm=10, low_quota=0.3)
+    assert interval.next(10, quota_ratio=0.2) == 60
+    assert interval.next(10, quota_ratio=0.3) == 30
+    assert interval.next(0, quota_ratio=0.1) == 300
+
+
+def test_interval_waits_out_upstream_pause():
+    interval = AdaptiveInterval(min_interval=30, max_interval=300, busy_rpm=10)
+    assert interval.next(10, quota_ratio=1.0, paused_seconds=90) == 90
+    assert interval.next(10, quota_ratio=1.0, paused_seconds=5) == 30
+
+
+def test_zero_busy_rpm_is_always_busy():
+    assert AdaptiveInterval(min_interval=30, max_interval=300, busy_rpm=0).next(0, quota_ratio=1.0) == 30
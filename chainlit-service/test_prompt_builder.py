@@ -0,0 +1,126 @@
+"""市場資料 prompt 組裝 (欄位投影、四捨五入與表格編碼) 的測試"""
+
+import pytest
+
+from prompt_builder import (
+    DATA_NOTES,
+    _round,
+    build_data_prompt,
+    compact,
+    encode_data,
+    encode_record,
+    encode_records,
+    project_data,
+)
+
+BITCOIN = {
+    "id": "bitcoin",
+    "name": "Bitcoin",
+    "symbol": "BTC",
+    "image": "https://example.com/btc.png",
+    "current_price_usd": 63012.123456,
+    "price_change_percentage_24h": 2.34567,
+    "high_24h_usd": 64000.0,
+    "market_cap_usd": 1234567890123.4,
+    "max_supply": None,
+    "ath_date": "",
+    "technical_indicators": {"rsi": 55.5678, "trend": [["2024-01-01 00:00", 63012.123456]]},
+}
+
+
+@pytest.mark.parametrize("key, value, expected", [
+    ("price_change_percentage_24h", 2.34567, 2.35),
+    ("drawdown_pct", -12.3456, -12.35),
+    ("rsi", 55.5678, 55.57),
+    ("percent_b", 0.87654, 0.88),
+    ("market_cap_usd", 1234567890123.4, 1234567890123),
+    ("total_volume_usd", -2_500_000.6, -2500001),
+    ("current_price_usd", 63012.123456, 63012.1),
+    ("current_price_usd", 0.0000123456789, 1.23457e-05),
+])
+def test_round_by_field_and_magnitude(key, value, expected):
+    result = _round(key, value)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+def test_compact_removes_none_and_empty_values():
+    assert compact({
+        "a": None, "b": "", "c": [], "d": {}, "e": {"f": None},
+        "stale": False, "rank": 0, "prices": [None, 1.23456789], "nested": {"market_cap_usd": 3e9},
+    }) == {"stale": False, "rank": 0, "prices": [1.23457], "nested": {"market_cap_usd": 3000000000}}
+
+
+def test_price_intent_projection():
+    crypto = project_data({"crypto_data": BITCOIN}, "price")["crypto_data"]
+    assert list(crypto) == [
+        "name", "symbol", "current_price_usd", "price_change_percentage_24h", "high_24h_usd", "market_cap_usd",
+    ]
+    assert crypto["current_price_usd"] == 63012.1
+    assert crypto["price_change_percentage_24h"] == 2.35
+    # 未指定意圖時與 price 相同
+    assert project_data({"crypto_data": BITCOIN}) == {"crypto_data": crypto}
+
+
+def test_compare_and_analysis_intent_projection():
+    compare = project_data({"crypto_data": BITCOIN}, "compare")["crypto_data"]
+    assert "high_24h_usd" not in compare
+    assert "technical_indicators" not in compare
+
+    analysis = project_data({"crypto_data": BITCOIN}, "analysis")["crypto_data"]
+    assert analysis["technical_indicators"] == {"rsi": 55.57, "trend": [["2024-01-01 00:00", 63012.1]]}
+    assert "high_24h_usd" not in analysis
+
+
+def test_other_data_types_projection():
+    projected = project_data({
+        "crypto_data": [BITCOIN, {**BITCOIN, "id": "ethereum", "name": "Ethereum", "symbol": "ETH"}],
+        "trending_coins": [{"id": "pepe", "name": "Pepe", "symbol": "PEPE", "thumb": "x.png", "score": 0}],
+        "unavailable_sources": ["nft: timeout"],
+        "query": "btc",
+    })
+    assert [coin["symbol"] for coin in projected["crypto_data"]] == ["BTC", "ETH"]
+    assert "image" not in projected["crypto_data"][0]
+    assert projected["trending_coins"] == [{"name": "Pepe", "symbol": "PEPE"}]
+    # 沒有欄位設定的資料原樣保留
+    assert projected["unavailable_sources"] == ["nft: timeout"]
+    assert projected["query"] == "btc"
+
+
+def test_encode_records_table():
+    text = encode_records([
+        {"symbol": "BTC", "current_price_usd": 63012.1, "indicators": {"rsi": 55.57}, "trend": [["t1", 1.5]]},
+        {"symbol": "ETH", "current_price_usd": 3100, "stale": True, "name": "A|B\nC"},
+    ])
+    assert text.splitlines() == [
+        "symbol|current_price_usd|indicators.rsi|stale|name",
+        "BTC|63012.1|55.57||",
+        "ETH|3100||true|A/B C",
+        'BTC.trend=[["t1",1.5]]',
+    ]
+
+
+def test_encode_record_and_data_sections():
+    assert encode_record({"name": "Bitcoin", "stale": False, "local_history": {"high": 1.5}}) == (
+        "name=Bitcoin\nstale=false\nlocal_history.high=1.5"
+    )
+    text = encode_data({
+        "crypto_data": {"symbol": "BTC"},
+        "trending_coins": [{"symbol": "PEPE"}, {"symbol": "WIF"}],
+        "unavailable_sources": ["nft: timeout"],
+        "search_results": [],
+    })
+    assert text == (
+        "[crypto_data]\nsymbol=BTC\n\n"
+        "[trending_coins]\nsymbol\nPEPE\nWIF\n\n"
+        '[unavailable_sources]\n["nft: timeout"]'
+    )
+
+
+def test_build_data_prompt_adds_only_relevant_notes():
+    built = build_data_prompt("SYSTEM\n", "BTC?", {"crypto_data": {**BITCOIN, "stale": True, "data_age_seconds": 42}})
+    assert DATA_NOTES["stale"] in built.text
+    assert DATA_NOTES["technical_indicators"] not in built.text
+    assert "stale=true" in built.text
+    assert "https://example.com" not in built.text
+    assert 0 < built.data_tokens < built.tokens
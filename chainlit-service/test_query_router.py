@@ -0,0 +1,51 @@
+"""多意圖資料來源路由的測試"""
+
+import asyncio
+
+from query_router import DataSource, describe_results, gather_sources, merge_results
+
+
+def source(name, value=None, delay=0.0, error=None, timeout=1.0):
+    async def fetch():
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return value
+
+    return DataSource(name, fetch, timeout, name)
+
+
+def test_sources_run_concurrently_with_independent_failures():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await gather_sources([
+            source("trending", {"trending_coins": [1]}, delay=0.05),
+            source("crypto", {"crypto_data": {"id": "bitcoin"}}, delay=0.05),
+            source("watchlist", delay=1.0, timeout=0.05),
+            source("nft", error=RuntimeError("boom")),
+            source("search", None),
+        ])
+        return results, loop.time() - start
+
+    results, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.5
+    assert {name: result.status for name, result in results.items()} == {
+        "trending": "ok", "crypto": "ok", "watchlist": "timeout", "nft": "error", "search": "empty",
+    }
+    assert results["nft"].error == "boom"
+
+
+def test_merge_results_reports_unavailable_sources():
+    async def scenario():
+        return await gather_sources([
+            source("trending", {"trending_coins": [1]}),
+            source("watchlist", error=RuntimeError("401")),
+            source("search", {}),
+        ])
+
+    results = asyncio.run(scenario())
+    data, unavailable = merge_results(results)
+    assert data == {"trending_coins": [1]}
+    assert unavailable == ["watchlist: error"]
+    assert describe_results(results).startswith("trending=ok ")
@@ -0,0 +1,102 @@
+"""Token bucket 速率限制器的測試"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from rate_limiter import Priority, TokenBucketLimiter, parse_retry_after
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-3") == 0.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+def test_parse_retry_after_falls_back_to_default():
+    assert parse_retry_after(None, default=7) == 7
+    assert parse_retry_after("soon", default=7) == 7
+
+
+def test_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucketLimiter("test", rate_per_minute=0, burst=5)
+    with pytest.raises(ValueError):
+        TokenBucketLimiter("test", rate_per_minute=-1, burst=5)
+    with pytest.raises(ValueError):
+        TokenBucketLimiter("test", rate_per_minute=60, burst=0)
+
+
+def test_background_reserve_must_leave_tokens_for_background():
+    with pytest.raises(ValueError):
+        TokenBucketLimiter("test", rate_per_minute=60, burst=1)
+    with pytest.raises(ValueError):
+        TokenBucketLimiter("test", rate_per_minute=60, burst=3, background_reserve=3)
+    with pytest.raises(ValueError):
+        TokenBucketLimiter("test", rate_per_minute=60, burst=3, background_reserve=-1)
+    # app 的預設值 (burst 10，保留 1)
+    assert TokenBucketLimiter("test", rate_per_minute=30, burst=10).background_reserve == 1
+    assert TokenBucketLimiter("test", rate_per_minute=60, burst=1, background_reserve=0).burst == 1
+
+
+def test_burst_granted_immediately():
+    async def scenario():
+        limiter = TokenBucketLimiter("test", rate_per_minute=60, burst=3, background_reserve=0)
+        return [await limiter.acquire(max_wait=0.01) for _ in range(4)]
+
+    assert asyncio.run(scenario()) == [True, True, True, False]
+
+
+def test_interactive_requests_jump_the_queue():
+    async def scenario():
+        # 每 0.05 秒補充一個 token
+        limiter = TokenBucketLimiter("test", rate_per_minute=1200, burst=1, background_reserve=0)
+        await limiter.acquire()
+        order = []
+
+        async def request(name, priority):
+            await limiter.acquire(priority=priority, max_wait=2)
+            order.append(name)
+
+        tasks = [asyncio.create_task(request("background", Priority.BACKGROUND))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("interactive", Priority.INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "background"]
+
+
+def test_background_keeps_reserve_for_interactive():
+    async def scenario():
+        limiter = TokenBucketLimiter("test", rate_per_minute=60, burst=2, background_reserve=1)
+        background = [await limiter.acquire(Priority.BACKGROUND, max_wait=0.01) for _ in range(2)]
+        interactive = await limiter.acquire(Priority.INTERACTIVE, max_wait=0.01)
+        return background, interactive
+
+    background, interactive = asyncio.run(scenario())
+    assert background == [True, False]
+    assert interactive is True
+
+
+def test_retry_after_pauses_the_bucket():
+    async def scenario():
+        limiter = TokenBucketLimiter("test", rate_per_minute=6000, burst=5)
+        limiter.pause(0.2)
+        assert not await limiter.acquire(max_wait=0.05)
+        start = time.monotonic()
+        granted = await limiter.acquire(max_wait=1)
+        return granted, time.monotonic() - start, limiter.stats
+
+    granted, waited, stats = asyncio.run(scenario())
+    assert granted
+    assert waited >= 0.1
+    assert stats["throttled"] == 1
+    assert stats["timeouts"] == 1
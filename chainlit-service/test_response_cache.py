@@ -0,0 +1,134 @@
+"""LLM 回答快取 (key 組成、TTL 與淘汰) 的測試"""
+
+import asyncio
+
+from response_cache import PRICE_BUCKET_RATIO, ResponseCache, ResponseKey, market_fingerprint, normalize_query
+
+# 剛好落在分桶中心的價格，小幅變動不會跨過邊界
+CENTER_PRICE = PRICE_BUCKET_RATIO ** 2000
+
+
+def price_data(price: float = CENTER_PRICE, change_24h: float = 2.2, **extra):
+    return {"crypto_data": {"id": "bitcoin", "current_price_usd": price, "price_change_percentage_24h": change_24h, **extra}}
+
+
+def make_key(query: str = "BTC 現在怎麼樣？", fingerprint: str = "f1", coins=("bitcoin",)) -> ResponseKey:
+    return ResponseKey(normalize_query(query), "price", coins, fingerprint)
+
+
+def test_normalize_query():
+    assert normalize_query("ETH 現在怎麼樣？") == "eth現在怎麼樣"
+    assert normalize_query("ＢＴＣ　價格!!") == "btc價格"
+    assert normalize_query("  btc, price ") == normalize_query("BTC price?")
+
+
+def test_fingerprint_ignores_small_moves_and_other_fields():
+    base = market_fingerprint(price_data())
+    assert base
+    assert market_fingerprint(price_data(CENTER_PRICE * 1.001)) == base
+    assert market_fingerprint(price_data(change_24h=2.4)) == base
+    assert market_fingerprint(price_data(total_volume_usd=123456)) == base
+
+
+def test_fingerprint_changes_with_market():
+    base = market_fingerprint(price_data())
+    assert market_fingerprint(price_data(CENTER_PRICE * 1.01)) != base
+    assert market_fingerprint(price_data(change_24h=3.6)) != base
+    assert market_fingerprint(price_data(stale=True)) != base
+    assert market_fingerprint({"crypto_data": {"id": "ethereum", "current_price_usd": CENTER_PRICE}}) != market_fingerprint(
+        {"crypto_data": {"id": "bitcoin", "current_price_usd": CENTER_PRICE}}
+    )
+
+
+def test_fingerprint_of_data_without_market_fields():
+    assert market_fingerprint({"query": "hello"}) == ""
+
+
+def test_same_key_hits_and_different_fingerprint_misses():
+    async def scenario():
+        cache = ResponseCache()
+        await cache.set(make_key(), "answer", ttl=60)
+        return (
+            await cache.get(make_key("btc 現在怎麼樣")),
+            await cache.get(make_key(fingerprint="f2")),
+            await cache.get(make_key(coins=("ethereum",))),
+        )
+
+    assert asyncio.run(scenario()) == ("answer", None, None)
+
+
+def test_entries_expire():
+    async def scenario():
+        cache = ResponseCache()
+        await cache.set(make_key(), "answer", ttl=60)
+        cache._entries[make_key()].expires_at -= 61
+        return await cache.get(make_key()), len(cache), cache.size_bytes
+
+    assert asyncio.run(scenario()) == (None, 0, 0)
+
+
+def test_non_positive_ttl_is_not_stored():
+    async def scenario():
+        cache = ResponseCache()
+        await cache.set(make_key(), "answer", ttl=0)
+        return len(cache)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_evicts_least_recently_used_by_bytes():
+    async def scenario():
+        first, second, third = make_key("a"), make_key("b"), make_key("c")
+        # 每筆 = 回答 10 bytes + 問題 1 byte
+        cache = ResponseCache(max_bytes=25)
+        await cache.set(first, "x" * 10, ttl=60)
+        await cache.set(second, "y" * 10, ttl=60)
+        await cache.get(first)
+        await cache.set(third, "z" * 10, ttl=60)
+        return [await cache.get(key) for key in (first, second, third)], cache
+
+    results, cache = asyncio.run(scenario())
+    assert results == ["x" * 10, None, "z" * 10]
+    assert cache.size_bytes == 22
+    assert cache.stats["evictions"] == 1
+
+
+def test_semantic_match_stays_within_scope():
+    vectors = {"btc價格多少": [1.0, 0.0], "btc現在多少錢": [0.99, 0.05], "btc值得買嗎": [0.0, 1.0]}
+
+    async def embed(query):
+        return vectors[query]
+
+    async def scenario():
+        cache = ResponseCache(embed=embed, similarity_threshold=0.9)
+        await cache.set(make_key("BTC 價格多少"), "answer", ttl=60)
+        return (
+            await cache.get(make_key("BTC 現在多少錢")),
+            await cache.get(make_key("BTC 值得買嗎")),
+            await cache.get(make_key("BTC 現在多少錢", fingerprint="f2")),
+            cache.stats["semantic_hits"],
+        )
+
+    assert asyncio.run(scenario()) == ("answer", None, None, 1)
+
+
+def test_miss_then_set_embeds_query_once():
+    vectors = {"btc價格多少": [1.0, 0.0], "btc值得買嗎": [0.0, 1.0]}
+    calls = []
+
+    async def embed(query):
+        calls.append(query)
+        return vectors[query]
+
+    async def scenario():
+        cache = ResponseCache(embed=embed, similarity_threshold=0.9)
+        await cache.set(make_key("BTC 價格多少"), "price", ttl=60)
+        assert await cache.get(make_key("BTC 值得買嗎")) is None
+        await cache.set(make_key("BTC 值得買嗎"), "advice", ttl=60)
+        return await cache.get(make_key("BTC 值得買嗎")), cache
+
+    text, cache = asyncio.run(scenario())
+    assert text == "advice"
+    assert calls == ["btc價格多少", "btc值得買嗎"]
+    assert cache._entries[make_key("BTC 值得買嗎")].embedding is not None
+    assert not cache._pending_embeddings
@@ -0,0 +1,111 @@
+"""Single-flight 請求合併的測試"""
+
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Upstream:
+    """可由測試控制何時完成的上游請求"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def fetch(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+            return f"result-{self.calls}"
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def test_concurrent_callers_share_one_request():
+    async def scenario():
+        flight = SingleFlight("test")
+        upstream = Upstream()
+        tasks = [asyncio.create_task(flight.do("k", upstream.fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*tasks)
+        return flight, upstream, results
+
+    flight, upstream, results = asyncio.run(scenario())
+    assert results == ["result-1"] * 5
+    assert upstream.calls == 1
+    assert flight.stats == {"leader": 1, "shared": 4}
+    assert len(flight) == 0
+
+
+def test_errors_are_shared_and_not_remembered():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            flight.do("k", failing), flight.do("k", failing), return_exceptions=True
+        )
+        with pytest.raises(RuntimeError):
+            await flight.do("k", failing)
+        return results, calls
+
+    results, calls = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 2
+
+
+def test_cancelling_one_waiter_keeps_request_for_others():
+    async def scenario():
+        flight = SingleFlight("test")
+        upstream = Upstream()
+        first = asyncio.create_task(flight.do("k", upstream.fetch))
+        second = asyncio.create_task(flight.do("k", upstream.fetch))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        result = await second
+        return first, result, upstream
+
+    first, result, upstream = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == "result-1"
+    assert upstream.calls == 1
+    assert upstream.cancelled == 0
+
+
+def test_cancelling_all_waiters_cancels_request():
+    async def scenario():
+        flight = SingleFlight("test")
+        upstream = Upstream()
+        waiters = [asyncio.create_task(flight.do("k", upstream.fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        in_flight = len(flight)
+
+        # 之後的請求重新發起，而不是等待已取消的任務
+        retry = asyncio.create_task(flight.do("k", upstream.fetch))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return in_flight, await retry, upstream
+
+    in_flight, result, upstream = asyncio.run(scenario())
+    assert in_flight == 0
+    assert upstream.cancelled == 1
+    assert upstream.calls == 2
+    assert result == "result-2"
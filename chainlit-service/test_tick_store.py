@@ -0,0 +1,60 @@
+"""價格 tick 環狀緩衝區與時間範圍解析的測試"""
+
+import pytest
+
+from tick_store import PriceRingBuffer, TickStore, parse_window_seconds
+
+
+@pytest.mark.parametrize("query, seconds", [
+    ("過去一小時波動", 3600),
+    ("半小時內", 1800),
+    ("兩天", 2 * 86400),
+    ("過去十分鐘", 600),
+    ("過去十五分鐘", 15 * 60),
+    ("二十分鐘", 20 * 60),
+    ("四十八小時", 48 * 3600),
+    ("三 個 小時", 3 * 3600),
+    ("30 分鐘", 1800),
+    ("24h", 86400),
+    ("last 1.5 hours", 5400),
+    ("past 7 days", 7 * 86400),
+    ("15min", 900),
+])
+def test_parse_window_seconds(query, seconds):
+    assert parse_window_seconds(query) == seconds
+
+
+def test_parse_window_seconds_without_window():
+    assert parse_window_seconds("BTC 價格") is None
+    assert parse_window_seconds("2 dogs") is None
+
+
+def test_ring_buffer_wraps_in_time_order():
+    buffer = PriceRingBuffer(capacity=3)
+    for t in range(5):
+        assert buffer.append(float(t), 100.0 + t)
+    times, prices = buffer.series()
+    assert times.tolist() == [2.0, 3.0, 4.0]
+    assert prices.tolist() == [102.0, 103.0, 104.0]
+    assert not buffer.append(4.0, 999.0)
+
+
+def test_window_stats():
+    store = TickStore(capacity=10)
+    for t, price in enumerate([100.0, 110.0, 90.0, 105.0]):
+        store.record("bitcoin", price, timestamp=1000.0 + t * 60)
+    stats = store.stats("bitcoin", 150, now=1180.0)
+    assert stats["ticks"] == 3
+    assert (stats["open"], stats["high"], stats["low"], stats["last"]) == (110.0, 110.0, 90.0, 105.0)
+    assert stats["window_seconds"] == 150
+    assert store.stats("ethereum", 150, now=1180.0) is None
+
+
+def test_evicts_least_recently_updated_coin():
+    store = TickStore(capacity=4, max_coins=2)
+    store.record("a", 1.0, timestamp=1)
+    store.record("b", 1.0, timestamp=1)
+    store.record("a", 2.0, timestamp=2)
+    store.record("c", 1.0, timestamp=1)
+    assert "a" in store and "c" in store
+    assert "b" not in store
@@ -0,0 +1,141 @@
+"""Langfuse 背景批次匯出 (佇列上限、取樣與事件重播) 的測試"""
+
+import asyncio
+import threading
+import time
+
+from trace_exporter import TraceExporter
+
+
+class FakeObject:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def generation(self, **kwargs):
+        self.client.calls.append(("generation", self.name, kwargs.get("name")))
+        return FakeObject(self.client, kwargs.get("name"))
+
+    def update(self, **kwargs):
+        self.client.calls.append(("update", self.name, kwargs.get("output")))
+
+    def end(self, **kwargs):
+        self.client.calls.append(("end", self.name, kwargs.get("output")))
+
+
+class FakeClient:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.flushes = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def trace(self, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        self.calls.append(("trace", kwargs.get("name")))
+        return FakeObject(self, kwargs.get("name"))
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_events_are_replayed_in_order():
+    client = FakeClient()
+    exporter = TraceExporter(lambda: client)
+    trace = exporter.trace(name="chat")
+    generation = trace.generation(name="gemini")
+    generation.end(output="answer")
+    trace.update(output="done")
+    assert exporter.pending() == 4
+    assert client.calls == []
+
+    asyncio.run(exporter.flush())
+    assert client.calls == [
+        ("trace", "chat"), ("generation", "chat", "gemini"), ("end", "gemini", "answer"), ("update", "chat", "done"),
+    ]
+    assert client.flushes == 1
+    assert exporter.snapshot()["exported"] == 4
+    assert exporter.pending() == 0
+
+
+def test_full_queue_drops_oldest_and_orphans_children():
+    client = FakeClient()
+    exporter = TraceExporter(lambda: client, max_queue=3)
+    first = exporter.trace(name="first")
+    first.generation(name="g1")
+    second = exporter.trace(name="second")
+    first.update(output="late")
+    second.update(output="ok")
+
+    stats = exporter.snapshot()
+    assert (stats["enqueued"], stats["dropped"], stats["pending"]) == (5, 2, 3)
+    asyncio.run(exporter.flush())
+    # first 的 trace 事件已被丟棄，之後對它的 update 無法重播
+    assert client.calls == [("trace", "second"), ("update", "second", "ok")]
+    assert exporter.stats["orphaned"] == 1
+    assert exporter.stats["exported"] == 2
+
+
+def test_later_batches_reuse_earlier_traces():
+    client = FakeClient()
+    exporter = TraceExporter(lambda: client)
+
+    async def scenario():
+        trace = exporter.trace(name="chat")
+        await exporter.flush()
+        trace.generation(name="gemini").end(output="answer")
+        await exporter.flush()
+
+    asyncio.run(scenario())
+    assert client.calls[1:] == [("generation", "chat", "gemini"), ("end", "gemini", "answer")]
+    assert exporter.stats["orphaned"] == 0
+
+
+def test_sample_rate():
+    assert TraceExporter(FakeClient, sample_rate=0.0).trace(name="chat") is None
+    skipped = TraceExporter(FakeClient, sample_rate=0.0)
+    for _ in range(5):
+        skipped.trace(name="chat")
+    assert (skipped.stats["sampled_out"], skipped.stats["traces"], skipped.pending()) == (5, 0, 0)
+
+    kept = TraceExporter(FakeClient, sample_rate=1.0)
+    for _ in range(5):
+        assert kept.trace(name="chat") is not None
+    assert (kept.stats["sampled_out"], kept.stats["traces"], kept.pending()) == (0, 5, 5)
+
+
+def test_client_errors_are_counted_not_raised():
+    class BrokenClient(FakeClient):
+        def trace(self, **kwargs):
+            raise RuntimeError("down")
+
+    exporter = TraceExporter(BrokenClient)
+    exporter.trace(name="chat").update(output="x")
+    asyncio.run(exporter.flush())
+    assert exporter.stats["errors"] == 1
+    assert exporter.stats["orphaned"] == 1
+
+
+def test_flush_after_cancelled_run_waits_for_inflight_export():
+    client = FakeClient(delay=0.1)
+    exporter = TraceExporter(lambda: client, batch_size=1, flush_interval=10)
+
+    async def scenario():
+        runner = asyncio.create_task(exporter.run())
+        exporter.trace(name="first")
+        await asyncio.sleep(0.03)  # run() 已在 thread 中匯出 first
+        runner.cancel()
+        exporter.trace(name="second")
+        await exporter.flush()
+
+    asyncio.run(scenario())
+    assert client.max_active == 1
+    assert client.calls == [("trace", "first"), ("trace", "second")]
+    assert client.flushes == 2
@@ -0,0 +1,99 @@
+"""收藏清單快照 (整體漲跌統計與排序) 的測試"""
+
+import pytest
+
+from watchlist_snapshot import build_watchlist_snapshot, render_watchlist_snapshot
+
+
+def entry(coin_id, name=None, symbol=None):
+    return {"coinId": coin_id, "coinName": name, "symbol": symbol}
+
+
+def price(change, cap, rank, **extra):
+    return {"price_change_percentage_24h": change, "market_cap_usd": cap, "market_cap_rank": rank, "current_price_usd": 1.0, **extra}
+
+
+WATCHLIST = [
+    entry("unknowncoin", "Unknown", "unk"),
+    entry("pepe", "Pepe", "pepe"),
+    entry("bitcoin", "Bitcoin", "btc"),
+    entry("flatcoin", "Flat", "flat"),
+    entry("ethereum", "Ethereum", "eth"),
+    entry("dogecoin", "Dogecoin", "doge"),
+]
+
+PRICES = {
+    "bitcoin": price(2.0, 1000, 1),
+    "ethereum": price(-4.0, 500, 2),
+    "dogecoin": price(-1.0, 100, 8),
+    # 沒有市值的幣只計入簡單平均
+    "pepe": price(10.0, None, 30),
+    "flatcoin": price(0.0, 0, 50),
+}
+
+
+def symbols(items):
+    return [item["symbol"] for item in items]
+
+
+def test_weighted_and_average_change():
+    snapshot = build_watchlist_snapshot(WATCHLIST, PRICES)
+    assert snapshot["count"] == 6
+    assert snapshot["priced_count"] == 5
+    # (1000 * 2 + 500 * -4 + 100 * -1) / 1600
+    assert snapshot["weighted_change_24h"] == pytest.approx(-0.0625)
+    # (2 - 4 + 10 - 1 + 0) / 5
+    assert snapshot["average_change_24h"] == pytest.approx(1.4)
+
+
+def test_advancers_decliners_and_movers():
+    snapshot = build_watchlist_snapshot(WATCHLIST, PRICES)
+    # 漲跌為 0 與沒有價格的幣都不算
+    assert (snapshot["advancers"], snapshot["decliners"]) == (2, 2)
+    assert symbols(snapshot["gainers"]) == ["PEPE", "BTC"]
+    assert symbols(snapshot["losers"]) == ["ETH", "DOGE"]
+
+    top_one = build_watchlist_snapshot(WATCHLIST, PRICES, top_movers=1)
+    assert symbols(top_one["gainers"]) == ["PEPE"]
+    assert symbols(top_one["losers"]) == ["ETH"]
+
+
+def test_items_sorted_by_rank_with_unpriced_last():
+    snapshot = build_watchlist_snapshot(WATCHLIST, PRICES)
+    assert symbols(snapshot["items"]) == ["BTC", "ETH", "DOGE", "PEPE", "FLAT", "UNK"]
+    unpriced = snapshot["items"][-1]
+    assert unpriced["current_price_usd"] is None
+    assert unpriced["stale"] is False
+    assert snapshot["stale"] is False
+
+
+def test_zero_total_market_cap_has_no_weighted_change():
+    snapshot = build_watchlist_snapshot(
+        [entry("pepe"), entry("flatcoin")],
+        {"pepe": price(3.0, None, None), "flatcoin": price(-1.0, 0, None)},
+    )
+    assert snapshot["weighted_change_24h"] is None
+    assert snapshot["average_change_24h"] == pytest.approx(1.0)
+    assert "市值加權 24小時漲跌**: N/A (平均 +1.00%)" in render_watchlist_snapshot(snapshot)
+
+
+def test_no_prices_at_all():
+    snapshot = build_watchlist_snapshot([entry("bitcoin", "Bitcoin", "btc")], {})
+    assert (snapshot["priced_count"], snapshot["advancers"], snapshot["decliners"]) == (0, 0, 0)
+    assert snapshot["weighted_change_24h"] is None
+    assert snapshot["average_change_24h"] is None
+    assert (snapshot["gainers"], snapshot["losers"]) == ([], [])
+    text = render_watchlist_snapshot(snapshot)
+    assert "目前無法取得價格資料" in text
+    assert "| 1 | Bitcoin (BTC) | N/A | N/A | #N/A |" in text
+
+
+def test_names_fall_back_to_price_data_and_stale_is_reported():
+    snapshot = build_watchlist_snapshot(
+        [entry("solana")],
+        {"solana": price(1.0, 10, 5, name="Solana", symbol="sol", stale=True)},
+    )
+    item = snapshot["items"][0]
+    assert (item["name"], item["symbol"], item["stale"]) == ("Solana", "SOL", True)
+    assert snapshot["stale"] is True
+    assert "CoinGecko 暫時無法連線" in render_watchlist_snapshot(snapshot)
@@ -0,0 +1,175 @@
+"""
+價格 tick 的記憶體時間序列
+每個幣一個固定容量的 numpy 環狀緩衝區 (O(1) 寫入、記憶體固定)，
+支援任意時間窗的最高 / 最低價、報酬率與波動度查詢，
+讓「過去一小時波動」這類問題可以直接用本地歷史回答
+"""
+
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+_CHINESE_NUMBERS = {"半": 0.5, "一": 1, "兩": 2, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+# 中文數字支援 1-99：單一數字、十X、X十、X十Y (例如「十五」、「二十」、「四十八」)
+_WINDOW_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?|[兩二三四五六七八九]?十[一二三四五六七八九]?|[半一兩二三四五六七八九])"
+    r"\s*(?:個)?\s*(分鐘|小時|天|mins?|minutes?|hours?|hrs?|h|days?|d)(?![a-z])",
+    re.IGNORECASE,
+)
+
+_UNIT_SECONDS = {"分鐘": 60, "小時": 3600, "天": 86400, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window_seconds(query: str) -> Optional[float]:
+    """從查詢中取出時間範圍，例如「過去一小時」、「30 分鐘」、「24h」"""
+    match = _WINDOW_PATTERN.search(query)
+    if not match:
+        return None
+    amount, unit = match.groups()
+    value = _parse_chinese_number(amount) if amount[0] in _CHINESE_NUMBERS else float(amount)
+    unit = unit.lower()
+    seconds = _UNIT_SECONDS.get(unit) or _UNIT_SECONDS[unit[0]]
+    return float(value * seconds)
+
+
+def _parse_chinese_number(text: str) -> float:
+    """「五」→ 5、「十五」→ 15、「二十」→ 20、「四十八」→ 48"""
+    if "十" not in text:
+        return _CHINESE_NUMBERS[text]
+    tens, _, ones = text.partition("十")
+    return (_CHINESE_NUMBERS[tens] if tens else 1) * 10 + (_CHINESE_NUMBERS[ones] if ones else 0)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """解析 CoinGecko 的 ISO 8601 時間 (例如 2024-01-01T00:00:00.000Z)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class PriceRingBuffer:
+    """單一幣種的環狀緩衝區 (時間與價格各一個 float64 陣列)"""
+
+    __slots__ = ("capacity", "_times", "_prices", "_head", "_size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._head = 0  # 下一筆要寫入的位置
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_time(self) -> Optional[float]:
+        return float(self._times[self._head - 1]) if self._size else None
+
+    def append(self, timestamp: float, price: float) -> bool:
+        """寫入一筆 tick，時間沒有比最後一筆新的 (重複的快取資料) 會被忽略"""
+        if self._size and timestamp <= self._times[self._head - 1]:
+            return False
+        self._times[self._head] = timestamp
+        self._prices[self._head] = price
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        return True
+
+    def series(self) -> Tuple[np.ndarray, np.ndarray]:
+        """依時間排序的 (times, prices)，尚未繞回時不複製資料"""
+        if self._size < self.capacity:
+            return self._times[:self._size], self._prices[:self._size]
+        order = np.r_[self._head:self.capacity, 0:self._head]
+        return self._times[order], self._prices[order]
+
+    def window(self, seconds: float, now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """最近 seconds 秒內的 tick"""
+        times, prices = self.series()
+        now = time.time() if now is None else now
+        start = np.searchsorted(times, now - seconds, side="left")
+        return times[start:], prices[start:]
+
+
+def window_stats(times: np.ndarray, prices: np.ndarray) -> Optional[Dict[str, Any]]:
+    """時間窗內的最高 / 最低價、報酬率與波動度 (至少需要兩筆 tick)"""
+    if prices.size < 2:
+        return None
+    log_returns = np.diff(np.log(prices))
+    return {
+        "ticks": int(prices.size),
+        "coverage_seconds": round(float(times[-1] - times[0]), 1),
+        "open": float(prices[0]),
+        "last": float(prices[-1]),
+        "high": float(prices.max()),
+        "low": float(prices.min()),
+        "return_pct": round(float(prices[-1] / prices[0] - 1) * 100, 4),
+        "range_pct": round(float(prices.max() / prices.min() - 1) * 100, 4),
+        # tick 間對數報酬的標準差，以及整段的已實現波動度
+        "volatility_pct": round(float(log_returns.std()) * 100, 4),
+        "realized_volatility_pct": round(float(np.sqrt(np.square(log_returns).sum())) * 100, 4),
+    }
+
+
+class TickStore:
+    """
+    所有幣種的 tick 緩衝區
+    幣種數量超過 max_coins 時，移除最久沒有更新的幣
+    """
+
+    def __init__(self, capacity: int = 1440, max_coins: int = 500):
+        self.capacity = capacity
+        self.max_coins = max_coins
+        self._buffers: "OrderedDict[str, PriceRingBuffer]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def __contains__(self, coin_id: str) -> bool:
+        return coin_id in self._buffers
+
+    def record(self, coin_id: str, price: Optional[float], timestamp: Optional[float] = None) -> bool:
+        if price is None or price <= 0:
+            return False
+        buffer = self._buffers.get(coin_id)
+        if buffer is None:
+            buffer = PriceRingBuffer(self.capacity)
+            self._buffers[coin_id] = buffer
+            if len(self._buffers) > self.max_coins:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(coin_id)
+        return buffer.append(time.time() if timestamp is None else timestamp, price)
+
+    def record_price(self, data: Dict[str, Any]) -> bool:
+        """寫入 get_crypto_price / get_crypto_prices 格式的資料 (以 last_updated 為時間)"""
+        return self.record(
+            data.get("id"),
+            data.get("current_price_usd"),
+            parse_timestamp(data.get("last_updated")),
+        )
+
+    def window(self, coin_id: str, seconds: float, now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        buffer = self._buffers.get(coin_id)
+        if buffer is None:
+            empty = np.zeros(0, dtype=np.float64)
+            return empty, empty
+        return buffer.window(seconds, now)
+
+    def stats(self, coin_id: str, seconds: float, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """單一幣種在最近 seconds 秒的統計，資料不足時回傳 None"""
+        result = window_stats(*self.window(coin_id, seconds, now))
+        if result is not None:
+            result["window_seconds"] = seconds
+        return result
+
+    def memory_bytes(self) -> int:
+        return len(self._buffers) * self.capacity * 2 * np.dtype(np.float64).itemsize
@@ -0,0 +1,175 @@
+"""
+Langfuse 背景批次匯出
+請求路徑上的 trace / generation 呼叫只把事件放進有上限的佇列 (微秒等級)，
+背景任務定期 (或佇列累積到一批時) 在 thread 中把事件依序送給 Langfuse client 並 flush；
+Langfuse 變慢或無法連線時只影響背景任務，佇列滿時丟棄最舊的事件
+"""
+
+import asyncio
+import itertools
+import random
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# (事件類型, 物件 id, 上層物件 id, 參數)
+Event = Tuple[str, int, Optional[int], Dict[str, Any]]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class GenerationHandle:
+    """generation 的代理物件，end() 只記錄事件 (結束時間在呼叫當下決定)"""
+
+    __slots__ = ("_exporter", "_id")
+
+    def __init__(self, exporter: "TraceExporter", handle_id: int):
+        self._exporter = exporter
+        self._id = handle_id
+
+    def end(self, **kwargs):
+        kwargs.setdefault("end_time", _now())
+        self._exporter._enqueue(("end", self._id, None, kwargs))
+
+    def update(self, **kwargs):
+        self._exporter._enqueue(("update", self._id, None, kwargs))
+
+
+class TraceHandle:
+    """trace 的代理物件，介面與 Langfuse trace 相同 (generation / update)"""
+
+    __slots__ = ("_exporter", "_id")
+
+    def __init__(self, exporter: "TraceExporter", handle_id: int):
+        self._exporter = exporter
+        self._id = handle_id
+
+    def generation(self, **kwargs) -> GenerationHandle:
+        kwargs.setdefault("start_time", _now())
+        handle_id = self._exporter._next_id()
+        self._exporter._enqueue(("generation", handle_id, self._id, kwargs))
+        return GenerationHandle(self._exporter, handle_id)
+
+    def update(self, **kwargs):
+        self._exporter._enqueue(("update", self._id, None, kwargs))
+
+
+class TraceExporter:
+    """
+    有上限的事件佇列 + 背景批次匯出
+    client_factory 在匯出 thread 中呼叫 (第一次呼叫才載入 Langfuse SDK)
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 5.0,
+        sample_rate: float = 1.0,
+    ):
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self._queue: "deque[Event]" = deque(maxlen=max_queue)
+        self._ids = itertools.count(1)
+        # 已建立的 Langfuse 物件 (只在匯出 thread 中存取)，之後的批次還會用到 trace
+        self._objects: "OrderedDict[int, Any]" = OrderedDict()
+        self._max_objects = max_queue * 2
+        self._batch_ready = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        # 目前 (或上一次) 在 thread 中執行的匯出；同一時間只能有一個 thread 使用 client 與 _objects
+        self._export_task: Optional["asyncio.Future[None]"] = None
+        self.stats = {"traces": 0, "sampled_out": 0, "enqueued": 0, "dropped": 0, "exported": 0, "orphaned": 0, "errors": 0}
+
+    def _next_id(self) -> int:
+        return next(self._ids)
+
+    def _enqueue(self, event: Event):
+        if len(self._queue) == self._queue.maxlen:
+            self.stats["dropped"] += 1  # deque 會自動移除最舊的事件
+        self._queue.append(event)
+        self.stats["enqueued"] += 1
+        if len(self._queue) >= self.batch_size:
+            self._batch_ready.set()
+
+    def trace(self, **kwargs) -> Optional[TraceHandle]:
+        """建立 trace；未被取樣時回傳 None (呼叫端原本就會處理 None)"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self.stats["sampled_out"] += 1
+            return None
+        kwargs.setdefault("timestamp", _now())
+        handle_id = self._next_id()
+        self._enqueue(("trace", handle_id, None, kwargs))
+        self.stats["traces"] += 1
+        return TraceHandle(self, handle_id)
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def _export(self, events: list):
+        """在 thread 中依序重播事件並 flush (上層物件被丟棄的事件會略過)"""
+        client = self.client_factory()
+        for kind, handle_id, parent_id, kwargs in events:
+            try:
+                if kind == "trace":
+                    self._objects[handle_id] = client.trace(**kwargs)
+                elif kind == "generation":
+                    parent = self._objects.get(parent_id)
+                    if parent is None:
+                        self.stats["orphaned"] += 1
+                        continue
+                    self._objects[handle_id] = parent.generation(**kwargs)
+                else:
+                    target = self._objects.get(handle_id)
+                    if target is None:
+                        self.stats["orphaned"] += 1
+                        continue
+                    getattr(target, kind)(**kwargs)
+                    if kind == "end":
+                        # generation 結束後不會再用到
+                        self._objects.pop(handle_id, None)
+                self.stats["exported"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"⚠️ Langfuse 事件匯出失敗 ({kind}): {e}")
+        while len(self._objects) > self._max_objects:
+            self._objects.popitem(last=False)
+        client.flush()
+
+    async def _run_export(self, events: list):
+        try:
+            await asyncio.to_thread(self._export, events)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️ Langfuse 匯出失敗: {e}")
+
+    async def flush(self):
+        """把目前佇列中的事件全部匯出 (在 thread 中執行，不阻塞 event loop)"""
+        async with self._flush_lock:
+            if self._export_task is not None:
+                # run() 在匯出途中被取消 (關閉服務) 時 thread 仍在執行，等它結束再匯出下一批
+                await asyncio.wait([self._export_task])
+            if not self._queue:
+                return
+            events = list(self._queue)
+            self._queue.clear()
+            self._batch_ready.clear()
+            self._export_task = asyncio.ensure_future(self._run_export(events))
+            # 呼叫端被取消時不取消匯出本身 (thread 無法中斷)
+            await asyncio.shield(self._export_task)
+
+    async def run(self):
+        """背景任務：每 flush_interval 秒或累積滿一批時匯出"""
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self._queue)}
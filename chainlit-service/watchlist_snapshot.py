@@ -0,0 +1,106 @@
+"""
+收藏清單快照
+把整份收藏清單與批次取得的價格合併，計算整體漲跌 (漲幅 / 跌幅前幾名、市值加權 24 小時漲跌)
+"""
+
+from typing import Any, Dict, List, Optional
+
+from coin_registry import UNRANKED
+from fast_path import format_percent, format_usd
+
+
+def build_watchlist_snapshot(
+    watchlist: List[Dict[str, Any]],
+    prices: Dict[str, Dict[str, Any]],
+    top_movers: int = 3,
+) -> Dict[str, Any]:
+    """
+    合併 NestJS 收藏清單與 get_crypto_prices 的結果
+    沒有價格資料的幣仍會列出，但不計入統計
+    """
+    items = []
+    for entry in watchlist:
+        coin_id = entry.get("coinId")
+        price = prices.get(coin_id, {})
+        items.append({
+            "id": coin_id,
+            "name": entry.get("coinName") or price.get("name") or coin_id,
+            "symbol": (entry.get("symbol") or price.get("symbol") or "").upper(),
+            "current_price_usd": price.get("current_price_usd"),
+            "price_change_percentage_24h": price.get("price_change_percentage_24h"),
+            "market_cap_usd": price.get("market_cap_usd"),
+            "market_cap_rank": price.get("market_cap_rank"),
+            "stale": bool(price.get("stale")),
+        })
+
+    # 與後端一致: 依市值排名排序，沒有排名的放最後
+    items.sort(key=lambda item: item["market_cap_rank"] or UNRANKED)
+
+    priced = [item for item in items if item["price_change_percentage_24h"] is not None]
+    by_change = sorted(priced, key=lambda item: item["price_change_percentage_24h"], reverse=True)
+    gainers = [item for item in by_change if item["price_change_percentage_24h"] > 0][:top_movers]
+    losers = [item for item in reversed(by_change) if item["price_change_percentage_24h"] < 0][:top_movers]
+
+    weighted = [item for item in priced if item["market_cap_usd"]]
+    total_cap = sum(item["market_cap_usd"] for item in weighted)
+    weighted_change = (
+        sum(item["market_cap_usd"] * item["price_change_percentage_24h"] for item in weighted) / total_cap
+        if total_cap else None
+    )
+    average_change = (
+        sum(item["price_change_percentage_24h"] for item in priced) / len(priced)
+        if priced else None
+    )
+
+    return {
+        "count": len(items),
+        "priced_count": len(priced),
+        "advancers": sum(1 for item in priced if item["price_change_percentage_24h"] > 0),
+        "decliners": sum(1 for item in priced if item["price_change_percentage_24h"] < 0),
+        "weighted_change_24h": weighted_change,
+        "average_change_24h": average_change,
+        "gainers": gainers,
+        "losers": losers,
+        "stale": any(item["stale"] for item in items),
+        "items": items,
+    }
+
+
+def render_watchlist_snapshot(snapshot: Dict[str, Any]) -> str:
+    """將收藏清單快照渲染成回答"""
+    lines = [f"📋 **你的收藏清單** (共 {snapshot['count']} 個)", ""]
+
+    if snapshot["priced_count"]:
+        lines += [
+            f"📊 **市值加權 24小時漲跌**: {format_percent(snapshot['weighted_change_24h'])}"
+            f" (平均 {format_percent(snapshot['average_change_24h'])})",
+            f"🟢 上漲 {snapshot['advancers']} 個 / 🔴 下跌 {snapshot['decliners']} 個",
+        ]
+        if snapshot["gainers"]:
+            lines.append("🚀 **漲幅最大**: " + "、".join(
+                f"{item['symbol']} {format_percent(item['price_change_percentage_24h'])}" for item in snapshot["gainers"]
+            ))
+        if snapshot["losers"]:
+            lines.append("📉 **跌幅最大**: " + "、".join(
+                f"{item['symbol']} {format_percent(item['price_change_percentage_24h'])}" for item in snapshot["losers"]
+            ))
+        lines.append("")
+    else:
+        lines += ["⚠️ 目前無法取得價格資料，以下僅列出收藏的幣種", ""]
+
+    lines += [
+        "| # | 幣種 | 價格 (USD) | 24小時 | 市值排名 |",
+        "| ---: | --- | ---: | ---: | ---: |",
+    ]
+    for index, item in enumerate(snapshot["items"], 1):
+        lines.append(
+            f"| {index} | {item['name']} ({item['symbol']}) "
+            f"| {format_usd(item['current_price_usd'])} "
+            f"| {format_percent(item['price_change_percentage_24h'])} "
+            f"| #{item['market_cap_rank'] or 'N/A'} |"
+        )
+
+    if snapshot["stale"]:
+        lines += ["", "⚠️ CoinGecko 暫時無法連線，部分價格為稍早的資料"]
+    lines += ["", "---", "資料來源: CoinGecko"]
+    return "\n".join(lines) + "\n"